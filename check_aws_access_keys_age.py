@@ -18,7 +18,11 @@
 
 Nagios Plugin to check the age of AWS Access Keys to find and remove/rotate old keys as per best practices
 
-Iterates all AWS IAM users so if you have a lot of users you will need to increase the --timeout
+Uses the access key rotation dates in the IAM credential report rather than iterating all AWS IAM users and their
+access keys, which is slow and gets throttled with a lot of users. The credential report is cached locally and shared
+with the other AWS IAM checks, see check_aws_credential_report.py
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
 
 Verbose mode will output the users, key status, key created date and age in days
 
@@ -40,28 +44,26 @@ from __future__ import division
 from __future__ import print_function
 #from __future__ import unicode_literals
 
-import datetime
 import os
 import sys
 import traceback
 from math import ceil
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, plural, validate_float
-    from harisekhon import NagiosPlugin
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
-class AWSAccessKeyAge(NagiosPlugin):
+class AWSAccessKeyAge(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -69,65 +71,62 @@ class AWSAccessKeyAge(NagiosPlugin):
         # Python 3.x
         # super().__init__()
         self.age = None
-        self.now = None
         self.only_active_keys = False
         self.count_old_keys = 0
         self.msg = 'AWSAccessKeyAge msg not defined'
         self.ok()
 
     def add_options(self):
+        super(AWSAccessKeyAge, self).add_options()
         self.add_opt('-a', '--age', default=365, type=int,
                      help='Return warning on keys older than N days (default 365)')
         self.add_opt('-o', '--only-active', action='store_true', help='Only count keys with Active status')
 
     def process_args(self):
-        self.no_args()
+        super(AWSAccessKeyAge, self).process_args()
         self.only_active_keys = self.get_opt('only_active')
         self.age = self.get_opt('age')
         validate_float(self.age, 'age')
         self.age = int(self.age)
 
     def run(self):
-        iam = boto3.client('iam')
-        user_paginator = iam.get_paginator('list_users')
-        self.now = datetime.datetime.utcnow()
         count = 0
-        for users_response in user_paginator.paginate():
-            for user_item in users_response['Users']:
-                username = user_item['UserName']
-                key_paginator = iam.get_paginator('list_access_keys')
-                for keys_response in key_paginator.paginate(UserName=username):
-                    self.process_keys(keys_response, username)
-                    count += 1
+        for row in self.get_columns('user',
+                                    'access_key_1_active',
+                                    'access_key_1_last_rotated',
+                                    'access_key_2_active',
+                                    'access_key_2_last_rotated'):
+            username = row[0]
+            # root access keys are checked by check_aws_root_account.py
+            if username == '<root_account>':
+                continue
+            for (active, last_rotated) in (row[1:3], row[3:5]):
+                count += self.process_key(username, active, last_rotated)
         old_count = self.count_old_keys
         if old_count:
             self.warning()
         self.msg = '{} AWS access key{} older than {} days'.format(old_count, plural(old_count), self.age)
         self.msg += ' | num_old_access_keys={} num_access_keys={}'.format(old_count, count)
 
-    def process_keys(self, keys_response, username):
-        #assert not keys_response['IsTruncated']
-        for access_key_item in keys_response['AccessKeyMetadata']:
-            assert username == access_key_item['UserName']
-            status = access_key_item['Status']
-            if self.only_active_keys and status != 'Active':
-                continue
-            create_date = access_key_item['CreateDate']
-            # already cast to datetime.datetime with tzinfo
-            #create_datetime = datetime.datetime.strptime(create_date, '%Y-%m-%d %H:%M:%S%z')
-            # removing tzinfo for comparison to avoid below error
-            # - both are UTC and this doesn't make much difference anyway
-            # TypeError: can't subtract offset-naive and offset-aware datetimes
-            age_timedelta = self.now - create_date.replace(tzinfo=None)
-            age_days = ceil(age_timedelta.total_seconds() / 86400.0)
-            if age_days < self.age:
-                continue
-            log.info('{user:20}\t{status:8}\t{date}\t ({days} days)'.format(
-                user=username,
-                status=status,
-                date=create_date,
-                days=age_days))
-            self.count_old_keys += 1
+    def process_key(self, username, active, last_rotated):
+        """Returns 1 if the user has this access key, counting it if it is old"""
+        age_secs = self.get_age_secs(last_rotated)
+        # no key in this slot
+        if age_secs is None:
+            return 0
+        status = 'Active' if active == 'true' else 'Inactive'
+        if self.only_active_keys and status != 'Active':
+            return 0
+        age_days = ceil(age_secs / 86400.0)
+        if age_days < self.age:
+            return 1
+        log.info('{user:20}\t{status:8}\t{date}\t ({days} days)'.format(
+            user=username,
+            status=status,
+            date=last_rotated,
+            days=age_days))
+        self.count_old_keys += 1
+        return 1
 
 
 if __name__ == '__main__':
@@ -18,9 +18,13 @@
 
 Nagios Plugin to check for any disabled AWS Access Keys which should probably be removed
 
-Iterates all AWS IAM users so if you have a lot of users you will need to increase the --timeout
+Uses the access key status in the IAM credential report rather than iterating all AWS IAM users and their access keys,
+which is slow and gets throttled with a lot of users. The credential report is cached locally and shared with the
+other AWS IAM checks, see check_aws_credential_report.py
 
-Verbose mode will output the users, key status and key created date
+Verbose mode will output the users, key status and key last rotated date
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
 
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
@@ -41,23 +45,22 @@ from __future__ import print_function
 import os
 import sys
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, plural
-    from harisekhon import NagiosPlugin
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
-class AWSAccessKeysDisabled(NagiosPlugin):
+class AWSAccessKeysDisabled(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -69,35 +72,37 @@ class AWSAccessKeysDisabled(NagiosPlugin):
         self.ok()
 
     def run(self):
-        iam = boto3.client('iam')
-        user_paginator = iam.get_paginator('list_users')
         count = 0
-        for users_response in user_paginator.paginate():
-            for user_item in users_response['Users']:
-                username = user_item['UserName']
-                key_paginator = iam.get_paginator('list_access_keys')
-                for keys_response in key_paginator.paginate(UserName=username):
-                    self.process_keys(keys_response, username)
-                    count += 1
+        for row in self.get_columns('user',
+                                    'access_key_1_active',
+                                    'access_key_1_last_rotated',
+                                    'access_key_2_active',
+                                    'access_key_2_last_rotated'):
+            username = row[0]
+            # root access keys are checked by check_aws_root_account.py
+            if username == '<root_account>':
+                continue
+            for (active, last_rotated) in (row[1:3], row[3:5]):
+                count += self.process_key(username, active, last_rotated)
         disabled_count = self.disabled_access_key_count
         if disabled_count:
             self.warning()
         self.msg = '{} AWS access key{} disabled'.format(disabled_count, plural(disabled_count))
         self.msg += ' | num_disabled_access_keys={} num_access_keys={}'.format(disabled_count, count)
 
-    def process_keys(self, keys_response, username):
-        #assert not keys_response['IsTruncated']
-        for access_key_item in keys_response['AccessKeyMetadata']:
-            assert username == access_key_item['UserName']
-            status = access_key_item['Status']
-            create_date = access_key_item['CreateDate']
-            log.info('{user:20}\t{status:8}\t{date}'.format(
-                user=username,
-                status=status,
-                date=create_date))
-            # alternative is 'Inactive'
-            if status != 'Active':
-                self.disabled_access_key_count += 1
+    def process_key(self, username, active, last_rotated):
+        """Returns 1 if the user has this access key, counting it if it is disabled"""
+        # no key in this slot
+        if last_rotated in self.no_timestamp:
+            return 0
+        status = 'Active' if active == 'true' else 'Inactive'
+        log.info('{user:20}\t{status:8}\t{date}'.format(
+            user=username,
+            status=status,
+            date=last_rotated))
+        if status != 'Active':
+            self.disabled_access_key_count += 1
+        return 1
 
 
 if __name__ == '__main__':
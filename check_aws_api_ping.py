@@ -20,6 +20,11 @@ Nagios Plugin to do a simple AWS API call to check access key credentials are wo
 
 Useful to use as a dependency check for all other AWS checks
 
+Also the base class of the other AWS checks, providing a lazily initialised boto3 session and client factory so that
+boto3 / botocore are only imported and their endpoint and service model data only loaded when the first API client
+is needed (not for --help or usage errors), and the session, credentials and clients using them are reused by every
+check run in the same process, such as in a persistent runner or batch mode
+
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
     https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html
@@ -40,8 +45,9 @@ import collections
 import logging
 import os
 import sys
+import threading
+import time
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
@@ -54,11 +60,16 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
 class AWSAPIPing(NagiosPlugin):
 
+    # shared by all instances so checks run in the same process reuse the loaded session, credentials and clients
+    session = None
+    clients = {}
+    lock = threading.RLock()
+
     def __init__(self):
         # Python 2.x
         super(AWSAPIPing, self).__init__()
@@ -70,10 +81,59 @@ class AWSAPIPing(NagiosPlugin):
     def process_args(self):
         self.no_args()
 
+    @classmethod
+    def get_session(cls):
+        with cls.lock:
+            if cls.session is None:
+                start_time = time.time()
+                # imported on first use as importing boto3 alone costs hundreds of milliseconds
+                import boto3  # pylint: disable=import-outside-toplevel
+                cls.session = boto3.session.Session()
+                log.debug('boto3 session initialized in %.3f secs', time.time() - start_time)
+            return cls.session
+
+    @classmethod
+    def get_client(cls, service, region_name=None, config=None, **credentials):
+        """
+        Returns a boto3 client for the service and region, cached and created on first use when using the session's
+        own credentials
+
+        Clients are thread safe once created, and creating them all from the one session means each service
+        model is only loaded and parsed once however many regions or accounts it is used for
+
+        Clients for explicitly passed credentials such as assumed role temporary keys are not cached as every
+        assume role call returns new keys which expire, so caching them would grow without bound in a long running
+        process
+
+        Sessions aren't thread safe, so all clients are created while holding the lock
+
+        The config only applies when the client is first created
+        """
+        with cls.lock:
+            if credentials:
+                start_time = time.time()
+                client = cls.get_session().client(service, region_name=region_name, config=config, **credentials)
+                log.debug('boto3 %s client for region %s with explicit credentials initialized in %.3f secs',
+                          service, region_name, time.time() - start_time)
+                return client
+            key = (service, region_name)
+            if key not in cls.clients:
+                start_time = time.time()
+                cls.clients[key] = cls.get_session().client(service, region_name=region_name, config=config)
+                log.debug('boto3 %s client for region %s initialized in %.3f secs',
+                          service, region_name, time.time() - start_time)
+            return cls.clients[key]
+
+    @staticmethod
+    def get_client_errors():
+        """Returns the botocore exception base classes, imported lazily the same as boto3"""
+        from botocore.exceptions import BotoCoreError, ClientError  # pylint: disable=import-outside-toplevel
+        return (BotoCoreError, ClientError)
+
     def run(self):
         log.info('testing AWS API call')
         # there isn't really a .ping() type API endpoint so just connect to IAM and list users
-        iam = boto3.client('iam')
+        iam = self.get_client('iam')
         try:
             _ = iam.list_users()
             # just in case we get an iterator, consume it to flush out any error
@@ -42,23 +42,22 @@ from __future__ import print_function
 import os
 import sys
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import ERRORS, CriticalError, log, jsonpp
-    from harisekhon import NagiosPlugin
+    from check_aws_api_ping import AWSAPIPing
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.1.0'
+__version__ = '0.2.0'
 
 
-class CheckAWSCloudTrails(NagiosPlugin):
+class CheckAWSCloudTrails(AWSAPIPing):
 
     def __init__(self):
         # Python 2.x
@@ -87,7 +86,7 @@ class CheckAWSCloudTrails(NagiosPlugin):
         self.no_logfile_validation = self.get_opt('no_logfile_validation')
 
     def run(self):
-        client = boto3.client('cloudtrail')
+        client = self.get_client('cloudtrail')
         log.info('describing cloud trails')
         _ = client.describe_trails()
         log.debug('%s', jsonpp(_))
@@ -37,23 +37,22 @@ from __future__ import print_function
 import os
 import sys
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import ERRORS, CriticalError, log, jsonpp
-    from harisekhon import NagiosPlugin
+    from check_aws_api_ping import AWSAPIPing
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.1.0'
+__version__ = '0.2.0'
 
 
-class CheckAWSConfig(NagiosPlugin):
+class CheckAWSConfig(AWSAPIPing):
 
     def __init__(self):
         # Python 2.x
@@ -74,7 +73,7 @@ class CheckAWSConfig(NagiosPlugin):
         self.recorder_name = self.get_opt('name')
 
     def run(self):
-        client = boto3.client('config')
+        client = self.get_client('config')
         log.info('describing config recorders')
         _ = client.describe_configuration_recorder_status()
         log.debug('%s', jsonpp(_))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 17:58:12 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check the AWS IAM credential report and cache it locally for the other AWS IAM checks
+
+Fetches the IAM credential report at most once per --cache-ttl secs (default: 4 hours, which is how often AWS
+regenerates it anyway) and caches the columns used by the IAM checks locally in a compact columnar form,
+so that the following checks all evaluate from the one cached report in milliseconds instead of each generating
+the report or iterating list_users + list_access_keys per user which is slow and gets throttled with many users:
+
+    check_aws_access_keys_age.py
+    check_aws_access_keys_disabled.py
+    check_aws_root_account.py
+    check_aws_user_last_used.py
+    check_aws_users_mfa_enabled.py
+    check_aws_users_password_last_used.py
+    check_aws_users_unused.py
+
+Outputs the number of users and the age of the credential report
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
+
+Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
+
+    https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html
+
+See also other AWS tools in this repo and the adjacent DevOps Python and Bash tools repos
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+#from __future__ import unicode_literals
+
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, validate_int, UnknownError, support_msg_api
+    from check_aws_api_ping import AWSAPIPing
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.2.0'
+
+
+class CheckAWSCredentialReport(AWSAPIPing):
+
+    # only the credential report columns used by the IAM checks are kept in the cache
+    columns = (
+        'user',
+        'user_creation_time',
+        'password_enabled',
+        'password_last_used',
+        'mfa_active',
+        'access_key_1_active',
+        'access_key_1_last_rotated',
+        'access_key_1_last_used_date',
+        'access_key_2_active',
+        'access_key_2_last_rotated',
+        'access_key_2_last_used_date',
+    )
+
+    # credential report placeholders for timestamps
+    no_timestamp = ('N/A', 'no_information', 'not_supported', '')
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckAWSCredentialReport, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.cache_ttl = None
+        self.report = None
+        self.now = None
+        self.msg = 'CheckAWSCredentialReport msg not defined'
+        self.ok()
+
+    def add_options(self):
+        self.add_report_options()
+
+    def add_report_options(self):
+        self.add_opt('--cache-ttl', metavar='secs', default=14400,
+                     help='Secs to reuse the locally cached IAM credential report for, 0 to disable ' + \
+                          '(default: 14400 ie. 4 hours, the same as AWS regenerates it)')
+
+    def process_args(self):
+        self.no_args()
+        self.process_report_options()
+
+    def process_report_options(self):
+        self.cache_ttl = self.get_opt('cache_ttl')
+        validate_int(self.cache_ttl, 'cache ttl', 0, 86400)
+        self.cache_ttl = int(self.cache_ttl)
+
+    def get_cache_file(self):
+        # keyed on the credentials in use so different accounts / profiles don't share a cached report
+        credentials = self.get_session().get_credentials()
+        access_key = credentials.access_key if credentials else ''
+        return os.path.join(tempfile.gettempdir(), 'aws_credential_report_{0}.json'\
+                            .format(hashlib.md5(access_key.encode('utf-8')).hexdigest()))
+
+    def read_cache(self, cache_file):
+        try:
+            with os.fdopen(os.open(cache_file, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))) as filehandle:
+                # the temp dir is shared, don't let another user plant a report to pass the security checks
+                file_stat = os.fstat(filehandle.fileno())
+                if file_stat.st_uid != os.getuid() or file_stat.st_mode & 0o022:
+                    log.warning('ignoring cached credential report %s not owned by us or writable by others',
+                                cache_file)
+                    return None
+                report = json.load(filehandle)
+        except (IOError, OSError, ValueError) as _:
+            log.info('no usable cached credential report %s: %s', cache_file, _)
+            return None
+        age = time.time() - report.get('fetched', 0)
+        if age > self.cache_ttl or age < 0:
+            log.info('cached credential report %s expired (%d secs old)', cache_file, age)
+            return None
+        log.info('using cached credential report %s (%d secs old)', cache_file, age)
+        return report
+
+    @staticmethod
+    def write_cache(cache_file, report):
+        tmp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        try:
+            # O_EXCL so a symlink planted at the predictable temp path is never followed
+            if os.path.lexists(tmp_file):
+                os.remove(tmp_file)
+            # user names and key usage are sensitive so only readable by the user running the checks
+            with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as filehandle:
+                json.dump(report, filehandle)
+            # atomic rename so concurrent checks never read a partially written report
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as _:
+            log.warning('failed to write cached credential report %s: %s', cache_file, _)
+
+    def fetch_report(self):
+        iam = self.get_client('iam')
+        log.info('generating credentials report')
+        while True:
+            result = iam.generate_credential_report()
+            log.debug('%s', result)
+            if result['State'] == 'COMPLETE':
+                log.info('credentials report generated')
+                break
+            log.info('waiting for credentials report')
+            time.sleep(1)
+        result = iam.get_credential_report()
+        csv_content = result['Content']
+        if not isinstance(csv_content, str):
+            csv_content = csv_content.decode('utf-8')
+        log.debug('%s', csv_content)
+        csvreader = csv.reader(csv_content.splitlines())
+        headers = next(csvreader)
+        for column in self.columns:
+            if column not in headers:
+                raise UnknownError("credential report column '{0}' not found. {1}".format(column, support_msg_api()))
+        indexes = [headers.index(column) for column in self.columns]
+        rows = list(csvreader)
+        report = {
+            'fetched': time.time(),
+            'generated': result['GeneratedTime'].strftime('%Y-%m-%dT%H:%M:%S'),
+            'columns': dict([(column, [row[index] for row in rows])
+                             for (column, index) in zip(self.columns, indexes)]),
+        }
+        return report
+
+    def get_report(self):
+        if self.report is None:
+            cache_file = self.get_cache_file()
+            if self.cache_ttl:
+                self.report = self.read_cache(cache_file)
+            if self.report is None:
+                self.report = self.fetch_report()
+                if self.cache_ttl:
+                    self.write_cache(cache_file, self.report)
+        self.now = datetime.utcnow()
+        return self.report
+
+    def get_columns(self, *names):
+        """Returns rows of the given columns for all users from the cached report"""
+        report = self.get_report()
+        return zip(*[report['columns'][name] for name in names])
+
+    def get_age_secs(self, timestamp):
+        """Returns secs since a credential report timestamp or None if it has never happened"""
+        if timestamp in self.no_timestamp:
+            return None
+        # %z not working in Python 2.7 but we already know it's +00:00
+        _datetime = datetime.strptime(timestamp.split('+')[0], '%Y-%m-%dT%H:%M:%S')
+        return (self.now - _datetime).total_seconds()
+
+    def run(self):
+        report = self.get_report()
+        num_users = len(report['columns']['user'])
+        report_age = self.get_age_secs(report['generated'])
+        cache_age = time.time() - report['fetched']
+        self.msg = 'AWS IAM credential report has {0} users, generated {1:.0f} secs ago'.format(num_users, report_age)
+        self.msg += ' | num_users={0} report_age={1:.0f}s cache_age={2:.0f}s'.format(num_users, report_age, cache_age)
+
+
+if __name__ == '__main__':
+    CheckAWSCredentialReport().main()
@@ -18,6 +18,16 @@
 
 Nagios Plugin to check the number of running EC2 instances with optional threshold ranges
 
+Fans out across a list of --regions (or all enabled regions) and a list of IAM roles to assume in other accounts
+using a bounded pool of --threads, so checking many regions across many accounts takes about as long as the slowest
+region rather than the sum of them all
+
+Uses server-side filters for the instance --state and --tag options and only keeps the instance state names from each
+page of results rather than the full instance descriptions (the EC2 API has no server-side field selection)
+
+Results are aggregated per account and region, and the thresholds can apply to the total, to each account or to
+each account region via --level
+
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
     https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html
@@ -34,65 +44,258 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import logging
 import os
 import sys
+import time
 import traceback
-import boto3
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import log, jsonpp
-    from harisekhon import NagiosPlugin
+    from harisekhon.utils import log, plural, validate_int, UnknownError
+    from check_aws_api_ping import AWSAPIPing
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.1.0'
+__version__ = '0.3.0'
 
 
-class CheckAwsEC2InstanceCount(NagiosPlugin):
+class CheckAwsEC2InstanceCount(AWSAPIPing):
+
+    levels = ('total', 'account', 'region')
 
     def __init__(self):
         # Python 2.x
         super(CheckAwsEC2InstanceCount, self).__init__()
         # Python 3.x
         # super().__init__()
+        self.regions = None
+        self.role_arns = None
+        self.filters = []
+        self.threads = None
+        self.level = None
+        self.errors = []
         self.msg = 'AWS EC2 instance count msg not defined'
         self.ok()
 
     def add_options(self):
+        self.add_inventory_options()
         self.add_thresholds()
 
+    def add_inventory_options(self):
+        self.add_opt('--regions', metavar='region1,region2',
+                     help="Comma separated list of regions to check or 'all' for all enabled regions " + \
+                          "(default: the configured default region)")
+        self.add_opt('--role-arns', metavar='arn1,arn2',
+                     help='Comma separated list of IAM role ARNs to assume to check other accounts ' + \
+                          '(default: only the account of the configured credentials)')
+        self.add_opt('--state', metavar='state1,state2',
+                     help='Comma separated list of instance states to restrict to (filtered server-side)')
+        self.add_opt('--tag', metavar='key=value,key2=value2',
+                     help='Comma separated list of tags to restrict instances to (filtered server-side)')
+        self.add_opt('--threads', metavar='N', default=20,
+                     help='Number of accounts / regions to query in parallel (default: 20)')
+        self.add_opt('--level', default='total',
+                     help='Apply thresholds to the {0} (default: total)'.format(' / '.join(self.levels)))
+
     def process_args(self):
         self.no_args()
+        self.process_inventory_args()
         self.validate_thresholds(optional=True)
 
-    def run(self):
-        log.info('testing AWS API call')
-        # there isn't really a .ping() type API endpoint so just connect to IAM and list users
-        ec2 = boto3.client('ec2')
-        num_instances = 0
-        running_instances = 0
+    def process_inventory_args(self):
+        regions = self.get_opt('regions')
+        if regions:
+            self.regions = [_.strip() for _ in regions.split(',') if _.strip()]
+        role_arns = self.get_opt('role_arns')
+        if role_arns:
+            self.role_arns = [_.strip() for _ in role_arns.split(',') if _.strip()]
+            for role_arn in self.role_arns:
+                if not role_arn.startswith('arn:') or len(role_arn.split(':')) < 6:
+                    self.usage("invalid --role-arns '{0}', must be in the form ".format(role_arn) + \
+                               'arn:aws:iam::<account_id>:role/<role_name>')
+        state = self.get_opt('state')
+        if state:
+            self.filters.append({'Name': 'instance-state-name',
+                                 'Values': [_.strip() for _ in state.split(',') if _.strip()]})
+        tags = self.get_opt('tag')
+        if tags:
+            for tag in tags.split(','):
+                if '=' not in tag:
+                    self.usage("invalid --tag '{0}', must be in the form key=value".format(tag))
+                (key, value) = tag.split('=', 1)
+                self.filters.append({'Name': 'tag:{0}'.format(key.strip()), 'Values': [value.strip()]})
+        self.threads = self.get_opt('threads')
+        validate_int(self.threads, 'threads', 1, 100)
+        self.threads = int(self.threads)
+        self.level = self.get_opt('level')
+        if self.level not in self.levels:
+            self.usage('--level must be one of: {0}'.format(', '.join(self.levels)))
+
+    def get_client_config(self):
+        from botocore.config import Config  # pylint: disable=import-outside-toplevel
+        # bound each API call so the slowest region can't hold the whole check past its timeout
+        return Config(connect_timeout=max(1, self.timeout // 3),
+                      read_timeout=max(1, self.timeout // 2),
+                      retries={'max_attempts': 2})
+
+    def get_accounts(self):
+        """Returns a list of (account, credentials) assuming each role in parallel"""
+        if self.get_session().get_credentials() is None:
+            raise UnknownError('no AWS credentials found')
+        if not self.role_arns:
+            # use the shared session's own credentials
+            return [('default', {})]
+        pool = ThreadPool(min(self.threads, len(self.role_arns)))
+        try:
+            results = pool.map(self.assume_role, self.role_arns)
+        finally:
+            pool.close()
+        return [_ for _ in results if _ is not None]
+
+    def assume_role(self, role_arn):
+        account = role_arn.split(':')[4]
+        log.info('assuming role %s', role_arn)
+        try:
+            sts = self.get_client('sts', config=self.get_client_config())
+            _ = sts.assume_role(RoleArn=role_arn, RoleSessionName='nagios-plugins',
+                                DurationSeconds=900)['Credentials']
+        except self.get_client_errors() as _:
+            self.errors.append('{0}: {1}'.format(account, _))
+            return None
+        return (account, {
+            'aws_access_key_id': _['AccessKeyId'],
+            'aws_secret_access_key': _['SecretAccessKey'],
+            'aws_session_token': _['SessionToken'],
+        })
+
+    def get_regions(self, accounts):
+        if self.regions and self.regions != ['all']:
+            return self.regions
+        region_name = self.get_session().region_name
+        if not self.regions:
+            if not region_name:
+                self.usage('no default AWS region configured, must specify --regions')
+            return [region_name]
+        log.info('listing enabled regions')
+        ec2 = self.get_client('ec2', region_name=region_name, config=self.get_client_config(), **accounts[0][1])
+        return sorted([_['RegionName'] for _ in ec2.describe_regions()['Regions']])
+
+    def get_instance_states(self, target):
+        """Returns a dict of instance state name => count for one (account, region, credentials)"""
+        (account, region, credentials) = target
+        log.info('describing instances in account %s region %s', account, region)
+        # all region clients come from the one shared session so the EC2 service model is only loaded once
+        ec2 = self.get_client('ec2', region_name=region, config=self.get_client_config(), **credentials)
         describe_instances = ec2.get_paginator('describe_instances')
-        flatten = lambda _: [item for sublist in _ for item in sublist]
-        # this might time out if there are a lot of EC2 instances
-        for instances_response in describe_instances.paginate():
-            if log.isEnabledFor(logging.DEBUG):
-                log.debug('\n\n%s', jsonpp(instances_response))
-            instances = flatten([_['Instances'] for _ in instances_response['Reservations']])
-            for instance in instances:
-                num_instances += 1
-                if instance['State']['Name'] == 'running':
-                    running_instances += 1
+        states = {}
+        kwargs = {'PaginationConfig': {'PageSize': 1000}}
+        if self.filters:
+            kwargs['Filters'] = self.filters
+        # only keep the state names from each page rather than the full instance descriptions
+        for state in describe_instances.paginate(**kwargs).search('Reservations[].Instances[].State.Name'):
+            states[state] = states.get(state, 0) + 1
+        log.debug('account %s region %s instance states: %s', account, region, states)
+        return states
+
+    def safe_get_instance_states(self, target):
+        try:
+            return (target[0], target[1], self.get_instance_states(target))
+        except self.get_client_errors() as _:
+            self.errors.append('{0}/{1}: {2}'.format(target[0], target[1], _))
+            return (target[0], target[1], None)
+
+    def get_inventory(self):
+        """Returns an OrderedDict of (account, region) => {state: count} queried in parallel"""
+        start_time = time.time()
+        accounts = self.get_accounts()
+        inventory = OrderedDict()
+        if not accounts:
+            return (inventory, time.time() - start_time)
+        regions = self.get_regions(accounts)
+        targets = [(account, region, credentials) for (account, credentials) in accounts for region in regions]
+        pool = ThreadPool(min(self.threads, len(targets)))
+        try:
+            for (account, region, states) in pool.map(self.safe_get_instance_states, targets):
+                if states is not None:
+                    inventory[(account, region)] = states
+        finally:
+            pool.close()
+        return (inventory, time.time() - start_time)
+
+    def get_groups(self, inventory):
+        """Returns an OrderedDict of group name => {state: count} for the --level of thresholds"""
+        groups = OrderedDict()
+        for ((account, region), states) in inventory.items():
+            if self.level == 'account':
+                name = account
+            elif self.level == 'region':
+                name = '{0}/{1}'.format(account, region)
+            else:
+                name = 'total'
+            group = groups.setdefault(name, {})
+            for (state, count) in states.items():
+                group[state] = group.get(state, 0) + count
+        return groups
+
+    def check_errors(self):
+        if self.errors:
+            self.unknown()
+            self.msg += ', {0} error{1} querying AWS: {2}'.format(len(self.errors), plural(len(self.errors)),
+                                                                 '; '.join(self.errors))
+
+    def get_group_status(self, value):
+        for status in ('critical', 'warning'):
+            threshold = self.get_threshold(status, optional=True).thresholds
+            if threshold['upper'] is not None and value > threshold['upper']:
+                return status
+            if threshold['lower'] is not None and value < threshold['lower']:
+                return status
+        return None
+
+    def run(self):
+        (inventory, query_time) = self.get_inventory()
+        num_instances = sum([sum(_.values()) for _ in inventory.values()])
+        running_instances = sum([_.get('running', 0) for _ in inventory.values()])
         self.msg = 'AWS EC2 {} running instances'.format(running_instances)
-        self.check_thresholds(running_instances)
+        if self.level == 'total':
+            self.check_thresholds(running_instances)
         self.msg += ' out of {} total instances'.format(num_instances)
+        if len(inventory) > 1:
+            accounts = len(set([account for (account, _) in inventory]))
+            self.msg += ' across {} account{} and {} account region{}'\
+                        .format(accounts, plural(accounts), len(inventory), plural(len(inventory)))
+        groups = self.get_groups(inventory)
+        if self.level != 'total':
+            self.check_groups(groups)
+        self.check_errors()
         self.msg += ' | total={}'.format(num_instances)
-        self.msg += ' running={}{}'.format(running_instances, self.get_perf_thresholds())
+        self.msg += ' running={}{}'.format(running_instances,
+                                           self.get_perf_thresholds() if self.level == 'total' else '')
+        if self.level != 'total':
+            for (name, states) in groups.items():
+                self.msg += " '{}_running'={}{}".format(name, states.get('running', 0), self.get_perf_thresholds())
+        self.msg += ' query_time={:.2f}s'.format(query_time)
+
+    def check_groups(self, groups):
+        breaching = []
+        for (name, states) in groups.items():
+            running = states.get('running', 0)
+            status = self.get_group_status(running)
+            if status == 'critical':
+                self.critical()
+            elif status == 'warning':
+                self.warning()
+            if status:
+                breaching.append('{}={}'.format(name, running))
+        if breaching:
+            self.msg += ', {} {}{} outside thresholds: {}'.format(len(breaching), self.level,
+                                                                  plural(len(breaching)), ', '.join(breaching))
 
 
 if __name__ == '__main__':
@@ -20,6 +20,9 @@ Nagios Plugin to check AWS EC2 instance states, raising warnings for non-running
 
 Checks warning thresholds for each status type (aggregates stopped / stopping / shutting-down states)
 
+Fans out across --regions and assumed --role-arns accounts in parallel the same as check_aws_ec2_instance_count.py,
+and the max state thresholds can apply to the total, to each account or to each account region via --level
+
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
     https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html
@@ -36,28 +39,28 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import logging
 import os
 import sys
 import traceback
 from collections import OrderedDict
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import log, jsonpp
-    from harisekhon import NagiosPlugin
+    from harisekhon.utils import plural
+    from check_aws_ec2_instance_count import CheckAwsEC2InstanceCount
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
+
 
+class CheckAwsEC2InstanceStates(CheckAwsEC2InstanceCount):
 
-class CheckAwsEC2InstanceStates(NagiosPlugin):
+    stopped_bundle = ('stopped', 'stopping', 'shutting-down')
 
     def __init__(self):
         # Python 2.x
@@ -78,9 +81,11 @@ class CheckAwsEC2InstanceStates(NagiosPlugin):
                      help="Max instances in stopped / stopping / shutting-down state (default: 0)")
         self.add_opt('-T', '--max-terminated', default=0, type=int,
                      help="Max instances in terminated state (default: 0)")
+        self.add_inventory_options()
 
     def process_args(self):
         self.no_args()
+        self.process_inventory_args()
         self.thresholds = {
             'running': self.get_opt('max_running'),
             'pending': self.get_opt('max_pending'),
@@ -89,11 +94,7 @@ class CheckAwsEC2InstanceStates(NagiosPlugin):
         }
 
     def run(self):
-        log.info('testing AWS API call')
-        # there isn't really a .ping() type API endpoint so just connect to IAM and list users
-        ec2 = boto3.client('ec2')
-        #instances = ec2.describe_instances()
-        describe_instances = ec2.get_paginator('describe_instances')
+        (inventory, query_time) = self.get_inventory()
         statuses = OrderedDict(
             [
                 ('running', 0),
@@ -103,47 +104,70 @@ class CheckAwsEC2InstanceStates(NagiosPlugin):
                 ('shutting-down', 0),
             ]
         )
-        flatten = lambda _: [item for sublist in _ for item in sublist]
-        # this might time out if there are a lot of EC2 instances
-        for instances_response in describe_instances.paginate():
-            if log.isEnabledFor(logging.DEBUG):
-                log.debug('\n\n%s', jsonpp(instances_response))
-            instances = flatten([_['Instances'] for _ in instances_response['Reservations']])
-            for instance in instances:
-                self.instance_count += 1
-                #if log.isEnabledFor(logging.DEBUG):
-                #    log.debug('\n\n%s', instance)
-                statuses[instance['State']['Name']] = statuses.get(instance['State']['Name'], 0) + 1
+        for states in inventory.values():
+            for (state, count) in states.items():
+                self.instance_count += count
+                statuses[state] = statuses.get(state, 0) + count
         self.msg = 'AWS EC2 instance total = {}'.format(self.instance_count)
-        self.check_statuses(statuses)
+        self.check_statuses(statuses, inventory)
+        self.msg += ' query_time={:.2f}s'.format(query_time)
 
-    def check_statuses(self, statuses):
-        stopped_bundle = ['stopped', 'stopping', 'shutting-down']
+    def get_breached_statuses(self, statuses):
+        """Returns the statuses exceeding their max thresholds, stopped states are aggregated as 'stopped'"""
+        thresholds = self.thresholds
+        breached = []
+        total_stopped = sum([statuses.get(_, 0) for _ in self.stopped_bundle])
+        if total_stopped > thresholds['stopped']:
+            breached.append('stopped')
+        for status in statuses:
+            if status in self.stopped_bundle:
+                continue
+            elif status in thresholds:
+                if thresholds[status] is not None and statuses[status] > thresholds[status]:
+                    breached.append(status)
+            elif statuses[status]:
+                breached.append(status)
+        return breached
+
+    def check_statuses(self, statuses, inventory):
+        stopped_bundle = self.stopped_bundle
         thresholds = self.thresholds
+        breached = self.get_breached_statuses(statuses) if self.level == 'total' else []
         for status in statuses:
             self.msg += ', {} = {}'.format(status, statuses[status])
-            if status in thresholds:
-                if thresholds[status] is None:
-                    continue
-                elif statuses[status] > thresholds[status]:
-                    self.msg_warn()
-            elif status in stopped_bundle:
-                total_stopped = 0
-                for _ in stopped_bundle:
-                    total_stopped += statuses[_]
-                if total_stopped > thresholds['stopped']:
-                    self.warning()
-            else:
+            if status in breached:
                 self.msg_warn()
+            elif status in stopped_bundle and 'stopped' in breached:
+                self.warning()
+        if self.level != 'total':
+            self.check_group_statuses(self.get_groups(inventory))
+        self.check_errors()
         self.msg += ' | total={}'.format(self.instance_count)
         for status in statuses:
             self.msg += ' {}={}'.format(status, statuses[status])
+            if self.level != 'total':
+                continue
             if status in thresholds:
                 if thresholds[status] is not None:
                     self.msg += ';{}'.format(thresholds[status])
             elif status in stopped_bundle:
                 self.msg += ';{}'.format(thresholds['stopped'])
 
+    def check_group_statuses(self, groups):
+        breaching = []
+        for (name, states) in groups.items():
+            breached = self.get_breached_statuses(states)
+            if breached:
+                self.warning()
+                breaching.append('{} [{}]'.format(name, ', '.join(
+                    ['{}={}'.format(status,
+                                    sum([states.get(_, 0) for _ in self.stopped_bundle])
+                                    if status == 'stopped' else states[status])
+                     for status in breached])))
+        if breaching:
+            self.msg += ', {} {}{} exceeding max states: {}'.format(len(breaching), self.level,
+                                                                   plural(len(breaching)), '; '.join(breaching))
+
     def msg_warn(self):
         self.warning()
         self.msg += ' (!)'
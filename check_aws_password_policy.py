@@ -35,23 +35,22 @@ from __future__ import print_function
 import os
 import sys
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, jsonpp, validate_int, WarningError
-    from harisekhon import NagiosPlugin
+    from check_aws_api_ping import AWSAPIPing
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.1.0'
+__version__ = '0.2.0'
 
 
-class CheckAWSPasswordPolicy(NagiosPlugin):
+class CheckAWSPasswordPolicy(AWSAPIPing):
 
     def __init__(self):
         # Python 2.x
@@ -90,7 +89,7 @@ class CheckAWSPasswordPolicy(NagiosPlugin):
         self.pw_reuse = int(self.pw_reuse)
 
     def run(self):
-        iam = boto3.client('iam')
+        iam = self.get_client('iam')
         log.info('getting password policy')
         try:
             _ = iam.get_account_password_policy()
@@ -18,6 +18,11 @@
 
 Nagios Plugin to check the AWS root account has MFA enabled and no access keys as per best practices
 
+Uses the root account row of the IAM credential report, which is cached locally and shared with the other AWS IAM
+checks, see check_aws_credential_report.py
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
+
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
     https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html
@@ -34,23 +39,22 @@ from __future__ import print_function
 import os
 import sys
 import traceback
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import log, jsonpp, plural
-    from harisekhon import NagiosPlugin
+    from harisekhon.utils import log, plural, UnknownError
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
-class CheckAWSRootAccount(NagiosPlugin):
+class CheckAWSRootAccount(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -60,22 +64,21 @@ class CheckAWSRootAccount(NagiosPlugin):
         self.msg = 'CheckAWSRootAccount msg not defined'
         self.ok()
 
-    def process_args(self):
-        self.no_args()
-
-    # must be an instance method for inheritance subclassing to match
-    # pylint: disable=no-self-use
     def run(self):
-        iam = boto3.client('iam')
-        log.info('getting account summary')
-        _ = iam.get_account_summary()
-        log.debug('%s', jsonpp(_))
-        account_summary = _['SummaryMap']
-        mfa_enabled = account_summary['AccountMFAEnabled']
-        access_keys = account_summary['AccountAccessKeysPresent']
+        for row in self.get_columns('user',
+                                    'mfa_active',
+                                    'access_key_1_last_rotated',
+                                    'access_key_2_last_rotated'):
+            if row[0] == '<root_account>':
+                break
+        else:
+            raise UnknownError('AWS root account not found in credential report')
+        log.debug('root account: %s', row)
+        mfa_enabled = row[1] == 'true'
+        access_keys = len([_ for _ in row[2:] if _ not in self.no_timestamp])
         if access_keys or not mfa_enabled:
             self.warning()
-        self.msg = 'AWS root account MFA enabled = {}{}'.format(bool(mfa_enabled), ' (!)' if not mfa_enabled else "")
+        self.msg = 'AWS root account MFA enabled = {}{}'.format(mfa_enabled, ' (!)' if not mfa_enabled else "")
         self.msg += ', {} access key{} found{}'.format(access_keys, plural(access_keys), ' (!)' if access_keys else "")
 
 
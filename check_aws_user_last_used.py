@@ -21,10 +21,11 @@ Nagios Plugin to warn if a given AWS IAM user account was used recently
 Designed to alert on root account activity by default
 as this is against best practice and may indicate a security breach
 
-Generates an IAM credential report, then parses it to determine the time since the given user's
-password and access keys were last used
+Uses the IAM credential report to determine the time since the given user's password and access keys were last used
 
-Requires iam:GenerateCredentialReport on resource: *
+The credential report is cached locally and shared with the other AWS IAM checks, see check_aws_credential_report.py
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
 
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
@@ -42,32 +43,26 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import csv
 import os
 import sys
-import time
 import traceback
-from datetime import datetime
-from io import StringIO
 from math import floor
-import boto3
-from botocore.exceptions import ClientError
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, plural, validate_int, UnknownError
-    from harisekhon import NagiosPlugin
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
-class AWSuserLastUsed(NagiosPlugin):
+class AWSuserLastUsed(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -76,17 +71,17 @@ class AWSuserLastUsed(NagiosPlugin):
         # super().__init__()
         self.user = None
         self.days = None
-        self.now = None
         self.msg = 'AWSuserLastUsed msg not defined'
         self.ok()
 
     def add_options(self):
+        super(AWSuserLastUsed, self).add_options()
         self.add_opt('-u', '--user', default='root', help='User to check on (default: root)')
         self.add_opt('-d', '--days', default=7, type=int,
                      help='Warn if the given account was used in the last N days (default: 7)')
 
     def process_args(self):
-        self.no_args()
+        super(AWSuserLastUsed, self).process_args()
         self.user = self.get_opt('user')
         if self.user == 'root':
             self.user = '<root_account>'
@@ -94,40 +89,21 @@ class AWSuserLastUsed(NagiosPlugin):
         validate_int(self.days, 'days')
 
     def run(self):
-        iam = boto3.client('iam')
-        log.info('generating credentials report')
-        while True:
-            result = iam.generate_credential_report()
-            log.debug('%s', result)
-            if result['State'] == 'COMPLETE':
-                log.info('credentials report generated')
-                break
-            log.info('waiting for credentials report')
-            time.sleep(1)
-        try:
-            result = iam.get_credential_report()
-        except ClientError as _:
-            raise
-        csv_content = result['Content']
-        log.debug('%s', csv_content)
-        filehandle = StringIO(unicode(csv_content))
-        filehandle.seek(0)
-        csvreader = csv.reader(filehandle)
-        headers = next(csvreader)
-        assert headers[0] == 'user'
-        assert headers[4] == 'password_last_used'
-        assert headers[10] == 'access_key_1_last_used_date'
-        assert headers[15] == 'access_key_2_last_used_date'
-        self.now = datetime.utcnow()
+        last_used_days = None
         found = False
-        for row in csvreader:
-            user = row[0]
-            if user != self.user:
+        for row in self.get_columns('user',
+                                    'password_last_used',
+                                    'access_key_1_last_used_date',
+                                    'access_key_2_last_used_date'):
+            if row[0] != self.user:
                 continue
             found = True
             last_used_days = self.get_user_last_used_days(row)
         if not found:
             raise UnknownError('AWS user {} not found'.format(self.user))
+        if last_used_days is None:
+            self.msg = 'AWS user {} has never been used'.format(self.user)
+            return
         if last_used_days <= self.days:
             self.warning()
         if last_used_days == 0:
@@ -137,25 +113,19 @@ class AWSuserLastUsed(NagiosPlugin):
         self.msg += ' | last_used_days={};0;;{}'.format(last_used_days, self.days)
 
     def get_user_last_used_days(self, row):
-        log.debug('processing user: %s', row)
-        user = row[0]
-        password_last_used = row[4]
-        access_key_1_last_used_date = row[10]
-        access_key_2_last_used_date = row[15]
+        (user, password_last_used, access_key_1_last_used_date, access_key_2_last_used_date) = row
         log.debug('user: %s, password_last_used: %s, access_key_1_last_used_date: %s, access_key_2_last_used_date: %s',
                   user, password_last_used, access_key_1_last_used_date, access_key_2_last_used_date)
-        min_age = None
-        for _ in [password_last_used, access_key_1_last_used_date, access_key_2_last_used_date]:
-            if _ == 'N/A':
-                continue
-            # %z not working in Python 2.7 but we already know it's +00:00
-            _datetime = datetime.strptime(_.split('+')[0], '%Y-%m-%dT%H:%M:%S')
-            age_timedelta = self.now - _datetime.replace(tzinfo=None)
-            age_days = int(floor(age_timedelta.total_seconds() / 86400.0))
-            if min_age is None or age_days < min_age:
-                min_age = age_days
+        ages = [self.get_age_secs(_) for _ in (password_last_used,
+                                               access_key_1_last_used_date,
+                                               access_key_2_last_used_date)]
+        ages = [_ for _ in ages if _ is not None]
+        if not ages:
+            log.debug('user %s has never been used', user)
+            return None
+        min_age = int(floor(min(ages) / 86400.0))
         log.debug('user %s was last used %s days ago', user, min_age)
-        return age_days
+        return min_age
 
 
 if __name__ == '__main__':
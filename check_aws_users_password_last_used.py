@@ -18,7 +18,11 @@
 
 Nagios Plugin to check the age of AWS IAM user accounts last password used to find and remove old users
 
-Iterates all AWS IAM users so if you have a lot of users you will need to increase the --timeout
+Uses the password last used dates in the IAM credential report rather than iterating all AWS IAM users, which is slow
+and gets throttled with a lot of users. The credential report is cached locally and shared with the other AWS IAM
+checks, see check_aws_credential_report.py
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
 
 Verbose mode will output the users, date of last password use and days ago
 
@@ -38,28 +42,26 @@ from __future__ import division
 from __future__ import print_function
 #from __future__ import unicode_literals
 
-import datetime
 import os
 import sys
 import traceback
 from math import ceil
-import boto3
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, validate_float
-    from harisekhon import NagiosPlugin
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.1.0'
+__version__ = '0.2.0'
 
 
-class AWSUsersPwLastUsed(NagiosPlugin):
+class AWSUsersPwLastUsed(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -71,41 +73,31 @@ class AWSUsersPwLastUsed(NagiosPlugin):
         self.ok()
 
     def add_options(self):
+        super(AWSUsersPwLastUsed, self).add_options()
         self.add_opt('-a', '--age', default=365, type=int,
                      help='Return warning on keys older than N days (default 365)')
 
     def process_args(self):
-        self.no_args()
+        super(AWSUsersPwLastUsed, self).process_args()
         self.age = self.get_opt('age')
         validate_float(self.age, 'age')
         self.age = int(self.age)
 
     def run(self):
-        iam = boto3.client('iam')
-        user_paginator = iam.get_paginator('list_users')
-        now = datetime.datetime.utcnow()
         count = 0
-        for users_response in user_paginator.paginate():
-            for user_item in users_response['Users']:
-                log.debug('%s', user_item)
-                username = user_item['UserName']
-                if not 'PasswordLastUsed' in user_item:
-                    log.debug('no PasswordLastUsed field for user %s, skipping...', username)
-                    continue
-                # already cast to datetime.datetime with tzinfo
-                password_last_used = user_item['PasswordLastUsed']
-                # removing tzinfo for comparison to avoid below error
-                # - both are UTC and this doesn't make much difference anyway
-                # TypeError: can't subtract offset-naive and offset-aware datetimes
-                age_timedelta = now - password_last_used.replace(tzinfo=None)
-                age_days = ceil(age_timedelta.total_seconds() / 86400.0)
-                if age_days < self.age:
-                    continue
-                log.info('{user:20}\t{date}\t ({days} days)'.format(
-                    user=username,
-                    date=password_last_used,
-                    days=age_days))
-                count += 1
+        for (username, password_last_used) in self.get_columns('user', 'password_last_used'):
+            age_secs = self.get_age_secs(password_last_used)
+            if age_secs is None:
+                log.debug('no password last used for user %s, skipping...', username)
+                continue
+            age_days = ceil(age_secs / 86400.0)
+            if age_days < self.age:
+                continue
+            log.info('{user:20}\t{date}\t ({days} days)'.format(
+                user=username,
+                date=password_last_used,
+                days=age_days))
+            count += 1
         if count:
             self.warning()
         self.msg = '{} AWS IAM users with passwords last used more than {} days ago'.format(count, self.age)
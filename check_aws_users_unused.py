@@ -22,11 +22,13 @@ Excludes root account which should not normally be used and should have a higher
 
 Default days is 90 as per the CIS AWS Security whitepaper
 
-Generates an IAM credential report, then parses it to determine the time since each user's password
-and access keys were last used, using the most recent timestamps among the password and access keys
-one as the last used age of the account
+Uses the IAM credential report to determine the time since each user's password and access keys were last used,
+using the most recent timestamps among the password and access keys as the last used age of the account,
+falling back to the user creation time for users that have never been used
 
-Requires iam:GenerateCredentialReport on resource: *
+The credential report is cached locally and shared with the other AWS IAM checks, see check_aws_credential_report.py
+
+Requires iam:GenerateCredentialReport and iam:GetCredentialReport on resource: *
 
 Uses the Boto python library, read here for the list of ways to configure your AWS credentials:
 
@@ -44,32 +46,26 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import csv
 import os
 import sys
-import time
 import traceback
-from datetime import datetime
-from io import StringIO
 from math import floor
-import boto3
-from botocore.exceptions import ClientError
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, plural, validate_int
-    from harisekhon import NagiosPlugin
+    from check_aws_credential_report import CheckAWSCredentialReport
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 
 
-class AWSUsersUnused(NagiosPlugin):
+class AWSUsersUnused(CheckAWSCredentialReport):
 
     def __init__(self):
         # Python 2.x
@@ -77,48 +73,29 @@ class AWSUsersUnused(NagiosPlugin):
         # Python 3.x
         # super().__init__()
         self.days = None
-        self.now = None
         self.msg = 'AWSUsersUnused msg not defined'
         self.ok()
 
     def add_options(self):
+        super(AWSUsersUnused, self).add_options()
         self.add_opt('-d', '--days', default=90, type=int,
                      help='Warn if accounts present that have been unused in the last N days (default: 90)')
 
     def process_args(self):
-        self.no_args()
+        super(AWSUsersUnused, self).process_args()
         self.days = self.get_opt('days')
         validate_int(self.days, 'days')
 
     def run(self):
-        iam = boto3.client('iam')
-        log.info('generating credentials report')
-        while True:
-            result = iam.generate_credential_report()
-            log.debug('%s', result)
-            if result['State'] == 'COMPLETE':
-                log.info('credentials report generated')
-                break
-            log.info('waiting for credentials report')
-            time.sleep(1)
-        try:
-            result = iam.get_credential_report()
-        except ClientError as _:
-            raise
-        csv_content = result['Content']
-        log.debug('%s', csv_content)
-        filehandle = StringIO(unicode(csv_content))
-        filehandle.seek(0)
-        csvreader = csv.reader(filehandle)
-        headers = next(csvreader)
-        assert headers[0] == 'user'
-        assert headers[4] == 'password_last_used'
-        assert headers[10] == 'access_key_1_last_used_date'
-        assert headers[15] == 'access_key_2_last_used_date'
         user_count = 0
         old_user_count = 0
-        self.now = datetime.utcnow()
-        for row in csvreader:
+        for row in self.get_columns('user',
+                                    'user_creation_time',
+                                    'password_last_used',
+                                    'access_key_1_last_used_date',
+                                    'access_key_2_last_used_date'):
+            if row[0] == '<root_account>':
+                continue
             if not self.check_user_last_used(row):
                 old_user_count += 1
             user_count += 1
@@ -128,26 +105,24 @@ class AWSUsersUnused(NagiosPlugin):
             old_user_count, plural(old_user_count), self.days)
         self.msg += ' | num_old_users={} num_users={}'.format(old_user_count, user_count)
 
-    def check_user_last_used(self, row):
-        log.debug('processing user: %s', row)
-        user = row[0]
-        password_last_used = row[4]
-        access_key_1_last_used_date = row[10]
-        access_key_2_last_used_date = row[15]
+    def get_last_used_days(self, row):
+        (user, user_creation_time, password_last_used,
+         access_key_1_last_used_date, access_key_2_last_used_date) = row
         log.debug('user: %s, password_last_used: %s, access_key_1_last_used_date: %s, access_key_2_last_used_date: %s',
                   user, password_last_used, access_key_1_last_used_date, access_key_2_last_used_date)
-        min_age = None
-        for _ in [password_last_used, access_key_1_last_used_date, access_key_2_last_used_date]:
-            if _ == 'N/A':
-                continue
-            # %z not working in Python 2.7 but we already know it's +00:00
-            _datetime = datetime.strptime(_.split('+')[0], '%Y-%m-%dT%H:%M:%S')
-            age_timedelta = self.now - _datetime.replace(tzinfo=None)
-            age_days = int(floor(age_timedelta.total_seconds() / 86400.0))
-            if min_age is None or age_days < min_age:
-                min_age = age_days
+        ages = [self.get_age_secs(_) for _ in (password_last_used,
+                                               access_key_1_last_used_date,
+                                               access_key_2_last_used_date)]
+        ages = [_ for _ in ages if _ is not None]
+        if not ages:
+            log.debug('user %s has never been used, using creation time', user)
+            ages = [self.get_age_secs(user_creation_time)]
+        min_age = int(floor(min(ages) / 86400.0))
         log.debug('user %s was last used %s days ago', user, min_age)
-        if age_days <= self.days:
+        return min_age
+
+    def check_user_last_used(self, row):
+        if self.get_last_used_days(row) <= self.days:
             return True
         return False
 
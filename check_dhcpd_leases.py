@@ -10,11 +10,28 @@
 
 """Nagios plugin to parse the ISC Dhcp Server lease file and print out a list
 of all the Name/IP/MAC associations or any combination of the three. Can also
-be used to alert on the delegation of IPs to non-recognized MACs or Hostnames"""
+be used to alert on the delegation of IPs to non-recognized MACs or Hostnames
+
+The lease file is streamed a line at a time in a single pass so that large
+lease files with many historical entries don't need to be read into memory,
+and the last entry in the file for each IP wins as per dhcpd semantics
+
+In incremental mode the file inode, parsed offset and active lease map are kept
+in a state file between runs so that only the lease blocks dhcpd has appended
+since the last run are parsed, falling back to a full parse when dhcpd rewrites
+the file, so each run takes time proportional to the lease churn rather than
+the size of the lease file
+
+Given the dhcpd.conf, also checks the utilisation of each address pool against
+warning and critical percentages, since a single pool running out of addresses
+is an outage for that network even when the server as a whole has plenty left.
+Pools are the ranges of each shared-network, or of each subnet outside of a
+shared-network, and the ranges are indexed sorted by start address so that each
+active lease is assigned to its pool with a binary search"""
 
 __author__  = "Hari Sekhon"
 __title__   = "Nagios Plugin for DHCPd Server Leases"
-__version__ = '0.8.4'
+__version__ = '0.11.0'
 
 # Due to the limited of characters that Nagios accepts from a plugin, this
 # output will be cut short if you have a lot of dhcp clients, which is why
@@ -23,9 +40,16 @@ __version__ = '0.8.4'
 # Remember, this program can be used without Nagios so that character limit
 # need not be your limit.
 
+import hashlib
+import json
+import os
 import re
+import socket
+import struct
 import sys
 import signal
+import tempfile
+from bisect import bisect_right
 from optparse import OptionParser
 
 # Standard Nagios return codes
@@ -37,13 +61,52 @@ UNKNOWN  = 3
 # Default timeout. All good plugins should have a timeout to prevent hanging
 TIMEOUT  = 30
 
+# Default pool utilisation percentage thresholds
+POOL_WARNING  = 80
+POOL_CRITICAL = 90
+
+# Maximum depth of include statements in the dhcpd.conf
+MAX_INCLUDE_DEPTH = 10
+
+# Bytes before the parsed offset that must be unchanged to resume parsing there
+STATE_FINGERPRINT_BYTES = 256
+
 # Regex for lease comparison and dissection
-RE_BINDING_STATE_ACTIVE = re.compile(r'\s*binding state active;')
-RE_LEASE                = re.compile(r'lease')
-RE_HOSTNAME             = re.compile(r'client-hostname')
-RE_MAC                  = re.compile(r'hardware\sethernet')
+RE_LEASE                = re.compile(br'^lease\s+(\S+)\s*\{')
+RE_LEASE_FILE_HEADER    = re.compile(r'(?i)^#.*(lease[s]? file .* written by' \
+                                   + r'|dhcpd\.leases|isc-dhcp)')
 RE_IP_ADDRESS           = re.compile(r'(\d{1,3}.){3}\d{1,3}')
 
+# Regex for dhcpd.conf tokenizing, comments are stripped leaving quoted strings
+RE_CONF_COMMENT         = re.compile(r'("[^"]*")|#[^\n]*')
+RE_CONF_TOKEN           = re.compile(r'"[^"]*"|[{};]|[^\s{};"]+')
+RE_IPV4_ADDRESS         = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+
+def decode(field):
+    """Decodes a field from the lease file, which is read in bytes so that
+    the parsed offset can be tracked for --incremental mode"""
+
+    return field.decode("utf-8", "replace")
+
+
+def ip_to_int(ip):
+    """Returns a dotted quad IPv4 address as an integer for range comparisons
+    or None if it is not a valid IPv4 address"""
+
+    if not RE_IPV4_ADDRESS.match(ip):
+        return None
+    try:
+        return struct.unpack("!I", socket.inet_aton(ip))[0]
+    except socket.error:
+        return None
+
+
+def normalize_mac(mac):
+    """Returns a mac as uppercase hex with no separators for comparisons"""
+
+    return mac.replace(":", "").replace("-", "").upper()
+
+
 def end(status, message):  # lgtm [py/similar-function]
     """Exits the plugin with first arg as the return code and the second
     arg as the message to output"""
@@ -66,28 +129,8 @@ def sort_keys_by_host(dictionary):
     """Takes the address dictionary in the form {"ip":["hostname","mac"]},
     sorts the keys by the host value, returns an ordered list of keys"""
 
-    hosts = []
-    keys = list(dictionary.keys())
-    keys.sort()
-    keys_sorted = []
-    for key in keys:
-        hosts.append(dictionary[key][0])
-    hosts.sort()
-    for host in hosts:
-        for key in keys:
-            if dictionary[key][0] == host:
-                keys_sorted.append(key)
-
-    # ((k, v) for k, v in mydict), key=lambda i: i[1])
-
-    # dedup without losing order
-    keys_sorted2 = []
-    for key in keys_sorted:
-        if key not in keys_sorted2:
-            keys_sorted2.append(key)
-    keys_sorted = keys_sorted2
-
-    return keys_sorted
+    # keys with the same host are ordered by key
+    return sorted(dictionary, key=lambda key: (dictionary[key][0], key))
 
 
 class DhcpdLeaseTester:
@@ -98,17 +141,25 @@ class DhcpdLeaseTester:
 
         self.address_dict      = {}
         self.compact_output    = False
+        self.dhcpd_conf        = None
         self.host_whitelist    = ""
         self.host_blacklist    = ""
+        self.incremental       = False
         self.leasefile         = None
-        self.lease             = ""
-        self.leases            = []
         self.mac_whitelist     = ""
         self.mac_blacklist     = ""
         self.no_name           = False
         self.no_summary        = False
+        self.pool_critical     = POOL_CRITICAL
+        self.pool_warning      = POOL_WARNING
+        self.pools             = {}
+        self.pool_index        = ([], [], [])
+        self.pool_result       = OK
+        self.pool_status       = {}
+        self.leases_outside    = 0
         self.show_mac          = False
         self.sort_by_ip        = False
+        self.state_file        = None
         self.timeout           = TIMEOUT
         self.unauthorized      = False
         self.unauthorized_dict = {}
@@ -132,8 +183,13 @@ class DhcpdLeaseTester:
         if self.timeout is None:
             self.timeout = TIMEOUT
 
+        if self.dhcpd_conf:
+            self.validate_pool_thresholds()
+
         self.validate_normalize_macs("whitelist")
         self.validate_normalize_macs("blacklist")
+        self.normalize_hosts("whitelist")
+        self.normalize_hosts("blacklist")
 
         try:
             self.timeout = int(self.timeout)
@@ -141,6 +197,29 @@ class DhcpdLeaseTester:
             end(UNKNOWN, "timeout invalid, must be a numeric integer")
 
 
+    def validate_pool_thresholds(self):
+        """Validates the pool warning and critical percentages"""
+
+        for name in ("warning", "critical"):
+            threshold = getattr(self, "pool_" + name)
+            if threshold is None:
+                threshold = {"warning": POOL_WARNING,
+                             "critical": POOL_CRITICAL}[name]
+            try:
+                threshold = float(threshold)
+            except ValueError:
+                end(UNKNOWN, "pool %s threshold invalid, must be a " % name
+                           + "percentage")
+            if threshold < 0 or threshold > 100:
+                end(UNKNOWN, "pool %s threshold must be between 0 " % name
+                           + "and 100%")
+            setattr(self, "pool_" + name, threshold)
+
+        if self.pool_warning > self.pool_critical:
+            end(UNKNOWN, "pool warning threshold cannot be greater than the " \
+                       + "pool critical threshold")
+
+
     def validate_normalize_macs(self, colourlist):
         """Checks to make sure any Mac addresses given
         are in the correct format. Takes either whitelist or blacklist
@@ -151,8 +230,6 @@ class DhcpdLeaseTester:
         maclist = getattr(self, "mac_" + colourlist)
         maclist = maclist.replace(",", " ")
         maclist = maclist.split()
-        maclist = [mac.replace(":","") for mac in maclist]
-        maclist = [mac.upper() for mac in maclist]
 
         re_mac_format = re.compile(r'^([\dA-Fa-f]{2}[:-]?){5}[\dA-Fa-f]{2}$')
 
@@ -161,7 +238,21 @@ class DhcpdLeaseTester:
                 end(UNKNOWN, "'%s' was given as a Mac address but is " % mac
                            + "not a valid Mac")
 
-        setattr(self, "mac_" + colourlist, maclist)
+        # set for constant time lookups of each lease's mac
+        macset = set([normalize_mac(mac) for mac in maclist])
+
+        setattr(self, "mac_" + colourlist, macset)
+
+
+    def normalize_hosts(self, colourlist):
+        """Changes the given host whitelist or blacklist to a set of
+        uppercase hostnames for case insensitive constant time lookups"""
+
+        hostlist = getattr(self, "host_" + colourlist)
+        hostlist = hostlist.replace(",", " ")
+        hostset  = set([host.upper() for host in hostlist.split()])
+
+        setattr(self, "host_" + colourlist, hostset)
 
 
     def sighandler(self, _discarded, _discarded2):
@@ -185,17 +276,25 @@ class DhcpdLeaseTester:
 
         result = OK
 
+        if self.dhcpd_conf:
+            self.parse_dhcpd_conf()
+
         try:
             output = self.parse_leases()
         except IndexError:
             end(CRITICAL, "Error parsing dhcp leases file '%s', possibly not " \
                         + "valid lease file?" % self.leasefile)
 
+        if self.dhcpd_conf:
+            # no pipes before the perfdata as Nagios splits on the first one
+            output = self.format_pool_utilisation() + " - " + output
+            result = self.pool_result
+
         self.check_unauthorized_leases()
 
         if self.unauthorized:
             unauthorized_output = self.format_unauthorized_leases()
-            output = unauthorized_output + " || " + output
+            output = unauthorized_output + " - " + output
             result = CRITICAL
 
         # When we used to compact the whitespace out, not used any more
@@ -213,47 +312,249 @@ class DhcpdLeaseTester:
         """Parse leases file and returns a string of leases with IP addreses
         and optional Hostname/Mac mappings"""
 
-        self.leases = self.open_lease_file()
-
-        security_checks_on = False
-        if self.host_whitelist or \
-           self.host_blacklist or \
-           self.mac_whitelist  or \
-           self.mac_blacklist:
-            security_checks_on = True
-
-        for self.lease in self.leases:
-            if RE_BINDING_STATE_ACTIVE.search(self.lease):
-                hostname = ""
-                ip       = ""
-                mac      = ""
-
-                self.lease = self.lease.split("\n")
-
-                ip = self.get_ip()
-                # If this is not valid, there can be no lease so move on
-                # This actually catches things like the user not using a decent
-                # lease file, in which case this will result in no real leases
-                # and will therefore result in a true result of no leases.
-                # Actually forcing the correct lease file turned out to not
-                # be fully possible since it varies among servers, so this
-                # catches the rest
-                if ip == "UNKNOWN":
-                    continue
-                self.address_dict[ip] = ["Unknown Hostname", "Unknown Mac"]
-                if not self.no_name or security_checks_on:
-                    hostname = self.get_hostname()
-                    self.address_dict[ip][0] = hostname
+        leases = self.parse_lease_file()
 
-                if self.show_mac or security_checks_on:
-                    mac = self.get_mac()
-                    self.address_dict[ip][1] = mac
+        for ip in leases:
+            (hostname, mac) = leases[ip]
+            # If this is not valid, there can be no lease so move on
+            # This actually catches things like the user not using a decent
+            # lease file, in which case this will result in no real leases
+            # and will therefore result in a true result of no leases.
+            # Actually forcing the correct lease file turned out to not
+            # be fully possible since it varies among servers, so this
+            # catches the rest
+            if not RE_IP_ADDRESS.match(ip):
+                continue
+            self.address_dict[ip] = [hostname, mac]
+
+        if self.dhcpd_conf:
+            self.check_pool_utilisation()
 
         msg = self.format_leases()
 
         return msg
 
 
+    def parse_dhcpd_conf(self):
+        """Parses the subnet and range declarations of the dhcpd.conf into
+        the pools dictionary in the form {"pool":[size,active_leases]} and
+        builds the pool index of range starts, range ends and pool names
+        sorted by range start"""
+
+        ranges = []
+        blocks = []
+        statement = []
+
+        for token in self.read_dhcpd_conf_tokens(self.dhcpd_conf, 0):
+            if token == ";":
+                if statement and statement[0] == "range":
+                    ranges.append(self.parse_range(statement, blocks))
+                statement = []
+            elif token == "{":
+                if statement and statement[0] == "shared-network" \
+                             and len(statement) == 2:
+                    blocks.append(statement[1].strip('"'))
+                elif statement and statement[0] == "subnet" \
+                               and len(statement) == 4  \
+                               and statement[2] == "netmask":
+                    blocks.append(self.format_subnet(statement[1],
+                                                     statement[3]))
+                else:
+                    # pool, group, host, class, if etc don't define pools
+                    blocks.append(None)
+                statement = []
+            elif token == "}":
+                if not blocks:
+                    end(UNKNOWN, "unbalanced braces in dhcpd.conf '%s'" \
+                                                             % self.dhcpd_conf)
+                blocks.pop()
+                statement = []
+            else:
+                statement.append(token)
+
+        if not ranges:
+            end(UNKNOWN, "no IPv4 range declarations found in dhcpd.conf " \
+                       + "'%s'" % self.dhcpd_conf)
+
+        ranges.sort()
+        (starts, ends, names) = self.pool_index
+        for (start, finish, name) in ranges:
+            if ends and start <= ends[-1]:
+                end(UNKNOWN, "overlapping ranges for pools '%s' and '%s' " \
+                             % (names[-1], name) + "in dhcpd.conf '%s'" \
+                             % self.dhcpd_conf)
+            starts.append(start)
+            ends.append(finish)
+            names.append(name)
+            if name not in self.pools:
+                self.pools[name] = [0, 0]
+            self.pools[name][0] += finish - start + 1
+
+
+    def read_dhcpd_conf_tokens(self, filename, depth):
+        """Returns the list of tokens in the given dhcpd.conf with comments
+        removed and any include statements replaced by the included tokens"""
+
+        try:
+            file_handle = open(filename)
+            text = file_handle.read()
+            file_handle.close()
+        except IOError:
+            end(UNKNOWN, "Error reading dhcpd.conf '%s'" % filename)
+
+        text   = RE_CONF_COMMENT.sub(lambda match: match.group(1) or "", text)
+        tokens = RE_CONF_TOKEN.findall(text)
+
+        # includes are rare so only splice them in when present
+        if "include" not in tokens:
+            return tokens
+
+        if depth >= MAX_INCLUDE_DEPTH:
+            end(UNKNOWN, "dhcpd.conf includes nested more than " \
+                       + "%s deep at '%s'" % (MAX_INCLUDE_DEPTH, filename))
+        result = []
+        index = 0
+        while index < len(tokens):
+            if tokens[index] == "include" and index + 2 < len(tokens) \
+                                         and tokens[index + 2] == ";":
+                result += self.read_dhcpd_conf_tokens(
+                                tokens[index + 1].strip('"'), depth + 1)
+                index += 3
+            else:
+                result.append(tokens[index])
+                index += 1
+        return result
+
+
+    def parse_range(self, statement, blocks):
+        """Takes the tokens of a range statement and the enclosing blocks and
+        returns a tuple of (start, end, pool) with the addresses as integers"""
+
+        addresses = [token for token in statement[1:]
+                     if token != "dynamic-bootp"]
+        if len(addresses) == 1:
+            addresses.append(addresses[0])
+        if len(addresses) != 2:
+            end(UNKNOWN, "invalid range statement '%s' in dhcpd.conf" \
+                                                        % " ".join(statement))
+        (start, finish) = [ip_to_int(ip) for ip in addresses]
+        if start is None or finish is None:
+            end(UNKNOWN, "invalid address in range statement '%s' in " \
+                         % " ".join(statement) + "dhcpd.conf")
+        if start > finish:
+            (start, finish) = (finish, start)
+
+        # leases in any subnet of a shared-network can come from any of its
+        # ranges, so the shared-network is the pool rather than the subnet
+        pool = None
+        for name in blocks:
+            if name is not None:
+                pool = name
+                break
+        if pool is None:
+            end(UNKNOWN, "range statement '%s' outside of a " \
+                         % " ".join(statement) + "subnet in dhcpd.conf")
+
+        return (start, finish, pool)
+
+
+    @staticmethod
+    def format_subnet(network, netmask):
+        """Returns the subnet as network/prefix for the pool name"""
+
+        mask = ip_to_int(netmask)
+        if mask is None:
+            return network
+        return "%s/%s" % (network, bin(mask).count("1"))
+
+
+    def check_pool_utilisation(self):
+        """Assigns each active lease to its pool with a binary search of the
+        pool index and sets the pool result and the pool status dictionary
+        in the form {"pool":(status, percentage)}"""
+
+        (starts, ends, names) = self.pool_index
+
+        for ip in self.address_dict:
+            address = ip_to_int(ip)
+            if address is None:
+                continue
+            index = bisect_right(starts, address) - 1
+            if index >= 0 and address <= ends[index]:
+                self.pools[names[index]][1] += 1
+            else:
+                # fixed-address hosts or leases from since removed ranges
+                self.leases_outside += 1
+
+        for name in self.pools:
+            (size, used) = self.pools[name]
+            percentage = 100.0 * used / size
+            if percentage >= self.pool_critical:
+                status = CRITICAL
+            elif percentage >= self.pool_warning:
+                status = WARNING
+            else:
+                status = OK
+            self.pool_status[name] = (status, percentage)
+            if status > self.pool_result:
+                self.pool_result = status
+
+
+    def format_pool_utilisation(self):
+        """Returns a string of the pools over the warning threshold, most
+        utilised first, or the most utilised pool if none are"""
+
+        names = sorted(self.pool_status,
+                       key=lambda name: (-self.pool_status[name][1], name))
+        number_pools = len(names)
+        breached = [name for name in names if self.pool_status[name][0] != OK]
+
+        if breached:
+            msg = "%s/%s pools at or over %g%% utilisation! " \
+                  % (len(breached), number_pools, self.pool_warning)
+            if self.compact_output:
+                breached = breached[:1]
+        else:
+            if number_pools == 1:
+                msg = "1 pool, "
+            else:
+                msg = "%s pools, highest " % number_pools
+            breached = names[:1]
+
+        for name in breached:
+            (size, used) = self.pools[name]
+            msg += "%s %.1f%% used (%s/%s), " \
+                   % (name, self.pool_status[name][1], used, size)
+
+        return msg.rstrip(", ")
+
+
+    def format_pool_perfdata(self):
+        """Returns the pool utilisation perfdata, per pool unless using
+        compact output as there can be thousands of pools"""
+
+        if not self.dhcpd_conf:
+            return ""
+
+        perfdata = ""
+        if not self.compact_output:
+            for name in sorted(self.pool_status):
+                perfdata += " 'Pool %s'=%.1f%%;%g;%g;0;100" \
+                            % (name, self.pool_status[name][1],
+                               self.pool_warning, self.pool_critical)
+        statuses = [self.pool_status[name][0] for name in self.pool_status]
+        perfdata += " 'Pools Warning'=%s 'Pools Critical'=%s" \
+                    % (statuses.count(WARNING), statuses.count(CRITICAL))
+        if self.pool_status:
+            perfdata += " 'Max Pool Utilisation'=%.1f%%;%g;%g;0;100" \
+                        % (max([self.pool_status[name][1]
+                                for name in self.pool_status]),
+                           self.pool_warning, self.pool_critical)
+        perfdata += " 'Leases Outside Pools'=%s" % self.leases_outside
+
+        return perfdata
+
+
     def check_unauthorized_leases(self):
         """Checks for and call functions to test the leases against the given
         whitelists/blacklists. Returns a list where the first element is a True
@@ -281,14 +582,10 @@ class DhcpdLeaseTester:
         """Checks the self.address_dict for any hostname not in the host
         whitelist and returns a list of unauthorized hostnames"""
 
-        host_whitelist = self.host_whitelist.replace(",", " ")
-        host_whitelist = host_whitelist.split()
-        host_whitelist = [host.upper() for host in host_whitelist]
-
         for ip in self.address_dict:
             hostname = self.address_dict[ip][0]
             mac      = self.address_dict[ip][1]
-            if hostname.upper() not in host_whitelist:
+            if hostname.upper() not in self.host_whitelist:
                 self.unauthorized_dict[ip] = (hostname, mac)
 
 
@@ -296,14 +593,10 @@ class DhcpdLeaseTester:
         """Checks the self.address_dict for any hostname not in the host
         blacklist and returns a list of unauthorized hostnames"""
 
-        host_blacklist = self.host_blacklist.replace(",", " ")
-        host_blacklist = host_blacklist.split()
-        host_blacklist = [host.upper() for host in host_blacklist]
-
-        for ip in list(self.address_dict.keys()):
+        for ip in self.address_dict:
             hostname = self.address_dict[ip][0]
             mac      = self.address_dict[ip][1]
-            if hostname.upper() in host_blacklist:
+            if hostname.upper() in self.host_blacklist:
                 self.unauthorized_dict[ip] = (hostname, mac)
 
 
@@ -311,11 +604,9 @@ class DhcpdLeaseTester:
         """Checks the self.address_dict for any macname not in the mac
         whitelist and returns a list of unauthorized macnames"""
 
-        for ip in list(self.address_dict.keys()):
+        for ip in self.address_dict:
             hostname = self.address_dict[ip][0]
-            mac      = self.address_dict[ip][1]
-            mac      = mac.replace(":", "")
-            mac      = mac.upper()
+            mac      = normalize_mac(self.address_dict[ip][1])
             if mac not in self.mac_whitelist:
                 self.unauthorized_dict[ip] = (hostname, mac)
 
@@ -324,11 +615,9 @@ class DhcpdLeaseTester:
         """Checks the self.address_dict for any macname not in the mac
         blacklist and returns a list of unauthorized macnames"""
 
-        for ip in list(self.address_dict.keys()):
+        for ip in self.address_dict:
             hostname = self.address_dict[ip][0]
-            mac      = self.address_dict[ip][1]
-            mac      = mac.replace(":", "")
-            mac      = mac.upper()
+            mac      = normalize_mac(self.address_dict[ip][1])
             if mac in self.mac_blacklist:
                 self.unauthorized_dict[ip] = (hostname, mac)
 
@@ -341,14 +630,17 @@ class DhcpdLeaseTester:
             self.sort_by_ip = True
 
         if self.sort_by_ip:
-            address_keys_sorted = list(self.address_dict.keys())
-            address_keys_sorted.sort()
+            address_keys_sorted = sorted(self.address_dict)
         else:
             address_keys_sorted = sort_keys_by_host(self.address_dict)
 
+        perfdata = self.format_pool_perfdata()
+
         number_leases = len(address_keys_sorted)
         if number_leases == 0:
             msg = "No dhcp leases recorded"
+            if perfdata:
+                msg += " |" + perfdata
         else:
             if self.no_summary:
                 msg = ""
@@ -372,7 +664,7 @@ class DhcpdLeaseTester:
                     msg += ", "
                 msg = msg.rstrip(", ")
 
-            msg += " | 'DHCP Leases'=%s" % number_leases
+            msg += " | 'DHCP Leases'=%s" % number_leases + perfdata
 
         return msg
 
@@ -386,8 +678,7 @@ class DhcpdLeaseTester:
             self.sort_by_ip = True
 
         if self.sort_by_ip:
-            unauthorized_keys_sorted = list(self.unauthorized_dict.keys())
-            unauthorized_keys_sorted.sort()
+            unauthorized_keys_sorted = sorted(self.unauthorized_dict)
         else:
             unauthorized_keys_sorted = sort_keys_by_host(self.unauthorized_dict)
 
@@ -421,18 +712,41 @@ class DhcpdLeaseTester:
         return msg
 
 
-    def open_lease_file(self):
+    def parse_lease_file(self):
         """Opens the lease file, tests the lease file is valid, and then returns
-        an array of elements each containing one lease block definition"""
+        a dictionary of {"ip":("hostname","mac")} of the ips whose last lease
+        block in the file is active"""
+
+        leases = {}
+        offset = 0
+        valid  = False
 
-        leases_array = []
+        try:
+            file_handle = open(self.leasefile, "rb")
+            file_stat   = os.fstat(file_handle.fileno())
+        except (IOError, OSError):
+            end(CRITICAL, "Error reading lease file '%s'" % self.leasefile)
 
         try:
-            file_handle = open(self.leasefile)
-            leases      = file_handle.read()
+            if self.incremental:
+                state = self.read_state(file_handle, file_stat)
+                if state:
+                    leases = state["leases"]
+                    offset = state["offset"]
+                    valid  = state["valid"]
+                    file_handle.seek(offset)
+            (found_valid, parsed_bytes) = \
+                                self.parse_lease_lines(file_handle, leases)
         except IOError:
             end(CRITICAL, "Error reading lease file '%s'" % self.leasefile)
 
+        valid   = valid or found_valid
+        offset += parsed_bytes
+
+        if self.incremental:
+            self.write_state(file_handle, file_stat, offset, valid, leases)
+        file_handle.close()
+
         # Check to see if it is a valid lease file.
         # If there are no leases, then we should check that there are some
         # header keywords comment that you usually seen in a dhcpd.leases file
@@ -442,86 +756,161 @@ class DhcpdLeaseTester:
         # really be using a valid lease file. Parse leases will also catch
         # this in that no leases will be created and the result will be
         # technically true, there are no valid leases in an incorrect file
-        if not re.search(r'\n\s*lease .+{\s*\n', leases) \
-            and not \
-                re.search("(?i)\n#.*lease[s]? file .* written by.*\n", leases) \
-            and not re.search("\n#.*dhcpd.leases.*\n", leases) \
-            and not re.search("\n(?i)#.*isc-dhcp.*\n", leases):
+        if not valid:
             end(CRITICAL, "'%s' is not recognized as a valid dhcpd lease file" \
                                                                % self.leasefile)
 
-        leases = leases.split("}")[:-1]
-        for lease in leases:
-            lease_parts = lease.split("{")
-            if len(lease_parts) > 1:
-                leases_array.append(lease_parts[1])
-            #else:
-            #    print >> sys.stderr, "Debug - Not valid lease:\n%s" % lease
-
         return leases
 
 
-    def get_ip(self):
-        """Takes an list of lines from a dhcp lease block from self.leases
-        and returns the ip address of this lease"""
+    def get_state_file(self):
+        """Returns the state file for incremental mode, defaulting to one in
+        the temp directory unique to the lease file"""
 
-        ip = ""
+        if self.state_file:
+            return self.state_file
+        leasefile = os.path.abspath(self.leasefile)
+        return os.path.join(tempfile.gettempdir(), "dhcpd_leases_%s.json" \
+                    % hashlib.md5(leasefile.encode("utf-8")).hexdigest())
 
-        for line in self.lease:
-            if RE_LEASE.search(line):
-                line = line.split()
-                if len(line) == 3:
-                    ip = line[1]
-                else:
-                    ip = "UNKNOWN"
-
-        if not RE_IP_ADDRESS.match(ip):
-            ip = "UNKNOWN"
 
-        return ip
+    @staticmethod
+    def get_fingerprint(file_handle, offset):
+        """Returns a hash of the bytes just before the offset, which will
+        differ if the file has been rewritten in place"""
 
+        start = max(0, offset - STATE_FINGERPRINT_BYTES)
+        file_handle.seek(start)
+        fingerprint = hashlib.md5(file_handle.read(offset - start)).hexdigest()
+        file_handle.seek(0)
+        return fingerprint
 
-    def get_hostname(self):
-        """Takes an list of lines from a dhcp lease block from self.leases
-        and returns the hostname of the machine with this lease"""
 
-        hostname = ""
+    def read_state(self, file_handle, file_stat):
+        """Returns the saved state to resume parsing from if it is still
+        valid for the lease file, otherwise None for a full parse"""
 
-        for line in self.lease:
-            if RE_HOSTNAME.search(line):
-                line = line.split()
-                if len(line) == 2:
-                    hostname = line[1]
-                    hostname = hostname.rstrip(";")
-                    hostname = hostname.strip('"')
-                else:
+        state_file = self.get_state_file()
+        try:
+            with open(state_file) as state_handle:
+                state = json.load(state_handle)
+            if state["leasefile"] != os.path.abspath(self.leasefile):
+                return None
+            # dhcpd periodically rewrites the lease file to a new file and
+            # renames it over the old one, which changes the inode
+            if state["inode"] != file_stat.st_ino or \
+               state["device"] != file_stat.st_dev:
+                return None
+            if state["offset"] > file_stat.st_size:
+                return None
+            if state["fingerprint"] != \
+               self.get_fingerprint(file_handle, state["offset"]):
+                return None
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        return state
+
+
+    def write_state(self, file_handle, file_stat, offset, valid, leases):
+        """Saves the state to resume parsing from on the next run, written
+        atomically so concurrent runs never read a partial state file and
+        only readable by us as it contains every active hostname and mac.
+        Failing to save it only costs a full parse next run so is not fatal"""
+
+        state_file = self.get_state_file()
+        state = {
+            "leasefile":   os.path.abspath(self.leasefile),
+            "inode":       file_stat.st_ino,
+            "device":      file_stat.st_dev,
+            "offset":      offset,
+            "fingerprint": self.get_fingerprint(file_handle, offset),
+            "valid":       valid,
+            "leases":      leases,
+        }
+        tmp_file = "%s.%s" % (state_file, os.getpid())
+        try:
+            # O_EXCL so a symlink planted at the predictable temp path is
+            # never followed, removing any left behind by a killed run
+            if os.path.lexists(tmp_file):
+                os.remove(tmp_file)
+            state_handle = os.fdopen(os.open(tmp_file,
+                                             os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                                             0o600), "w")
+            try:
+                json.dump(state, state_handle)
+            finally:
+                state_handle.close()
+            os.rename(tmp_file, state_file)
+        except (IOError, OSError) as error:
+            sys.stderr.write("Error writing state file '%s' - %s\n" \
+                                                        % (state_file, error))
+
+
+    def parse_lease_lines(self, lines, leases):
+        """Parses an iterable of lease file lines in bytes in a single pass,
+        updating the leases dictionary as each lease block ends so that the
+        last block for each ip wins, and only ips whose last block is active
+        are kept. Returns a tuple of True if any lease block or lease file
+        header comment was found to show it is a valid lease file, and the
+        number of bytes parsed up to the end of the last complete line outside
+        of a lease block so that parsing can later resume from there"""
+
+        valid        = False
+        parsed_bytes = 0
+        position     = 0
+        ip           = None
+        state        = b""
+        hostname     = ""
+        mac          = ""
+
+        for raw_line in lines:
+            position += len(raw_line)
+            line = raw_line.strip()
+            if ip is not None:
+                if line.startswith(b"}"):
+                    if state == b"active":
+                        leases[ip] = (hostname, mac)
+                    else:
+                        leases.pop(ip, None)
+                    ip = None
+                    parsed_bytes = position
+                # not 'next binding state' or 'rewind binding state'
+                elif line.startswith(b"binding state "):
+                    state = line.split()[2].rstrip(b";")
+                elif line.startswith(b"client-hostname "):
+                    line = line.split()
+                    if len(line) == 2:
+                        hostname = decode(line[1].rstrip(b";").strip(b'"')) \
+                                                                    or "UNKNOWN"
+                    else:
+                        hostname = "UNKNOWN"
+                elif line.startswith(b"hardware ethernet "):
+                    line = line.split()
+                    if len(line) == 3:
+                        mac = decode(line[2].rstrip(b";"))
+                    else:
+                        mac = "UNKNOWN"
+                continue
+            # a partially written last line is left for the next run, inside
+            # a lease block this is already the case as the block never ends
+            if not raw_line.endswith(b"\n"):
+                break
+            if line.startswith(b"#"):
+                if not valid and RE_LEASE_FILE_HEADER.match(decode(line)):
+                    valid = True
+            elif line.startswith(b"lease"):
+                match = RE_LEASE.match(line)
+                if match:
+                    ip       = decode(match.group(1))
+                    state    = b""
                     hostname = "UNKNOWN"
+                    mac      = "UNKNOWN"
+                    valid    = True
+                    continue
+            # anything else outside of lease blocks isn't needed
+            parsed_bytes = position
 
-        if not hostname:
-            hostname = "UNKNOWN"
-
-        return hostname
-
-
-    def get_mac(self):
-        """Takes an list of lines from a dhcp lease block from self.leases
-        and returns the Mac of the machine with this lease"""
-
-        mac = ""
-
-        for line in self.lease:
-            if RE_MAC.search(line):
-                line = line.split()
-                if len(line) == 3:
-                    mac = line[2]
-                    mac = mac.rstrip(";")
-                else:
-                    mac = "UNKNOWN"
-
-        if not mac:
-            mac = "UNKNOWN"
-
-        return mac
+        return (valid, parsed_bytes)
 
 
 def main():
@@ -537,6 +926,14 @@ def main():
                           + "to make sure Nagios gets perfdata as NRPE has" \
                           + " a limit on the number of characters before it "  \
                           + "discards the rest")
+    parser.add_option( "-C",
+                       "--dhcpd-conf",
+                       dest="dhcpd_conf",
+                       help="The dhcpd.conf to read the subnet and range "    \
+                          + "declarations from in order to check the "        \
+                          + "utilisation of each address pool. Pools are the " \
+                          + "ranges of each shared-network, or of each "       \
+                          + "subnet outside of a shared-network")
     parser.add_option( "-f",
                        "--file",
                        "--lease-file",
@@ -544,6 +941,19 @@ def main():
                        help="Specify the dhcp lease file to use. Should be "  \
                           + "the current lease file that the ISC dhcp "       \
                           + "daemon uses to track it's leases")
+    parser.add_option( "--incremental",
+                       action="store_true",
+                       dest="incremental",
+                       help="Only parse the lease blocks appended to the "    \
+                          + "lease file since the last run, keeping the "     \
+                          + "active leases in a state file between runs. "    \
+                          + "Falls back to a full parse when dhcpd rewrites " \
+                          + "the lease file")
+    parser.add_option( "--state-file",
+                       dest="state_file",
+                       help="State file for --incremental mode. Defaults to " \
+                          + "a file in %s unique to the " % tempfile.gettempdir() \
+                          + "lease file")
     parser.add_option( "-m",
                        "--mac",
                        action="store_true",
@@ -564,6 +974,18 @@ def main():
                        help="Change the output order to sort by IP rather "    \
                           + "than the default of sorting by hostname. If "     \
                           + "using --no-name this is implied")
+    parser.add_option( "-P",
+                       "--pool-warning",
+                       dest="pool_warning",
+                       help="Warn when any pool's utilisation percentage is " \
+                          + "at or above this (default: %s%%). " % POOL_WARNING \
+                          + "Requires --dhcpd-conf")
+    parser.add_option( "-Q",
+                       "--pool-critical",
+                       dest="pool_critical",
+                       help="Critical when any pool's utilisation percentage" \
+                          + " is at or above this (default: "                 \
+                          + "%s%%). Requires --dhcpd-conf" % POOL_CRITICAL)
     parser.add_option( "-s",
                        "--no-summary",
                        action="store_true",
@@ -644,15 +1066,20 @@ def main():
 
 
     tester.compact_output = options.compact_output
+    tester.dhcpd_conf     = options.dhcpd_conf
     tester.host_whitelist = options.host_whitelist
     tester.host_blacklist = options.host_blacklist
+    tester.incremental    = options.incremental
     tester.leasefile      = options.leasefile
     tester.mac_whitelist  = options.mac_whitelist
     tester.mac_blacklist  = options.mac_blacklist
     tester.no_name        = options.no_name
     tester.no_summary     = options.no_summary
+    tester.pool_critical  = options.pool_critical
+    tester.pool_warning   = options.pool_warning
     tester.show_mac       = options.show_mac
     tester.sort_by_ip     = options.sort_by_ip
+    tester.state_file     = options.state_file
 
     timeout               = options.timeout
     version               = options.version
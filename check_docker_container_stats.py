@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 15:34:18 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check the CPU, memory and block IO usage of all running Docker containers via the Docker API
+
+Each one-shot container stats call takes 1-2 secs as the Docker daemon waits for a second CPU sample,
+so stats are collected for all containers concurrently using a bounded pool of --threads, making the check take
+roughly one stats interval for hosts with up to --threads containers instead of 1-2 secs per container
+
+Calculates per container:
+
+    - CPU % (of one CPU core, so a container using 2 cores fully = 200%, same as 'docker stats')
+    - memory usage % of the container limit (or host memory if unlimited), excluding page cache
+    - block IO read / write rates in MB/s since the last run of this check (cumulative counters are cached locally)
+
+Warning / Critical thresholds apply per container to the --metric selected (default: cpu %),
+and the top N containers for that metric are listed in the output along with those breaching thresholds
+
+Optionally restrict to containers with names matching the --container regex
+
+Supports TLS with similar options to official 'docker' command
+
+Tested on Docker 18.02
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import traceback
+from multiprocessing.pool import ThreadPool
+try:
+    import docker
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, CriticalError, plural, validate_int, validate_regex
+    from harisekhon import DockerNagiosPlugin
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckDockerContainerStats(DockerNagiosPlugin):
+
+    # metric => units
+    metrics = {
+        'cpu': '%',
+        'memory': '%',
+        'read': 'MB/s',
+        'write': 'MB/s',
+    }
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckDockerContainerStats, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.container = None
+        self.metric = None
+        self.threads = None
+        self.top = None
+        self.msg = 'Docker msg not defined yet'
+
+    def add_options(self):
+        super(CheckDockerContainerStats, self).add_options()
+        self.add_opt('-C', '--container', metavar='regex',
+                     help='Only check running containers with names matching this regex')
+        self.add_opt('-m', '--metric', default='cpu',
+                     help='Metric to apply per container thresholds to: {0} (default: cpu)'\
+                          .format(' / '.join(['{0} ({1})'.format(metric, self.metrics[metric])
+                                              for metric in sorted(self.metrics)])))
+        self.add_opt('-n', '--top', metavar='N', default=5,
+                     help='Number of top containers for the metric to output (default: 5)')
+        self.add_opt('--threads', metavar='N', default=10,
+                     help='Number of containers to collect stats for in parallel (default: 10)')
+        self.add_thresholds(default_warning=80, default_critical=90)
+
+    def process_options(self):
+        super(CheckDockerContainerStats, self).process_options()
+        self.container = self.get_opt('container')
+        if self.container:
+            validate_regex(self.container, 'container')
+            self.container = re.compile(self.container)
+        self.metric = self.get_opt('metric')
+        if self.metric not in self.metrics:
+            self.usage('--metric must be one of: {0}'.format(', '.join(sorted(self.metrics))))
+        self.top = self.get_opt('top')
+        validate_int(self.top, 'top', 0)
+        self.top = int(self.top)
+        self.threads = self.get_opt('threads')
+        validate_int(self.threads, 'threads', 1, 100)
+        self.threads = int(self.threads)
+        self.validate_thresholds(simple='upper', positive=True, integer=False)
+
+    @staticmethod
+    def get_cache_file(client):
+        return os.path.join(tempfile.gettempdir(), 'docker_container_blkio_{0}.json'\
+                            .format(hashlib.md5(client.api.base_url.encode('utf-8')).hexdigest()))
+
+    @staticmethod
+    def read_cache(cache_file):
+        try:
+            with open(cache_file) as filehandle:
+                return json.load(filehandle)
+        except (IOError, OSError, ValueError) as _:
+            log.info('no usable cached block IO counters %s: %s', cache_file, _)
+            return {}
+
+    @staticmethod
+    def write_cache(cache_file, counters):
+        tmp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        try:
+            with open(tmp_file, 'w') as filehandle:
+                json.dump(counters, filehandle)
+            # atomic rename so concurrent checks never read a partially written cache
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as _:
+            log.warning('failed to write cached block IO counters %s: %s', cache_file, _)
+
+    @staticmethod
+    def get_container_stats(client, container_id):
+        # one-shot stats, the daemon samples twice to populate precpu_stats
+        try:
+            return client.api.stats(container_id, stream=False)
+        except docker.errors.NotFound:
+            # exited and removed since the containers were listed, not a daemon problem
+            log.info('container %s no longer exists, skipping', container_id)
+            return None
+
+    @staticmethod
+    def calculate_cpu_percent(stats):
+        cpu_stats = stats.get('cpu_stats') or {}
+        precpu_stats = stats.get('precpu_stats') or {}
+        cpu_delta = (cpu_stats.get('cpu_usage') or {}).get('total_usage', 0) - \
+                    (precpu_stats.get('cpu_usage') or {}).get('total_usage', 0)
+        system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+        online_cpus = cpu_stats.get('online_cpus') or \
+                      len((cpu_stats.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+        if cpu_delta <= 0 or system_delta <= 0:
+            return 0.0
+        return 100.0 * cpu_delta / system_delta * online_cpus
+
+    @staticmethod
+    def calculate_memory(stats):
+        memory_stats = stats.get('memory_stats') or {}
+        # exclude page cache the same as 'docker stats' - cgroup v1 'cache', cgroup v2 'inactive_file'
+        detail = memory_stats.get('stats') or {}
+        cache = detail.get('total_inactive_file', detail.get('inactive_file', detail.get('cache', 0)))
+        usage = max(0, memory_stats.get('usage', 0) - cache)
+        limit = memory_stats.get('limit', 0)
+        percent = 100.0 * usage / limit if limit else 0.0
+        return (usage, limit, percent)
+
+    @staticmethod
+    def calculate_blkio(stats):
+        read_bytes = 0
+        write_bytes = 0
+        for _ in (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+            operation = (_.get('op') or '').lower()
+            if operation == 'read':
+                read_bytes += _.get('value', 0)
+            elif operation == 'write':
+                write_bytes += _.get('value', 0)
+        return (read_bytes, write_bytes)
+
+    def check(self, client):
+        start_time = time.time()
+        try:
+            log.info('listing running Docker containers')
+            containers = client.api.containers()
+        except docker.errors.APIError as _:
+            raise CriticalError(_)
+        names = {}
+        for container in containers:
+            name = (container.get('Names') or [container['Id']])[0].lstrip('/')
+            if self.container and not self.container.search(name):
+                continue
+            names[container['Id']] = name
+        container_ids = sorted(names)
+        results = []
+        if container_ids:
+            log.info('collecting stats for %d containers using %d threads',
+                     len(container_ids), min(self.threads, len(container_ids)))
+            pool = ThreadPool(processes=min(self.threads, len(container_ids)))
+            try:
+                results = pool.map(lambda _: self.get_container_stats(client, _), container_ids)
+            except docker.errors.APIError as _:
+                raise CriticalError(_)
+            finally:
+                pool.close()
+                pool.join()
+        collection_time = time.time() - start_time
+        cache_file = self.get_cache_file(client)
+        previous_counters = self.read_cache(cache_file)
+        counters = {}
+        now = time.time()
+        container_stats = []
+        for (container_id, stats) in zip(container_ids, results):
+            if stats is None:
+                continue
+            (memory_usage, memory_limit, memory_percent) = self.calculate_memory(stats)
+            (read_bytes, write_bytes) = self.calculate_blkio(stats)
+            counters[container_id] = [now, read_bytes, write_bytes]
+            read_rate = 0.0
+            write_rate = 0.0
+            if container_id in previous_counters:
+                (last_time, last_read, last_write) = previous_counters[container_id]
+                elapsed = now - last_time
+                # counters reset if the container restarted
+                if elapsed > 0 and read_bytes >= last_read and write_bytes >= last_write:
+                    read_rate = (read_bytes - last_read) / elapsed / 1024 / 1024
+                    write_rate = (write_bytes - last_write) / elapsed / 1024 / 1024
+            container_stats.append({
+                'name': names[container_id],
+                'cpu': self.calculate_cpu_percent(stats),
+                'memory': memory_percent,
+                'memory_usage': memory_usage,
+                'memory_limit': memory_limit,
+                'read': read_rate,
+                'write': write_rate,
+            })
+            log.info("container '%s' cpu = %.2f%%, memory = %.2f%% (%d / %d bytes), "
+                     "read = %.2f MB/s, write = %.2f MB/s",
+                     names[container_id], container_stats[-1]['cpu'], memory_percent,
+                     memory_usage, memory_limit, read_rate, write_rate)
+        self.write_cache(cache_file, counters)
+        self.process_stats(container_stats, collection_time)
+
+    def process_stats(self, container_stats, collection_time):
+        warning_threshold = self.get_threshold('warning').get_simple()
+        critical_threshold = self.get_threshold('critical').get_simple()
+        units = self.metrics[self.metric]
+        container_stats.sort(key=lambda _: _[self.metric], reverse=True)
+        num_warning = 0
+        num_critical = 0
+        for stats in container_stats:
+            if stats[self.metric] > critical_threshold:
+                num_critical += 1
+            elif stats[self.metric] > warning_threshold:
+                num_warning += 1
+        if num_critical:
+            self.critical()
+        elif num_warning:
+            self.warning()
+        num_containers = len(container_stats)
+        self.msg = 'Docker {0} container{1} with {2} > {3}{4} = {5}, > {6}{4} = {7}'\
+                   .format(num_containers, plural(num_containers), self.metric,
+                           critical_threshold, units, num_critical, warning_threshold, num_warning)
+        # always list all breaching containers, plus the top N for context
+        num_listed = max(self.top, num_critical + num_warning)
+        if container_stats and num_listed:
+            self.msg += ', top {0} {1} = [{2}]'\
+                        .format(min(num_listed, num_containers), self.metric,
+                                ', '.join(['{0}={1:.2f}{2}'.format(_['name'], _[self.metric], units)
+                                           for _ in container_stats[:num_listed]]))
+        if self.verbose:
+            self.msg += ', collection time = {0:.2f} secs'.format(collection_time)
+        self.msg += ' | containers={0} containers_critical={1} containers_warning={2}'\
+                    .format(num_containers, num_critical, num_warning)
+        for metric in sorted(self.metrics):
+            self.msg += ' max_{0}={1:.2f}{2}'.format(metric,
+                                                     max([_[metric] for _ in container_stats] or [0]),
+                                                     self.metrics[metric].replace('/s', ''))
+            if metric == self.metric:
+                self.msg += ';{0};{1}'.format(warning_threshold, critical_threshold)
+        self.msg += ' total_cpu={0:.2f}% total_memory_usage={1}b total_read={2:.2f}MB total_write={3:.2f}MB'\
+                    .format(sum([_['cpu'] for _ in container_stats]),
+                            sum([_['memory_usage'] for _ in container_stats]),
+                            sum([_['read'] for _ in container_stats]),
+                            sum([_['write'] for _ in container_stats]))
+        self.msg += ' collection_time={0:.2f}s'.format(collection_time)
+
+
+if __name__ == '__main__':
+    CheckDockerContainerStats().main()
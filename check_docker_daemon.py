@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 14:08:35 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check all Docker daemon level metrics from a single snapshot via the Docker API
+
+Takes one snapshot of the Docker daemon info, version, volume and network lists (and optionally disk usage)
+and caches it locally for --cache-ttl secs, so that many checks per interval don't each call 'docker info'
+which is slow and serializes against other API calls on busy hosts
+
+Evaluates in one process everything checked by:
+
+    - check_docker_containers.py    - total / running / paused / stopped containers
+    - check_docker_images.py        - number of images
+    - check_docker_volumes.py       - number of volumes
+    - check_docker_networks.py      - number of networks
+    - check_docker_version.py       - Docker version vs --expected regex
+    - check_docker_swarm_enabled.py / check_docker_swarm_error.py / check_docker_swarm_is_manager.py
+                                    - with --swarm / --swarm-manager
+
+Optional thresholds apply to the --metric selected and perfdata is output for all metrics
+
+--df adds disk usage for images, containers, volumes and build cache, which is expensive for the daemon
+to compute so is only taken when requested and is cached along with the rest of the snapshot
+
+Supports TLS with similar options to official 'docker' command
+
+Tested on Docker 18.02
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import traceback
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, jsonpp, CriticalError, UnknownError, support_msg_api
+    from harisekhon.utils import validate_int, validate_regex, isVersionLax
+    from harisekhon import DockerNagiosPlugin
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckDockerDaemon(DockerNagiosPlugin):
+
+    metrics = ('containers', 'running_containers', 'paused_containers', 'stopped_containers',
+               'images', 'volumes', 'networks')
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckDockerDaemon, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.metric = None
+        self.expected = None
+        self.swarm = False
+        self.swarm_manager = False
+        self.df = False
+        self.cache_ttl = None
+        self.msg = 'Docker msg not defined yet'
+
+    def add_options(self):
+        super(CheckDockerDaemon, self).add_options()
+        self.add_opt('-m', '--metric',
+                     help='Metric to apply thresholds to: {0}'.format(' / '.join(self.metrics)))
+        self.add_opt('-e', '--expected', help='Expected version regex (optional)')
+        self.add_opt('-s', '--swarm', action='store_true',
+                     help='Raise critical if Swarm is not enabled or is in error')
+        self.add_opt('-M', '--swarm-manager', action='store_true',
+                     help='Raise critical if this node is not a Swarm manager (implies --swarm)')
+        self.add_opt('--df', action='store_true',
+                     help='Include disk usage in the snapshot (expensive for the daemon to calculate)')
+        self.add_opt('--cache-ttl', metavar='secs', default=60,
+                     help='Secs to reuse the cached daemon snapshot for, 0 to disable (default: 60)')
+        self.add_thresholds()
+
+    def process_options(self):
+        super(CheckDockerDaemon, self).process_options()
+        self.metric = self.get_opt('metric')
+        if self.metric is not None and self.metric not in self.metrics:
+            self.usage('--metric must be one of: {0}'.format(', '.join(self.metrics)))
+        self.expected = self.get_opt('expected')
+        if self.expected is not None:
+            validate_regex(self.expected)
+            log.info('expected version regex: %s', self.expected)
+        self.swarm_manager = self.get_opt('swarm_manager')
+        self.swarm = self.get_opt('swarm') or self.swarm_manager
+        self.df = self.get_opt('df')
+        self.cache_ttl = self.get_opt('cache_ttl')
+        validate_int(self.cache_ttl, 'cache ttl', 0, 86400)
+        self.cache_ttl = int(self.cache_ttl)
+        if self.metric:
+            self.validate_thresholds(integer=True, positive=True, optional=True)
+
+    @staticmethod
+    def get_cache_file(client):
+        return os.path.join(tempfile.gettempdir(), 'docker_daemon_snapshot_{0}.json'\
+                            .format(hashlib.md5(client.api.base_url.encode('utf-8')).hexdigest()))
+
+    def read_cache(self, cache_file):
+        try:
+            with open(cache_file) as filehandle:
+                snapshot = json.load(filehandle)
+        except (IOError, OSError, ValueError) as _:
+            log.info('no usable cached snapshot %s: %s', cache_file, _)
+            return None
+        age = time.time() - snapshot.get('timestamp', 0)
+        if age > self.cache_ttl or age < 0:
+            log.info('cached snapshot %s expired (%d secs old)', cache_file, age)
+            return None
+        if self.df and 'df' not in snapshot:
+            log.info('cached snapshot %s does not contain disk usage', cache_file)
+            return None
+        log.info('using cached snapshot %s (%d secs old)', cache_file, age)
+        return snapshot
+
+    @staticmethod
+    def write_cache(cache_file, snapshot):
+        tmp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        try:
+            with open(tmp_file, 'w') as filehandle:
+                json.dump(snapshot, filehandle)
+            # atomic rename so concurrent checks never read a partially written snapshot
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as _:
+            log.warning('failed to write cached snapshot %s: %s', cache_file, _)
+
+    def take_snapshot(self, client):
+        log.info('running Docker info')
+        info = client.info()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(jsonpp(info))
+        log.info('getting Docker version')
+        version = client.version()
+        log.info('listing Docker volumes')
+        volumes = client.api.volumes().get('Volumes') or []
+        log.info('listing Docker networks')
+        networks = client.api.networks()
+        swarm = info.get('Swarm') or {}
+        # only keep the fields needed to keep the cache compact
+        snapshot = {
+            'timestamp': time.time(),
+            'containers': info['Containers'],
+            'running_containers': info['ContainersRunning'],
+            'paused_containers': info['ContainersPaused'],
+            'stopped_containers': info['ContainersStopped'],
+            'images': info['Images'],
+            'volumes': len(volumes),
+            'networks': len(networks),
+            'version': version['Version'],
+            'api_version': version['ApiVersion'],
+            'swarm': {
+                'member': 'Cluster' in swarm,
+                'state': swarm.get('LocalNodeState'),
+                'error': swarm.get('Error'),
+                'manager': swarm.get('ControlAvailable'),
+            },
+        }
+        if self.df:
+            log.info('getting Docker disk usage')
+            df = client.df()
+            snapshot['df'] = {
+                'images_size': df.get('LayersSize') or 0,
+                'containers_size': sum([_.get('SizeRw') or 0 for _ in df.get('Containers') or []]),
+                'volumes_size': sum([max(0, (_.get('UsageData') or {}).get('Size') or 0)
+                                     for _ in df.get('Volumes') or []]),
+                'build_cache_size': sum([_.get('Size') or 0 for _ in df.get('BuildCache') or []]),
+            }
+        return snapshot
+
+    def get_snapshot(self, client):
+        cache_file = self.get_cache_file(client)
+        if self.cache_ttl:
+            snapshot = self.read_cache(cache_file)
+            if snapshot is not None:
+                return snapshot
+        snapshot = self.take_snapshot(client)
+        if self.cache_ttl:
+            self.write_cache(cache_file, snapshot)
+        return snapshot
+
+    def check(self, client):
+        snapshot = self.get_snapshot(client)
+        snapshot_age = max(0, time.time() - snapshot['timestamp'])
+        self.msg = 'Docker '
+        if self.metric:
+            self.msg += '{0} = {1}'.format(self.metric.replace('_', ' '), snapshot[self.metric])
+            self.check_thresholds(snapshot[self.metric])
+            self.msg += ', '
+        self.msg += ', '.join(['{0} = {1}'.format(metric.replace('_', ' '), snapshot[metric])
+                               for metric in self.metrics
+                               if metric != self.metric])
+        self.check_version(snapshot['version'])
+        self.msg += ', API version = {0}'.format(snapshot['api_version'])
+        if self.swarm:
+            self.check_swarm(snapshot['swarm'])
+        self.msg += ', snapshot age = {0:.0f} secs'.format(snapshot_age)
+        if snapshot.get('estimated'):
+            # written by check_docker_events.py --collector between its full resyncs
+            self.msg += ' (counts estimated from events since full snapshot {0:.0f} secs ago)'\
+                        .format(max(0, time.time() - snapshot.get('snapshot_timestamp', 0)))
+        self.msg += ' |'
+        for metric in self.metrics:
+            self.msg += ' {0}={1}'.format(metric, snapshot[metric])
+            if metric == self.metric:
+                self.msg += self.get_perf_thresholds()
+        if 'df' in snapshot:
+            for key in sorted(snapshot['df']):
+                self.msg += ' {0}={1}b'.format(key, snapshot['df'][key])
+        self.msg += ' snapshot_age={0:.0f}s'.format(snapshot_age)
+
+    def check_version(self, version):
+        if not isVersionLax(version):
+            raise UnknownError('Docker version unrecognized \'{}\'. {}'.format(version, support_msg_api()))
+        self.msg += ', version = {0}'.format(version)
+        if self.expected is not None:
+            log.info("verifying version against expected regex '%s'", self.expected)
+            if not re.match(self.expected, str(version)):
+                self.msg += " (expected '{0}')".format(self.expected)
+                self.critical()
+
+    def check_swarm(self, swarm):
+        if not swarm['member']:
+            raise CriticalError('Docker is not a member of a Swarm')
+        self.msg += ', Swarm state = {0}'.format(swarm['state'])
+        if swarm['error']:
+            self.critical()
+            self.msg += ', Swarm error = {0}'.format(swarm['error'])
+        if self.swarm_manager:
+            self.msg += ', Swarm node is '
+            if swarm['manager']:
+                self.msg += 'a manager'
+            else:
+                self.msg += 'not a manager'
+                self.critical()
+
+
+if __name__ == '__main__':
+    CheckDockerDaemon().main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 15:01:47 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check Docker container restarts and state from a model maintained by the Docker events stream
+
+Run with --collector as a long running process (eg. under systemd or supervisord) and it subscribes to the
+Docker API /events stream, maintaining a model of container, service and Swarm task states and container restart
+times, with a full resync every --resync-interval secs. The model is written to --state-file whenever it changes.
+
+At every resync it also writes the daemon snapshot used by check_docker_daemon.py, kept current with container,
+image, volume and network events in between (reported as estimated until the next resync), so that
+check_docker_daemon.py with a --cache-ttl greater than --resync-interval answers instantly from the collector
+without calling the Docker API at all. Docker API errors or a dropped events stream back off and resync
+rather than ending the collector
+
+Without --collector, checks the model in the --state-file and so returns instantly without any Docker API calls:
+
+    - Warning / Critical thresholds apply to the max number of restarts of any container in the last --window mins,
+      catching short container crash loops that polling the container state every minute cannot see
+    - optionally restrict to containers matching --container regex
+    - raises Critical if the state file is older than --max-state-age secs, ie. the collector is not running
+    - outputs running / paused / stopped containers and running vs desired Swarm tasks
+
+Supports TLS with similar options to official 'docker' command
+
+Tested on Docker 18.02
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import re
+import signal
+import sys
+import tempfile
+import time
+import traceback
+try:
+    import docker
+    import requests
+    import urllib3
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, CriticalError, UnknownError, validate_int, validate_regex
+    from harisekhon import DockerNagiosPlugin
+    from check_docker_daemon import CheckDockerDaemon
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckDockerEvents(DockerNagiosPlugin):
+
+    # how long to keep container restart history in the model
+    restart_history_secs = 86400
+
+    # container event action => resulting container state
+    container_states = {
+        'create': 'created',
+        'start': 'running',
+        'restart': 'running',
+        'unpause': 'running',
+        'pause': 'paused',
+        'die': 'exited',
+        'stop': 'exited',
+    }
+
+    # daemon snapshot counters kept current from events between resyncs
+    daemon_counters = {
+        ('image', 'pull'): ('images', 1),
+        ('image', 'load'): ('images', 1),
+        ('image', 'import'): ('images', 1),
+        ('image', 'delete'): ('images', -1),
+        ('volume', 'create'): ('volumes', 1),
+        ('volume', 'destroy'): ('volumes', -1),
+        ('network', 'create'): ('networks', 1),
+        ('network', 'destroy'): ('networks', -1),
+    }
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckDockerEvents, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.collector = False
+        self.state_file = None
+        self.resync_interval = None
+        self.max_state_age = None
+        self.window = None
+        self.container = None
+        self.model = None
+        self.daemon = None
+        self.daemon_snapshot = None
+        self.daemon_snapshot_time = None
+        self.daemon_events = 0
+        self.daemon_cache_file = None
+        self.msg = 'Docker msg not defined yet'
+
+    def add_options(self):
+        super(CheckDockerEvents, self).add_options()
+        self.add_opt('--collector', action='store_true',
+                     help='Run as a long running collector subscribed to the Docker events stream')
+        self.add_opt('-f', '--state-file', metavar='<file>',
+                     help='State file the collector writes the model to and checks read from ' + \
+                          '(default: <tmpdir>/docker_events_<hash of docker url>.json)')
+        self.add_opt('--resync-interval', metavar='secs', default=300,
+                     help='Secs between full resyncs of the model from the Docker API in --collector mode' + \
+                          ' (default: 300)')
+        self.add_opt('-a', '--max-state-age', metavar='secs', default=900,
+                     help='Max age of the state file before raising critical that the collector is not running' + \
+                          ' (default: 900)')
+        self.add_opt('-W', '--window', metavar='mins', default=10,
+                     help='Count container restarts within this many mins (default: 10)')
+        self.add_opt('-C', '--container', metavar='regex',
+                     help='Only check restarts of containers with names matching this regex')
+        self.add_thresholds(default_warning=1, default_critical=3)
+
+    def process_options(self):
+        super(CheckDockerEvents, self).process_options()
+        self.collector = self.get_opt('collector')
+        self.state_file = self.get_opt('state_file')
+        self.resync_interval = self.get_opt('resync_interval')
+        validate_int(self.resync_interval, 'resync interval', 10, 86400)
+        self.resync_interval = int(self.resync_interval)
+        self.max_state_age = self.get_opt('max_state_age')
+        validate_int(self.max_state_age, 'max state age', 1, 86400)
+        self.max_state_age = int(self.max_state_age)
+        self.window = self.get_opt('window')
+        validate_int(self.window, 'window', 1, self.restart_history_secs // 60)
+        self.window = int(self.window)
+        self.container = self.get_opt('container')
+        if self.container:
+            validate_regex(self.container, 'container')
+            self.container = re.compile(self.container)
+        self.validate_thresholds(integer=True, positive=True)
+
+    def get_state_file(self, client):
+        if self.state_file:
+            return self.state_file
+        return os.path.join(tempfile.gettempdir(), 'docker_events_{0}.json'\
+                            .format(hashlib.md5(client.api.base_url.encode('utf-8')).hexdigest()))
+
+    def check(self, client):
+        if self.collector:
+            self.collect(client)
+        else:
+            self.check_model(self.get_state_file(client))
+
+    # ======================================================================== #
+    #                                 Collector
+    # ======================================================================== #
+
+    def collect(self, client):
+        # long running, so cancel the plugin execution timeout
+        signal.alarm(0)
+        state_file = self.get_state_file(client)
+        log.info('collector writing model to %s', state_file)
+        self.daemon = CheckDockerDaemon()
+        self.daemon_cache_file = self.daemon.get_cache_file(client)
+        self.model = {'containers': {}, 'services': {}, 'tasks': {}}
+        retry_delay = 1
+        try:
+            while True:
+                try:
+                    since = time.time()
+                    self.resync(client)
+                    self.write_state(state_file)
+                    retry_delay = 1
+                    # the events stream ends at the next resync
+                    for event in client.events(decode=True, since=int(since),
+                                               until=int(since) + self.resync_interval):
+                        if self.process_event(event):
+                            self.write_state(state_file)
+                except (docker.errors.DockerException, requests.exceptions.RequestException,
+                        urllib3.exceptions.HTTPError, IOError) as _:
+                    # a daemon restart or dropped connection mustn't end the collector, resync once it's back
+                    log.warning('Docker API error, resyncing in %d secs: %s', retry_delay, _)
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, 60)
+        except KeyboardInterrupt:
+            log.info('collector interrupted, writing final state')
+            self.write_state(state_file)
+        self.msg = 'Docker events collector stopped'
+
+    def resync(self, client):
+        log.info('resyncing model from Docker API')
+        now = time.time()
+        containers = {}
+        for container in client.api.containers(all=True):
+            _id = container['Id']
+            previous = self.model['containers'].get(_id, {})
+            containers[_id] = {
+                'name': (container.get('Names') or [_id])[0].lstrip('/'),
+                'state': container.get('State'),
+                'restarts': previous.get('restarts', []),
+            }
+        self.model['containers'] = containers
+        try:
+            self.model['services'] = dict([(_['ID'], _['Spec']['Name']) for _ in client.api.services()])
+            self.model['tasks'] = dict([(_['ID'], {'service': _['ServiceID'],
+                                                   'state': _['Status']['State'],
+                                                   'desired_state': _['DesiredState']})
+                                        for _ in client.api.tasks(filters={'desired-state': 'running'})])
+        except docker.errors.APIError as _:
+            # not a Swarm manager
+            log.debug('not resyncing services and tasks: %s', _)
+            self.model['services'] = {}
+            self.model['tasks'] = {}
+        self.daemon_snapshot = self.daemon.take_snapshot(client)
+        self.daemon_snapshot_time = self.daemon_snapshot['timestamp']
+        self.daemon_events = 0
+        self.model['resync_time'] = now
+
+    def process_event(self, event):
+        """Updates the model from an event, returns True if the model changed"""
+        _type = event.get('Type')
+        action = event.get('Action') or event.get('status') or ''
+        # eg. 'exec_start: sh' or 'health_status: healthy'
+        action = action.split(':')[0]
+        actor = event.get('Actor') or {}
+        _id = actor.get('ID') or event.get('id')
+        timestamp = event.get('time') or time.time()
+        log.debug('event %s %s %s', _type, action, _id)
+        if (_type, action) in self.daemon_counters:
+            (key, increment) = self.daemon_counters[(_type, action)]
+            self.daemon_snapshot[key] = max(0, self.daemon_snapshot[key] + increment)
+            self.daemon_events += 1
+            return True
+        if _type == 'container':
+            if self.process_container_event(_id, action, actor, timestamp):
+                self.daemon_events += 1
+                return True
+            return False
+        if _type == 'service':
+            if action == 'remove':
+                self.model['services'].pop(_id, None)
+            elif _id:
+                self.model['services'][_id] = (actor.get('Attributes') or {}).get('name', _id)
+            return True
+        return False
+
+    def process_container_event(self, _id, action, actor, timestamp):
+        containers = self.model['containers']
+        if action == 'destroy':
+            return containers.pop(_id, None) is not None
+        if action not in self.container_states:
+            return False
+        container = containers.setdefault(_id, {
+            'name': (actor.get('Attributes') or {}).get('name', _id),
+            'state': None,
+            'restarts': [],
+        })
+        # a start after the container has exited is a restart, whether by restart policy or 'docker restart'
+        # which emits die / stop / start / restart, so don't also count the 'restart' action
+        if action == 'start' and container['state'] == 'exited':
+            container['restarts'].append(timestamp)
+        container['state'] = self.container_states[action]
+        return True
+
+    def update_daemon_snapshot(self):
+        containers = self.model['containers'].values()
+        self.daemon_snapshot['containers'] = len(containers)
+        self.daemon_snapshot['running_containers'] = len([_ for _ in containers if _['state'] == 'running'])
+        self.daemon_snapshot['paused_containers'] = len([_ for _ in containers if _['state'] == 'paused'])
+        self.daemon_snapshot['stopped_containers'] = self.daemon_snapshot['containers'] - \
+                                                     self.daemon_snapshot['running_containers'] - \
+                                                     self.daemon_snapshot['paused_containers']
+        self.daemon_snapshot['timestamp'] = time.time()
+        # counts adjusted from events since the last full snapshot rather than a fresh snapshot of the daemon
+        self.daemon_snapshot['estimated'] = self.daemon_events > 0
+        self.daemon_snapshot['snapshot_timestamp'] = self.daemon_snapshot_time
+
+    def write_state(self, state_file):
+        cutoff = time.time() - self.restart_history_secs
+        for container in self.model['containers'].values():
+            container['restarts'] = [_ for _ in container['restarts'] if _ >= cutoff]
+        self.model['timestamp'] = time.time()
+        tmp_file = '{0}.{1}'.format(state_file, os.getpid())
+        try:
+            with open(tmp_file, 'w') as filehandle:
+                json.dump(self.model, filehandle)
+            # atomic rename so checks never read a partially written model
+            os.rename(tmp_file, state_file)
+        except (IOError, OSError) as _:
+            log.warning('failed to write state file %s: %s', state_file, _)
+        self.update_daemon_snapshot()
+        self.daemon.write_cache(self.daemon_cache_file, self.daemon_snapshot)
+
+    # ======================================================================== #
+    #                                   Check
+    # ======================================================================== #
+
+    def check_model(self, state_file):
+        try:
+            with open(state_file) as filehandle:
+                model = json.load(filehandle)
+        except (IOError, OSError) as _:
+            raise CriticalError("failed to read state file '{0}', is the --collector running? {1}"\
+                                .format(state_file, _))
+        except ValueError as _:
+            raise UnknownError("failed to parse state file '{0}': {1}".format(state_file, _))
+        state_age = time.time() - model.get('timestamp', 0)
+        cutoff = time.time() - self.window * 60
+        containers = model.get('containers', {}).values()
+        if self.container:
+            containers = [_ for _ in containers if self.container.search(_['name'])]
+        max_restarts = 0
+        restarting = []
+        for container in containers:
+            restarts = len([_ for _ in container['restarts'] if _ >= cutoff])
+            if restarts:
+                restarting.append((restarts, container['name']))
+            max_restarts = max(max_restarts, restarts)
+        restarting.sort(reverse=True)
+        self.msg = 'Docker max container restarts in last {0} mins = {1}'.format(self.window, max_restarts)
+        self.check_thresholds(max_restarts)
+        if restarting:
+            self.msg += ' [{0}]'.format(', '.join(['{0}={1}'.format(name, restarts)
+                                                   for (restarts, name) in restarting[:10]]))
+        states = [_['state'] for _ in containers]
+        num_running = states.count('running')
+        num_paused = states.count('paused')
+        num_stopped = len(states) - num_running - num_paused
+        self.msg += ', containers = {0}, running = {1}, paused = {2}, stopped = {3}'\
+                    .format(len(states), num_running, num_paused, num_stopped)
+        tasks = model.get('tasks', {}).values()
+        num_running_tasks = len([_ for _ in tasks if _['state'] == 'running'])
+        if model.get('services'):
+            self.msg += ', Swarm services = {0}, tasks running = {1}/{2}'\
+                        .format(len(model['services']), num_running_tasks, len(tasks))
+        self.msg += ', state age = {0:.0f} secs'.format(state_age)
+        if state_age > self.max_state_age:
+            self.critical()
+            self.msg += ' (> {0}, is the --collector running?)'.format(self.max_state_age)
+        self.msg += ' | max_container_restarts={0}{1} containers_restarting={2}'\
+                    .format(max_restarts, self.get_perf_thresholds(), len(restarting))
+        self.msg += ' running_containers={0} paused_containers={1} stopped_containers={2}'\
+                    .format(num_running, num_paused, num_stopped)
+        self.msg += ' running_tasks={0} desired_tasks={1} state_age={2:.0f}s;;{3}'\
+                    .format(num_running_tasks, len(tasks), state_age, self.max_state_age)
+
+
+if __name__ == '__main__':
+    CheckDockerEvents().main()
@@ -26,6 +26,12 @@ Optional --warning / --critical thresholds apply to minimum number of running ta
 
 Outputs service creation time time and last updated time
 
+--all-services checks every service in the Swarm in a single run by listing services once and tasks once
+(filtered to desired state running) and joining them in memory, rather than one process per service each making
+its own service and tasks API calls to the manager. Raises CRITICAL for services running fewer tasks than desired,
+and in this mode the optional --warning / --critical thresholds apply to the number of such failing services.
+Job mode services (ReplicatedJob / GlobalJob) run to completion so are skipped and counted separately
+
 Verbose mode outputs the human time since started / finished in brackets
 
 Optional --warn-if-last-updated-within threshold raises warning if the service was updated
@@ -65,7 +71,7 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.5'
+__version__ = '0.6'
 
 
 class CheckDockerSwarmServiceStatus(DockerNagiosPlugin):
@@ -77,27 +83,47 @@ class CheckDockerSwarmServiceStatus(DockerNagiosPlugin):
         # super().__init__()
         self.msg = 'Docker msg not defined'
         self.service = None
+        self.all_services = False
         self.updated = None
+        self.created = None
         self.expected_id = None
 
     def add_options(self):
         super(CheckDockerSwarmServiceStatus, self).add_options()
         self.add_opt('-S', '--service', help='Docker Swarm service name or id')
+        self.add_opt('-A', '--all-services', action='store_true', help='Check all Docker Swarm services')
         self.add_opt('-U', '--warn-if-last-updated-within',
                      help='Raise warning if service was updated within this may secs ago')
+        self.add_opt('-C', '--warn-if-created-within',
+                     help='Raise warning if service was created within this may secs ago')
         self.add_thresholds()
 
     def process_options(self):
         super(CheckDockerSwarmServiceStatus, self).process_options()
         self.service = self.get_opt('service')
+        self.all_services = self.get_opt('all_services')
         self.updated = self.get_opt('warn_if_last_updated_within')
-        validate_chars(self.service, 'docker service', r'A-Za-z0-9/:\._-')
+        self.created = self.get_opt('warn_if_created_within')
+        if self.all_services:
+            if self.service:
+                self.usage('--service and --all-services are mutually exclusive')
+        else:
+            validate_chars(self.service, 'docker service', r'A-Za-z0-9/:\._-')
         if self.updated is not None:
             validate_int(self.updated, 'last updated threshold')
             self.updated = int(self.updated)
-        self.validate_thresholds(simple='lower', positive=True, optional=True)
+        if self.created is not None:
+            validate_int(self.created, 'created threshold')
+            self.created = int(self.created)
+        if self.all_services:
+            self.validate_thresholds(integer=True, positive=True, optional=True)
+        else:
+            self.validate_thresholds(simple='lower', positive=True, optional=True)
 
     def check(self, client):
+        if self.all_services:
+            self.check_all_services(client)
+            return
         # services = client.services.list()
         # print(services)
         try:
@@ -107,6 +133,9 @@ class CheckDockerSwarmServiceStatus(DockerNagiosPlugin):
         if log.isEnabledFor(logging.DEBUG):
             log.debug(jsonpp(service.attrs))
         (mode, replicas, running_tasks, created, updated) = self.parse_service(service)
+        if mode.endswith('-job'):
+            raise UnknownError("Docker Swarm service '{}' is a {} mode service, ".format(self.service, mode) +
+                               'which runs to completion rather than keeping replicas running')
         self.msg = "Docker Swarm service '{}' replicas = {}".format(self.service, running_tasks)
         if mode == 'replicated':
             self.msg += "/{}".format(replicas)
@@ -125,34 +154,120 @@ class CheckDockerSwarmServiceStatus(DockerNagiosPlugin):
         self.check_updated(updated)
         self.msg += ' | running_replicas={}{}'.format(running_tasks, self.get_perf_thresholds('lower'))
 
+    def check_all_services(self, client):
+        try:
+            log.info('listing Docker Swarm services')
+            services = client.api.services()
+            # only tasks that should be running, otherwise the task history of every service is returned too
+            log.info('listing Docker Swarm tasks with desired state running')
+            tasks = client.api.tasks(filters={'desired-state': 'running'})
+        except docker.errors.APIError as _:
+            raise CriticalError(_)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(jsonpp(services))
+            log.debug(jsonpp(tasks))
+        service_tasks = {}
+        for task in tasks:
+            service_tasks.setdefault(task['ServiceID'], []).append(task)
+        failing_services = []
+        recently_updated = []
+        recently_created = []
+        job_services = []
+        for service in services:
+            name = service['Spec']['Name']
+            (mode, replicas, created, updated) = self.parse_service_attrs(service)
+            # job services run to completion, so have no replicas to keep running
+            if mode.endswith('-job'):
+                log.info("service '%s' mode = %s, skipping", name, mode)
+                job_services.append(name)
+                continue
+            desired_tasks = service_tasks.get(service['ID'], [])
+            running_tasks = self.count_running_tasks(desired_tasks)
+            # global services have one desired running task per eligible node
+            if mode == 'global':
+                replicas = len(desired_tasks)
+            log.info("service '%s' mode = %s, replicas = %s/%s", name, mode, running_tasks, replicas)
+            if running_tasks < replicas or not running_tasks:
+                failing_services.append('{}={}/{}'.format(name, running_tasks, replicas))
+            if self.updated and self.calculate_human_age(updated)[1] < self.updated:
+                recently_updated.append(name)
+            if self.created and self.calculate_human_age(created)[1] < self.created:
+                recently_created.append(name)
+        num_services = len(services) - len(job_services)
+        num_failing = len(failing_services)
+        self.msg = 'Docker Swarm services failing = {}'.format(num_failing)
+        if self.get_opt('warning') is not None or self.get_opt('critical') is not None:
+            self.check_thresholds(num_failing)
+        elif failing_services:
+            self.critical()
+        self.msg += ' out of {} services'.format(num_services)
+        if failing_services:
+            self.msg += ' [{}]'.format(', '.join(failing_services))
+        if job_services:
+            self.msg += ', job services skipped = {}'.format(len(job_services))
+            if self.verbose:
+                self.msg += ' [{}]'.format(', '.join(job_services))
+        if self.updated is not None:
+            self.msg += ', updated within {} secs = {}'.format(self.updated, len(recently_updated))
+            if recently_updated:
+                self.warning()
+                if self.verbose:
+                    self.msg += ' [{}]'.format(', '.join(recently_updated))
+        if self.created is not None:
+            self.msg += ', created within {} secs = {}'.format(self.created, len(recently_created))
+            if recently_created:
+                self.warning()
+                if self.verbose:
+                    self.msg += ' [{}]'.format(', '.join(recently_created))
+        self.msg += ' | failing_services={}{} services={} job_services={} running_tasks={}'\
+                    .format(num_failing, self.get_perf_thresholds(), num_services, len(job_services),
+                            self.count_running_tasks(tasks))
+
     @staticmethod
-    def parse_service(service):
-        _ = service.attrs
-        _mode = _['Spec']['Mode']
+    def parse_service_attrs(attrs):
+        _mode = attrs['Spec']['Mode']
         if 'Global' in _mode:
             mode = 'global'
             replicas = None
         elif 'Replicated' in _mode:
             mode = 'replicated'
             replicas = _mode['Replicated']['Replicas']
+        elif 'ReplicatedJob' in _mode:
+            mode = 'replicated-job'
+            replicas = None
+        elif 'GlobalJob' in _mode:
+            mode = 'global-job'
+            replicas = None
         else:
             raise UnknownError('failed to parse service mode. {}'.format(support_msg_api()))
-        tasks = service.tasks()
-        if log.isEnabledFor(logging.DEBUG):
-            log.debug(jsonpp(tasks))
+        created = attrs['CreatedAt']
+        updated = attrs['UpdatedAt']
+        return (mode, replicas, created, updated)
+
+    @staticmethod
+    def count_running_tasks(tasks):
         running_tasks = 0
         for task in tasks:
             if task['Status']['State'] == 'running':
                 running_tasks += 1
-        created = _['CreatedAt']
-        updated = _['UpdatedAt']
+        return running_tasks
+
+    def parse_service(self, service):
+        (mode, replicas, created, updated) = self.parse_service_attrs(service.attrs)
+        tasks = service.tasks()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(jsonpp(tasks))
+        running_tasks = self.count_running_tasks(tasks)
         return (mode, replicas, running_tasks, created, updated)
 
     def check_created(self, created):
         self.msg += ", created at '{}'".format(created)
+        (human_time, secs_ago) = self.calculate_human_age(created)
         if self.verbose:
-            (human_time, _) = self.calculate_human_age(created)
             self.msg += ' ({} ago)'.format(human_time)
+        if self.created and secs_ago < self.created:
+            self.warning()
+            self.msg += ' (< {} secs ago)'.format(self.created)
 
     def check_updated(self, updated):
         self.msg += ", updated at '{}'".format(updated)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 13:26:08 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check Jenkins build queue wait times and executor saturation via the Rest API
+
+Fetches the build queue and all nodes' executors in exactly two tree-filtered API requests, rather than
+python-jenkins get_running_builds() which makes one request per node, and calculates:
+
+    - queue wait time p50 / p90 / p99 / max and the longest waiting item
+    - number of queued, blocked, buildable and stuck items, as well as counts per normalized reason
+    - busy / total executors and utilisation % overall and per node label
+    - busy vs idle vs offline nodes
+
+Optional --warning/--critical thresholds apply to the queue wait time in secs at the selected --percentile
+
+Raises warning if there are more than --max-stuck stuck items in the queue or
+if any label's executor utilisation % exceeds --max-utilisation
+
+The --password switch accepts either a password or an API token
+
+Tested on Jenkins 2.60.1
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import time
+import traceback
+try:
+    import jenkins
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, CriticalError, UnknownError, support_msg_api, isInt, sec2human
+    from harisekhon.utils import validate_int, validate_float
+    from harisekhon import RestNagiosPlugin
+    from check_jenkins_job import CheckJenkinsJob
+    from lib_latency_stats import percentile_of
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckJenkinsBuildQueue(RestNagiosPlugin):
+
+    percentiles = ('p50', 'p90', 'p99', 'max')
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckJenkinsBuildQueue, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.name = 'Jenkins'
+        self.default_port = 8080
+        self.msg = self.name + ' build queue '
+        self.percentile = None
+        self.max_stuck = None
+        self.max_utilisation = None
+        self.queue_tree = 'items[id,inQueueSince,why,blocked,buildable,stuck,task[name]]'
+        self.computer_tree = 'computer[_class,displayName,offline,assignedLabels[name],executors[idle]]'
+        # collapse item specific parts of queue reasons eg. job / node / label names, build numbers and ETAs
+        self.re_reason_quoted = re.compile(r'[‘\'"][^’\'"]*[’\'"]')
+        self.re_reason_eta = re.compile(r'\s*\(ETA:[^)]*\)')
+        self.re_reason_number = re.compile(r'#?\d+')
+
+    def add_options(self):
+        super(CheckJenkinsBuildQueue, self).add_options()
+        self.add_opt('--percentile', default='p90',
+                     help='Queue wait time percentile to apply thresholds to: {0} (default: p90)'\
+                          .format(' / '.join(self.percentiles)))
+        self.add_opt('-s', '--max-stuck', metavar='N', default=0,
+                     help='Max number of stuck queue items before raising warning (default: 0)')
+        self.add_opt('-U', '--max-utilisation', metavar='%',
+                     help='Max executor utilisation percentage for any label before raising warning (optional)')
+        self.add_thresholds(default_warning=600, default_critical=1800)
+
+    # can inherently accept AUTH token for password, see:
+    # see https://wiki.jenkins-ci.org/display/JENKINS/Authenticating+scripted+clients
+    # You can create an API token at:
+    # http://jenkins/me/configure
+    def process_options(self):
+        super(CheckJenkinsBuildQueue, self).process_options()
+        self.percentile = self.get_opt('percentile')
+        if self.percentile not in self.percentiles:
+            self.usage('--percentile must be one of: {0}'.format(', '.join(self.percentiles)))
+        self.max_stuck = self.get_opt('max_stuck')
+        validate_int(self.max_stuck, 'max stuck', 0)
+        self.max_stuck = int(self.max_stuck)
+        self.max_utilisation = self.get_opt('max_utilisation')
+        if self.max_utilisation is not None:
+            validate_float(self.max_utilisation, 'max utilisation', 0, 100)
+            self.max_utilisation = float(self.max_utilisation)
+        self.validate_thresholds(integer=False, optional=True)
+
+    def normalize_reason(self, why):
+        why = self.re_reason_eta.sub('', why or 'unknown')
+        why = self.re_reason_quoted.sub('<name>', why)
+        return self.re_reason_number.sub('<N>', why).strip()
+
+    def run(self):
+        server_url = '{proto}://{host}:{port}'.format(proto=self.protocol, host=self.host, port=self.port)
+        try:
+            log.debug('setting up Jenkins connection to %s', server_url)
+            start_time = time.time()
+            server = jenkins.Jenkins(server_url, username=self.user, password=self.password, timeout=self.timeout / 3)
+            log.debug('fetching build queue')
+            queue_items = CheckJenkinsJob.get_json(server, 'queue/', self.queue_tree).get('items', [])
+            log.debug('fetching nodes and executors')
+            computers = CheckJenkinsJob.get_json(server, 'computer/', self.computer_tree).get('computer', [])
+        except jenkins.JenkinsException as _:
+            raise CriticalError(_)
+        query_time = time.time() - start_time
+        # status text is appended to self.msg in order, perfdata collected to go after it
+        perfdata = self.process_queue(queue_items)
+        perfdata += self.process_executors(computers)
+        self.msg += ' | ' + ' '.join(perfdata)
+        self.msg += ' query_time={0:.4f}s'.format(query_time)
+
+    def process_queue(self, queue_items):
+        """Appends the build queue status to the message, returns a list of its perfdata"""
+        now = time.time()
+        wait_times = []
+        longest_wait = 0
+        longest_waiting_item = None
+        num_blocked = 0
+        num_buildable = 0
+        num_stuck = 0
+        reasons = {}
+        for item in queue_items:
+            in_queue_since = item.get('inQueueSince')
+            if not isInt(in_queue_since):
+                raise UnknownError('inQueueSince field returned non-integer! {0}'.format(support_msg_api()))
+            wait_time = max(0, now - int(in_queue_since) / 1000)
+            wait_times.append(wait_time)
+            name = item.get('task', {}).get('name', item.get('id'))
+            if wait_time > longest_wait or longest_waiting_item is None:
+                longest_wait = wait_time
+                longest_waiting_item = name
+            if item.get('blocked'):
+                num_blocked += 1
+            if item.get('buildable'):
+                num_buildable += 1
+            if item.get('stuck'):
+                num_stuck += 1
+            reason = self.normalize_reason(item.get('why'))
+            reasons[reason] = reasons.get(reason, 0) + 1
+            log.info("queued item '%s' waiting %.0f secs: %s", name, wait_time, item.get('why'))
+        wait_times.sort()
+        stats = {
+            'p50': percentile_of(wait_times, 50),
+            'p90': percentile_of(wait_times, 90),
+            'p99': percentile_of(wait_times, 99),
+            'max': longest_wait,
+        }
+        num_queued = len(queue_items)
+        perfdata = []
+        self.msg += '{0} wait time = {1:.0f} secs'.format(self.percentile, stats[self.percentile])
+        self.check_thresholds(stats[self.percentile])
+        self.msg += ', queued = {0}, blocked = {1}, buildable = {2}, stuck = {3}'\
+                    .format(num_queued, num_blocked, num_buildable, num_stuck)
+        if num_stuck > self.max_stuck:
+            self.warning()
+            self.msg += ' (> {0})'.format(self.max_stuck)
+        if longest_waiting_item is not None:
+            self.msg += ", longest waiting = '{0}' for {1}".format(longest_waiting_item, sec2human(longest_wait))
+        if self.verbose and reasons:
+            self.msg += ', reasons = [{0}]'.format(', '.join(['{0}: {1}'.format(reason, count)
+                                                              for (reason, count)
+                                                              in sorted(reasons.items(),
+                                                                        key=lambda _: _[1],
+                                                                        reverse=True)]))
+        perfdata.append('queued={0} blocked={1} buildable={2} stuck={3};{4}'
+                        .format(num_queued, num_blocked, num_buildable, num_stuck, self.max_stuck))
+        for percentile in self.percentiles:
+            perf = 'queue_wait_{0}={1:.0f}s'.format(percentile, stats[percentile])
+            if percentile == self.percentile:
+                perf += self.get_perf_thresholds()
+            perfdata.append(perf)
+        return perfdata
+
+    def process_executors(self, computers):
+        """Appends the executor and node status to the message, returns a list of their perfdata"""
+        busy_executors = 0
+        total_executors = 0
+        busy_nodes = 0
+        idle_nodes = 0
+        offline_nodes = 0
+        labels = {}
+        for computer in computers:
+            name = computer.get('displayName')
+            if computer.get('offline'):
+                log.info("node '%s' offline", name)
+                offline_nodes += 1
+                continue
+            # one-off executors run flyweight tasks such as pipeline parents and don't consume an executor slot
+            executors = computer.get('executors') or []
+            num_executors = len(executors)
+            num_busy = len([_ for _ in executors if not _.get('idle')])
+            log.info("node '%s' busy executors %d / %d", name, num_busy, num_executors)
+            busy_executors += num_busy
+            total_executors += num_executors
+            if num_busy:
+                busy_nodes += 1
+            else:
+                idle_nodes += 1
+            # every node has a self label of its own name, which would make any busy node look like a saturated
+            # label, the built-in node's being 'built-in' or 'master' on older versions
+            self_labels = [name]
+            if (computer.get('_class') or '').endswith('$MasterComputer'):
+                self_labels += ['built-in', 'master']
+            for label in computer.get('assignedLabels') or []:
+                label_name = label.get('name')
+                if label_name in self_labels:
+                    continue
+                if label_name not in labels:
+                    labels[label_name] = [0, 0]
+                labels[label_name][0] += num_busy
+                labels[label_name][1] += num_executors
+        utilisation = 100.0 * busy_executors / total_executors if total_executors else 0
+        perfdata = []
+        self.msg += ', executors busy = {0} / {1} ({2:.1f}%)'.format(busy_executors, total_executors, utilisation)
+        self.msg += ', nodes busy = {0}, idle = {1}, offline = {2}'.format(busy_nodes, idle_nodes, offline_nodes)
+        saturated_labels = []
+        max_label_utilisation = 0
+        for label_name in sorted(labels):
+            (busy, total) = labels[label_name]
+            label_utilisation = 100.0 * busy / total if total else 0
+            max_label_utilisation = max(max_label_utilisation, label_utilisation)
+            if self.max_utilisation is not None and label_utilisation > self.max_utilisation:
+                saturated_labels.append('{0}={1:.1f}%'.format(label_name, label_utilisation))
+        if saturated_labels:
+            self.warning()
+            self.msg += ', labels with executor utilisation > {0}% = {1} [{2}]'\
+                        .format(self.max_utilisation, len(saturated_labels), ', '.join(saturated_labels))
+        perfdata.append('busy_executors={0} total_executors={1} executor_utilisation={2:.1f}%'
+                        .format(busy_executors, total_executors, utilisation))
+        perf = 'max_label_executor_utilisation={0:.1f}%'.format(max_label_utilisation)
+        if self.max_utilisation is not None:
+            perf += ';{0}'.format(self.max_utilisation)
+        perfdata.append(perf)
+        perfdata.append('busy_nodes={0} idle_nodes={1} offline_nodes={2}'.format(busy_nodes, idle_nodes, offline_nodes))
+        return perfdata
+
+
+if __name__ == '__main__':
+    CheckJenkinsBuildQueue().main()
@@ -21,6 +21,18 @@ Nagios Plugin to check the latest build status of a Jenkins job via the Rest API
 Optional --warning/--critical thresholds can be applied to last build duration
 and --age can test the longest time since last build completion
 
+The job and its last completed build result, duration and timestamp are fetched in a single
+tree-filtered API request restricted to only the fields needed, rather than separate requests for the job
+existence check, job info and build info
+
+Can alternatively check every job in a --folder and / or --view in a single depth-limited tree API request,
+raising critical if any job's last build failed or is older than --age, and applying the duration thresholds
+to the slowest job's last build
+
+--list fetches all jobs across nested folders using a single recursive tree API request per --tree-depth folder
+levels, falling back to fetching any deeper folders in parallel with a bounded pool of --threads, rather than one
+request per folder. The job list is cached locally for --cache-ttl secs and shared with check_jenkins_job_count.py
+
 The --password switch accepts either a password or a Jenkins API token
 
 Tested on Jenkins 2.60.1
@@ -32,22 +44,32 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import logging
+import hashlib
+import json
 import os
 import sys
+import tempfile
 import time
 import traceback
+from multiprocessing.pool import ThreadPool
 try:
     import jenkins
+    import requests
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
+try:
+    # Python 3
+    from urllib.parse import quote
+except ImportError:
+    # Python 2
+    from urllib import quote  # pylint: disable=no-name-in-module
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import log, ERRORS, WarningError, CriticalError, UnknownError, sec2human, jsonpp
+    from harisekhon.utils import log, ERRORS, WarningError, CriticalError, UnknownError, sec2human
     from harisekhon.utils import validate_chars, validate_int, isInt, support_msg_api
     from harisekhon import RestNagiosPlugin
 except ImportError:
@@ -55,7 +77,7 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2'
+__version__ = '0.3'
 
 
 class CheckJenkinsJob(RestNagiosPlugin):
@@ -69,16 +91,37 @@ class CheckJenkinsJob(RestNagiosPlugin):
         self.default_port = 8080
         self.msg = self.name + ' job '
         self.job = None
+        self.folder = None
+        self.view = None
+        self.depth = None
         self.list_jobs = False
         self.age = None
+        self.tree_depth = None
+        self.threads = None
+        self.cache_ttl = None
+        self.build_tree = 'lastCompletedBuild[number,displayName,result,duration,timestamp]'
 
     def add_options(self):
         super(CheckJenkinsJob, self).add_options()
         self.add_opt('-j', '--job', help='Job name to check')
+        self.add_opt('-f', '--folder', help='Check all jobs in this folder (use / separators for nested folders)')
+        self.add_opt('-i', '--view', help='Check all jobs in this view (within --folder if specified)')
+        self.add_opt('-d', '--depth', default=1,
+                     help='Folder nesting depth to include jobs from when checking a --folder / --view (default: 1)')
         self.add_opt('-l', '--list', action='store_true', help='List jobs and exit')
         self.add_opt('-a', '--age', help='Age in secs since last build (optional)')
+        self.add_job_list_options()
         self.add_thresholds(default_warning=3600, default_critical=7200)
 
+    def add_job_list_options(self):
+        self.add_opt('--tree-depth', metavar='N', default=5,
+                     help='Folder levels to fetch per recursive tree API request when listing all jobs, ' + \
+                          'deeper folders are fetched in parallel (default: 5)')
+        self.add_opt('--threads', metavar='N', default=10,
+                     help='Max parallel folder fetches for folders deeper than --tree-depth (default: 10)')
+        self.add_opt('--cache-ttl', metavar='secs', default=300,
+                     help='Cache the full job list for this many secs, 0 to disable (default: 300)')
+
     # can inherently accept AUTH token for password, see:
     # see https://wiki.jenkins-ci.org/display/JENKINS/Authenticating+scripted+clients
     # You can create an API token at:
@@ -86,106 +129,287 @@ class CheckJenkinsJob(RestNagiosPlugin):
     def process_options(self):
         super(CheckJenkinsJob, self).process_options()
         self.job = self.get_opt('job')
+        self.folder = self.get_opt('folder')
+        self.view = self.get_opt('view')
         self.list_jobs = self.get_opt('list')
-        if not self.list_jobs:
+        if self.folder:
+            validate_chars(self.folder, 'folder', r'A-Za-z0-9\s\./_-')
+            self.folder = self.folder.strip('/')
+        if self.view:
+            validate_chars(self.view, 'view', r'A-Za-z0-9\s\.,_-')
+        self.depth = self.get_opt('depth')
+        validate_int(self.depth, 'depth', 1, 10)
+        self.depth = int(self.depth)
+        if self.folder or self.view:
+            if self.job:
+                self.usage('cannot specify --job with --folder / --view')
+            self.msg = self.name + ' jobs '
+            if self.folder:
+                self.msg += "in folder '{folder}' ".format(folder=self.folder)
+            if self.view:
+                self.msg += "in view '{view}' ".format(view=self.view)
+        elif not self.list_jobs:
             validate_chars(self.job, 'job', r'A-Za-z0-9\s\._-')
             self.msg += "'{job}' ".format(job=self.job)
         self.age = self.get_opt('age')
         if self.age:
             validate_int(self.age, 'age')
             self.age = int(self.age)
+        self.process_job_list_options()
         self.validate_thresholds(integer=False, optional=True)
 
+    def process_job_list_options(self):
+        self.tree_depth = self.get_opt('tree_depth')
+        validate_int(self.tree_depth, 'tree depth', 1, 20)
+        self.tree_depth = int(self.tree_depth)
+        self.threads = self.get_opt('threads')
+        validate_int(self.threads, 'threads', 1, 100)
+        self.threads = int(self.threads)
+        self.cache_ttl = self.get_opt('cache_ttl')
+        validate_int(self.cache_ttl, 'cache ttl', 0, 86400)
+        self.cache_ttl = int(self.cache_ttl)
+
+    @staticmethod
+    def get_json(server, path, tree):
+        url = '{server}{path}api/json'.format(server=server.server, path=path)
+        log.debug('GET %s?tree=%s', url, tree)
+        content = server.jenkins_open(requests.Request('GET', url, params={'tree': tree}))
+        try:
+            return json.loads(content)
+        except ValueError as _:
+            raise UnknownError('failed to parse Jenkins json response: {0}. {1}'.format(_, support_msg_api()))
+
+    @staticmethod
+    def get_folder_path(folder):
+        return ''.join(['job/{0}/'.format(quote(_)) for _ in folder.split('/') if _])
+
+    def get_jobs_tree(self, depth):
+        # the innermost jobs[url] is only there to detect folders beyond --depth so they aren't counted as jobs
+        if depth < 1:
+            return 'jobs[url]'
+        return 'jobs[name,fullName,url,{build},{jobs}]'.format(build=self.build_tree,
+                                                               jobs=self.get_jobs_tree(depth - 1))
+
+    def flatten_jobs(self, jobs, depth=1):
+        for job in jobs:
+            # folders have a jobs field and no builds of their own
+            if 'jobs' in job:
+                if depth < self.depth:
+                    for _ in self.flatten_jobs(job['jobs'], depth + 1):
+                        yield _
+                else:
+                    log.debug("skipping folder '%s' deeper than --depth %d", job.get('fullName'), self.depth)
+            else:
+                yield job
+
+    def get_list_tree(self, depth):
+        # the innermost jobs[url] is only there to detect folders which still need expanding
+        if depth < 1:
+            return 'jobs[url]'
+        return 'jobs[name,fullName,url,{0}]'.format(self.get_list_tree(depth - 1))
+
+    def fetch_folder_jobs(self, server, folder):
+        """Returns the jobs and any folders too deep to have been expanded by a single tree request"""
+        json_data = self.get_json(server, self.get_folder_path(folder), self.get_list_tree(self.tree_depth))
+        jobs = []
+        unexpanded_folders = []
+        stack = [(_, 1) for _ in json_data.get('jobs', [])]
+        while stack:
+            (item, depth) = stack.pop()
+            if 'jobs' not in item:
+                jobs.append({'name': item.get('name'), 'fullName': item.get('fullName'), 'url': item.get('url')})
+            elif depth < self.tree_depth:
+                stack.extend([(_, depth + 1) for _ in item['jobs']])
+            elif item['jobs']:
+                unexpanded_folders.append(item['fullName'])
+        return (jobs, unexpanded_folders)
+
+    def get_cache_file(self, server, folder):
+        key = '{server}|{user}|{folder}'.format(server=server.server, user=self.user, folder=folder)
+        return os.path.join(tempfile.gettempdir(),
+                            'jenkins_jobs_{0}.json'.format(hashlib.md5(key.encode('utf-8')).hexdigest()))
+
+    def read_cache(self, cache_file):
+        try:
+            if time.time() - os.path.getmtime(cache_file) > self.cache_ttl:
+                log.debug('cache file %s expired', cache_file)
+                return None
+            with os.fdopen(os.open(cache_file, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))) as filehandle:
+                # the temp dir is shared, don't let another user plant a job list for us to report on
+                file_stat = os.fstat(filehandle.fileno())
+                if file_stat.st_uid != os.getuid() or file_stat.st_mode & 0o022:
+                    log.warning('ignoring cache file %s not owned by us or writable by others', cache_file)
+                    return None
+                jobs = json.load(filehandle)
+            log.debug('using %d cached jobs from %s', len(jobs), cache_file)
+            return jobs
+        except (IOError, OSError, ValueError) as _:
+            log.debug('no usable cache file %s: %s', cache_file, _)
+            return None
+
+    @staticmethod
+    def write_cache(cache_file, jobs):
+        tmp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        try:
+            # O_EXCL so a symlink planted at the predictable temp path is never followed
+            if os.path.lexists(tmp_file):
+                os.remove(tmp_file)
+            with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as filehandle:
+                json.dump(jobs, filehandle)
+            # atomic rename so concurrent runs never read a partially written cache
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as _:
+            log.warning('failed to write cache file %s: %s', cache_file, _)
+
+    def get_all_jobs(self, server, folder=''):
+        """Returns all jobs recursively under the given folder (or the root), from cache while fresh"""
+        cache_file = self.get_cache_file(server, folder)
+        if self.cache_ttl:
+            jobs = self.read_cache(cache_file)
+            if jobs is not None:
+                return jobs
+        (jobs, folders) = self.fetch_folder_jobs(server, folder)
+        if folders:
+            pool = ThreadPool(processes=min(self.threads, len(folders)))
+            try:
+                while folders:
+                    log.debug('fetching %d folders deeper than tree depth %d in parallel',
+                              len(folders), self.tree_depth)
+                    results = pool.map(lambda _: self.fetch_folder_jobs(server, _), folders)
+                    folders = []
+                    for (folder_jobs, unexpanded_folders) in results:
+                        jobs.extend(folder_jobs)
+                        folders.extend(unexpanded_folders)
+            finally:
+                pool.close()
+                pool.join()
+        if self.cache_ttl:
+            self.write_cache(cache_file, jobs)
+        return jobs
+
     def run(self):
         server_url = '{proto}://{host}:{port}'.format(proto=self.protocol, host=self.host, port=self.port)
         try:
             log.debug('setting up Jenkins connection to %s', server_url)
             start_time = time.time()
             server = jenkins.Jenkins(server_url, username=self.user, password=self.password, timeout=self.timeout / 3)
-            if log.isEnabledFor(logging.DEBUG):
-                log.debug('getting user')
-                user = server.get_whoami()
-                log.debug('connected as user %s', jsonpp(user))
-                #log.debug('getting version')
-                # bug - https://bugs.launchpad.net/python-jenkins/+bug/1578626
-                #version = server.get_version()
-                #log.debug('Jenkins server version is %s', version)
             if self.list_jobs:
                 log.debug('getting jobs')
-                #jobs = server.get_jobs()
-                # recursively get all jobs
-                jobs = server.get_all_jobs()
-                # more efficient with many folders
-#                jobs = server.run_script("""
-#                    import groovy.json.JsonBuilder;
-#
-#                    // get all projects excluding matrix configuration
-#                    // as they are simply part of a matrix project.
-#                    // there may be better ways to get just jobs
-#                    items = Jenkins.instance.getAllItems(AbstractProject);
-#                    items.removeAll {
-#                      it instanceof hudson.matrix.MatrixConfiguration
-#                    };
-#
-#                    def json = new JsonBuilder()
-#                    def root = json {
-#                      jobs items.collect {
-#                        [
-#                          name: it.name,
-#                          url: Jenkins.instance.getRootUrl() + it.getUrl(),
-#                          color: it.getIconColor().toString(),
-#                          fullname: it.getFullName()
-#                        ]
-#                      }
-#                    }
-#
-#                    // use json.toPrettyString() if viewing
-#                    println json.toString()
-#                    """)
+                # recursively get all jobs in as few requests as possible rather than server.get_all_jobs()
+                # which makes one request per folder
+                try:
+                    jobs = self.get_all_jobs(server, self.folder or '')
+                except jenkins.NotFoundException:
+                    raise CriticalError("folder '{folder}' not found!".format(folder=self.folder))
                 print('Jenkins Jobs:\n')
-                for job in jobs:
-                    print(job['fullname'])
+                for job in sorted(jobs, key=lambda _: _['fullName']):
+                    print(job['fullName'])
                 sys.exit(ERRORS['UNKNOWN'])
 
-            log.debug('checking job exists')
-            # less informative error message
-            #assert server.job_exists(self.job) # True
-            # this will give an intuitive error that a job doesn't exist
-            # rather than letting it fail later with 'request object not found'
-            server.assert_job_exists(self.job)
-
-            log.debug('getting last build num for job %s', self.job)
-            last_completed_build = server.get_job_info(self.job)['lastCompletedBuild']
-            if not last_completed_build:
-                raise WarningError("job '{job}' not built yet".format(job=self.job))
-            latest_build = last_completed_build['number']
-            log.debug('getting build info for job %s, latest build num %s', self.job, latest_build)
-            build_info = server.get_build_info(self.job, latest_build)
-            log.debug('build info: %s', build_info)
-            self.process_build_info(build_info)
+            if self.folder or self.view:
+                path = ''
+                if self.folder:
+                    path += self.get_folder_path(self.folder)
+                if self.view:
+                    path += 'view/{view}/'.format(view=quote(self.view))
+                log.debug('getting jobs and last completed builds for %s', path)
+                try:
+                    json_data = self.get_json(server, path, self.get_jobs_tree(self.depth))
+                except jenkins.NotFoundException:
+                    raise CriticalError('{msg}not found!'.format(msg=self.msg))
+                self.process_jobs(list(self.flatten_jobs(json_data.get('jobs', []))))
+            else:
+                # single request for job existence, last completed build and its status
+                # rather than assert_job_exists() + get_job_info() + get_build_info()
+                log.debug('getting last completed build info for job %s', self.job)
+                try:
+                    job_info = self.get_json(server, self.get_folder_path(self.job),
+                                             'name,{build}'.format(build=self.build_tree))
+                except jenkins.NotFoundException:
+                    raise CriticalError("job '{job}' does not exist".format(job=self.job))
+                last_completed_build = job_info.get('lastCompletedBuild')
+                if not last_completed_build:
+                    raise WarningError("job '{job}' not built yet".format(job=self.job))
+                log.debug('build info: %s', last_completed_build)
+                self.process_build_info(last_completed_build)
         except jenkins.JenkinsException as _:
             raise CriticalError(_)
 
         query_time = time.time() - start_time
         self.msg += ' query_time={0:.4f}s'.format(query_time)
 
-    def process_build_info(self, build_info):
-        displayname = build_info['displayName']
+    def process_jobs(self, jobs):
+        num_jobs = len(jobs)
+        failed_jobs = []
+        not_built_jobs = []
+        old_jobs = []
+        max_duration = 0
+        slowest_job = None
+        max_age = 0
+        for job in jobs:
+            name = job.get('fullName', job.get('name'))
+            build_info = job.get('lastCompletedBuild')
+            if not build_info:
+                log.info("job '%s' not built yet", name)
+                not_built_jobs.append(name)
+                continue
+            (result, duration, timestamp) = self.parse_build_info(build_info)
+            log.info("job '%s' result = %s, duration = %s secs", name, result, duration)
+            if result != 'SUCCESS':
+                failed_jobs.append(name)
+            if duration > max_duration or slowest_job is None:
+                max_duration = duration
+                slowest_job = name
+            age = time.time() - (timestamp/1000)
+            max_age = max(max_age, age)
+            if self.age and age > self.age:
+                old_jobs.append(name)
+        self.msg += '= {0}'.format(num_jobs)
+        if num_jobs < 1:
+            self.warning()
+            self.msg += ' (no jobs found!)'
+        self.msg += ', failed = {0}'.format(len(failed_jobs))
+        if failed_jobs:
+            self.critical()
+            if self.verbose:
+                self.msg += ' [{0}]'.format(', '.join(failed_jobs))
+        self.msg += ', not built = {0}'.format(len(not_built_jobs))
+        if not_built_jobs:
+            self.warning()
+            if self.verbose:
+                self.msg += ' [{0}]'.format(', '.join(not_built_jobs))
+        self.msg += ', max duration = {0} secs'.format(max_duration)
+        if slowest_job:
+            self.msg += " (job '{0}')".format(slowest_job)
+        self.check_thresholds(max_duration)
+        self.msg += ', oldest build age = {0}'.format(sec2human(max_age))
+        if old_jobs:
+            self.critical()
+            self.msg += ' ({0} jobs > {1:d} secs)'.format(len(old_jobs), self.age)
+            if self.verbose:
+                self.msg += ' [{0}]'.format(', '.join(old_jobs))
+        self.msg += ' | num_jobs={0} num_failed_jobs={1} num_not_built_jobs={2}'\
+                    .format(num_jobs, len(failed_jobs), len(not_built_jobs))
+        self.msg += ' max_build_duration={duration}s{perf_thresholds}'\
+                    .format(duration=max_duration, perf_thresholds=self.get_perf_thresholds())
+        self.msg += ' max_build_age={0:.0f}s'.format(max_age)
+
+    @staticmethod
+    def parse_build_info(build_info):
         duration = build_info['duration']
         if not isInt(duration):
             raise UnknownError('duration field returned non-integer! {0}'.format(support_msg_api()))
         duration = int(duration) / 1000
-        result = build_info['result']
         timestamp = build_info['timestamp']
         if not isInt(timestamp):
             raise UnknownError('timestamp field returned non-integer! {0}'.format(support_msg_api()))
         timestamp = int(timestamp)
-        building = build_info['building']
+        return (build_info['result'], duration, timestamp)
+
+    def process_build_info(self, build_info):
+        displayname = build_info['displayName']
+        (result, duration, timestamp) = self.parse_build_info(build_info)
         self.msg += "build {build} status: ".format(build=displayname)
-        if building:
-            self.unknown()
-            self.msg += 'STILL BUILDING!'
-            return
         self.msg += result
         if result != 'SUCCESS':
             self.critical()
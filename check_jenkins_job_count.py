@@ -24,6 +24,9 @@ Can check the job count for only a given --view but it's a much less efficient O
 manually return all of the view's jobs and count them on the client side rather than simply returning the figure as the
 Jenkins API doesn't actually support a per view count
 
+Jobs in nested folders are counted using the same recursive tree API traversal and local --cache-ttl job list cache
+as check_jenkins_job.py --list rather than one request per folder, which matters with tens of thousands of jobs
+
 The --password switch accepts either a password or an API token
 
 Tested on Jenkins 2.60.1
@@ -45,22 +48,28 @@ try:
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
+try:
+    # Python 3
+    from urllib.parse import quote
+except ImportError:
+    # Python 2
+    from urllib import quote  # pylint: disable=no-name-in-module
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
     from harisekhon.utils import log, ERRORS, CriticalError, jsonpp, validate_chars
-    from harisekhon import RestNagiosPlugin
+    from check_jenkins_job import CheckJenkinsJob
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.2'
+__version__ = '0.3'
 
 
-class CheckJenkinsJobCount(RestNagiosPlugin):
+class CheckJenkinsJobCount(CheckJenkinsJob):
 
     def __init__(self):
         # Python 2.x
@@ -74,9 +83,13 @@ class CheckJenkinsJobCount(RestNagiosPlugin):
         self.list_views = False
 
     def add_options(self):
-        super(CheckJenkinsJobCount, self).add_options()
+        # Skip CheckJenkinsJob and go straight to it's parent as we only want the job listing options
+        # shut up pylint this works
+        super(CheckJenkinsJob, self).add_options()  # pylint: disable=bad-super-call
         self.add_opt('-i', '--view', help='Restrict job counts to a specific view')
+        self.add_opt('-f', '--folder', help='Restrict job counts to a specific folder (use / separators for nested)')
         self.add_opt('-l', '--list-views', action='store_true', help='List views and exit')
+        self.add_job_list_options()
         self.add_thresholds()
 
     # can inherently accept AUTH token for password, see:
@@ -84,11 +97,16 @@ class CheckJenkinsJobCount(RestNagiosPlugin):
     # You can create an API token at:
     # http://jenkins/me/configure
     def process_options(self):
-        super(CheckJenkinsJobCount, self).process_options()
+        super(CheckJenkinsJob, self).process_options()  # pylint: disable=bad-super-call
         self.view = self.get_opt('view')
+        self.folder = self.get_opt('folder')
         self.list_views = self.get_opt('list_views')
         if self.view:
             validate_chars(self.view, 'view', r'A-Za-z0-9\s\.,_-')
+        if self.folder:
+            validate_chars(self.folder, 'folder', r'A-Za-z0-9\s\./_-')
+            self.folder = self.folder.strip('/')
+        self.process_job_list_options()
         self.validate_thresholds(optional=True)
 
     def run(self):
@@ -97,10 +115,6 @@ class CheckJenkinsJobCount(RestNagiosPlugin):
             log.debug('setting up Jenkins connection to %s', server_url)
             start_time = time.time()
             server = jenkins.Jenkins(server_url, username=self.user, password=self.password, timeout=self.timeout / 3)
-            if log.isEnabledFor(logging.DEBUG):
-                log.debug('getting user')
-                user = server.get_whoami()
-                log.debug('connected as user %s', jsonpp(user))
             if self.list_views:
                 log.debug('getting views')
                 views = server.get_views()
@@ -111,25 +125,28 @@ class CheckJenkinsJobCount(RestNagiosPlugin):
                     print(view['name'])
                 sys.exit(ERRORS['UNKNOWN'])
             if self.view:
-                log.debug('checking view exists')
-                #assert server.view_exists(self.view)
-                server.assert_view_exists(self.view)
                 log.debug('getting jobs for view %s', self.view)
-                view_jobs = server.get_jobs(view_name=self.view)
+                # single request for the view's job names, 404s if the view doesn't exist
+                try:
+                    view_jobs = self.get_json(server,
+                                              self.get_folder_path(self.folder or '') + \
+                                              'view/{view}/'.format(view=quote(self.view)),
+                                              'jobs[name]').get('jobs', [])
+                except jenkins.NotFoundException:
+                    raise CriticalError("view '{view}' does not exist".format(view=self.view))
                 if log.isEnabledFor(logging.DEBUG):
                     log.debug("%s", jsonpp(view_jobs))
                 job_count = len(view_jobs)
             else:
                 log.debug('getting job count')
-                job_count = server.jobs_count()
-                # more efficient with many folders
-#               job_count = server.run_script(
-#                "print(Hudson.instance.getAllItems("
-#                "    hudson.model.AbstractProject).count{"
-#                "        !(it instanceof hudson.matrix.MatrixConfiguration)"
-#                "    })")
+                try:
+                    job_count = len(self.get_all_jobs(server, self.folder or ''))
+                except jenkins.NotFoundException:
+                    raise CriticalError("folder '{folder}' does not exist".format(folder=self.folder))
             query_time = time.time() - start_time
             log.debug('job count: %s', job_count)
+            if self.folder:
+                self.msg += "for folder '{0}' ".format(self.folder)
             if self.view:
                 self.msg += "for view '{0}' ".format(self.view)
             self.msg += '= {0}'.format(job_count)
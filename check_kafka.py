@@ -23,6 +23,10 @@ through the brokers
 Thresholds apply to max produce / consume message timings which are also output as perfdata for graphing.
 Total time includes setup, connection and message timings etc.
 
+A single consumer is bootstrapped per run and shared for topic and partition metadata as well as consuming, and the
+producer reuses the API version it detected, so the broker connection and metadata timings are reported separately
+from the produce / consume timings instead of being hidden inside them.
+
 If partition is not specified it'll randomize the partition selection, but this could result in state flapping
 in between different runs that may select a malfunctioning partition one time and working one the other time
 so ideally you should specify the --partition explicitly and implement a separate check per partition.
@@ -44,6 +48,7 @@ from __future__ import print_function
 import os
 import random
 import sys
+import time
 import traceback
 try:
     from kafka import KafkaConsumer, KafkaProducer
@@ -63,7 +68,7 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.5.5'
+__version__ = '0.6'
 
 
 class CheckKafka(PubSubNagiosPlugin):
@@ -85,28 +90,26 @@ class CheckKafka(PubSubNagiosPlugin):
                                                             pid=os.getpid(),
                                                             random=random_alnum(10))
         self.acks = '1'
+        # no batching by default, there is only one message to send
+        self.batch_size = 0
+        self.linger_ms = 0
         self.retries = 0
         self.partition = None
         self.topic_partition = None
         self.brokers = None
         self.timeout_ms = None
         self.start_offset = None
+        self.topic_list = None
+        self.connect_time = None
+        self.metadata_time = None
+        self.producer_connect_time = None
         self.sleep_secs = 0
         self.sleep_usage = 'Sleep in seconds between producing and consuming from given topic' + \
                            ' (optional, default: {} secs)'.format(self.default_sleep_secs)
 
     def add_options(self):
         # super(CheckKafka, self).add_options()
-        self.add_opt('-B', '--brokers',
-                     dest='brokers', metavar='broker_list',
-                     help='Kafka Broker seed list in form host[:port],host2[:port2]... ' + \
-                             '($KAFKA_BROKERS, $KAFKA_HOST:$KAFKA:PORT, default: localhost:9092)')
-        self.add_opt('-H', '--host',
-                     help='Kafka broker host, used to construct --brokers if not specified ' + \
-                          '($KAFKA_HOST, default: {0})'.format(self.default_host))
-        self.add_opt('-P', '--port',
-                     help='Kafka broker port, used to construct --brokers if not specified ' + \
-                          '($KAFKA_PORT, default: {0})'.format(self.default_port))
+        self.add_broker_options()
         self.add_opt('-T', '--topic', default=os.getenv('KAFKA_TOPIC'), help='Kafka Topic ($KAFKA_TOPIC)')
         self.add_opt('-p', '--partition', type=int, help='Kafka Partition (default: random)')
         self.add_opt('-a', '--acks', default=1, choices=['1', 'all'],
@@ -119,6 +122,18 @@ class CheckKafka(PubSubNagiosPlugin):
                      help='List Kafka topic paritions from broker(s) and exit')
         self.add_thresholds(default_warning=1, default_critical=2)
 
+    def add_broker_options(self):
+        self.add_opt('-B', '--brokers',
+                     dest='brokers', metavar='broker_list',
+                     help='Kafka Broker seed list in form host[:port],host2[:port2]... ' + \
+                             '($KAFKA_BROKERS, $KAFKA_HOST:$KAFKA:PORT, default: localhost:9092)')
+        self.add_opt('-H', '--host',
+                     help='Kafka broker host, used to construct --brokers if not specified ' + \
+                          '($KAFKA_HOST, default: {0})'.format(self.default_host))
+        self.add_opt('-P', '--port',
+                     help='Kafka broker port, used to construct --brokers if not specified ' + \
+                          '($KAFKA_PORT, default: {0})'.format(self.default_port))
+
     def process_broker_args(self):
         self.brokers = self.get_opt('brokers')
         host = self.get_opt('host')
@@ -218,6 +233,16 @@ class CheckKafka(PubSubNagiosPlugin):
         except KafkaError:
             err = self.exception_msg()
             raise CriticalError(err)
+        self.add_setup_timings()
+
+    def add_setup_timings(self):
+        (msg, _, perfdata) = self.msg.partition(' | ')
+        self.msg = msg
+        self.msg += ', connect = {0:.4f} secs, metadata = {1:.4f} secs, producer connect = {2:.4f} secs'\
+                    .format(self.connect_time or 0, self.metadata_time or 0, self.producer_connect_time or 0)
+        self.msg += ' | ' + perfdata
+        self.msg += ' connect_time={0:.4f}s metadata_time={1:.4f}s producer_connect_time={2:.4f}s'\
+                    .format(self.connect_time or 0, self.metadata_time or 0, self.producer_connect_time or 0)
 
     def exception_msg(self):
         err = traceback.format_exc().split('\n')[-2]
@@ -225,14 +250,30 @@ class CheckKafka(PubSubNagiosPlugin):
             err += ". Could not connect to Kafka broker(s) '{0}'".format(self.brokers)
         return err
 
+    def get_consumer(self):
+        """Returns the one consumer used for metadata, listing and consuming, bootstrapping it on first use"""
+        if self.consumer is None:
+            log.debug('creating consumer')
+            start_time = time.time()
+            self.consumer = KafkaConsumer(
+                bootstrap_servers=self.brokers,
+                client_id=self.client_id,
+                #request_timeout_ms=self.timeout_ms + 1, # must be larger than session timeout
+                #session_timeout_ms=self.timeout_ms,
+                )
+            self.connect_time = time.time() - start_time
+            log.debug('consumer connected in %.4f secs', self.connect_time)
+        return self.consumer
+
     def get_topics(self):
-        self.consumer = KafkaConsumer(
-            bootstrap_servers=self.brokers,
-            client_id=self.client_id,
-            #request_timeout_ms=self.timeout_ms + 1, # must be larger than session timeout
-            #session_timeout_ms=self.timeout_ms,
-            )
-        return self.consumer.topics()
+        if self.topic_list is None:
+            consumer = self.get_consumer()
+            start_time = time.time()
+            # single metadata request for all topics, partitions_for_topic() is then served from the metadata cache
+            self.topic_list = consumer.topics()
+            self.metadata_time = time.time() - start_time
+            log.debug('fetched metadata for %d topics in %.4f secs', len(self.topic_list), self.metadata_time)
+        return self.topic_list
 
     def print_topics(self):
         print('Kafka Topics:\n')
@@ -240,15 +281,9 @@ class CheckKafka(PubSubNagiosPlugin):
             print(topic)
 
     def get_topic_partitions(self, topic):
-        self.consumer = KafkaConsumer(
-            topic,
-            bootstrap_servers=self.brokers,
-            client_id=self.client_id,
-            #request_timeout_ms=self.timeout_ms
-            )
         if topic not in self.get_topics():
             raise CriticalError("topic '{0}' does not exist on Kafka broker".format(topic))
-        partitions = self.consumer.partitions_for_topic(topic)
+        partitions = self.get_consumer().partitions_for_topic(topic)
         if not isSet(partitions):
             raise UnknownError('partitions returned type is {}, not a set as expected'.format(type(partitions)))
         return partitions
@@ -261,15 +296,10 @@ class CheckKafka(PubSubNagiosPlugin):
         print()
 
     def subscribe(self):
-        self.consumer = KafkaConsumer(
-            #self.topic,
-            bootstrap_servers=self.brokers,
-            # client_id=self.client_id,
-            # group_id=self.group_id,
-            #request_timeout_ms=self.timeout_ms
-            )
-            #key_serializer
-            #value_serializer
+        # reuses the consumer and metadata already fetched if the partition was randomly selected
+        if self.partition not in self.get_topic_partitions(self.topic):
+            raise CriticalError("partition '{0}' does not exist for topic '{1}'".format(self.partition, self.topic))
+        self.consumer = self.get_consumer()
         # this is only a guess as Kafka doesn't expose it's API version
         #log.debug('kafka api version: %s', self.consumer.config['api_version'])
         log.debug('partition assignments: {0}'.format(self.consumer.assignment()))
@@ -293,20 +323,32 @@ class CheckKafka(PubSubNagiosPlugin):
             raise UnknownError('Kafka Consumer reported current starting offset = {0}'.format(self.start_offset))
         log.debug('recorded starting offset \'{0}\''.format(self.start_offset))
         # self.consumer.pause()
+        self.create_producer()
 
-    def publish(self):
+    def create_producer(self):
         log.debug('creating producer')
+        start_time = time.time()
         self.producer = KafkaProducer(
             bootstrap_servers=self.brokers,
             client_id=self.client_id,
             acks=self.acks,
-            batch_size=0,
+            batch_size=self.batch_size,
+            linger_ms=self.linger_ms,
             max_block_ms=self.timeout_ms,
+            # skip probing the brokers for the API version again, the consumer already did
+            api_version=self.consumer.config['api_version'],
             #request_timeout_ms=self.timeout_ms + 1, # must be larger than session timeout
             #session_timeout_ms=self.timeout_ms,
             )
             #key_serializer
             #value_serializer
+        # fetch the topic metadata now so that it isn't counted in the publish time
+        log.debug('producer.partitions_for()')
+        self.producer.partitions_for(self.topic)
+        self.producer_connect_time = time.time() - start_time
+        log.debug('producer connected in %.4f secs', self.producer_connect_time)
+
+    def publish(self):
         log.debug('producer.send()')
         self.producer.send(
             self.topic,
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 17:20:05 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check Kafka end-to-end latency by passing a burst of timestamped probe messages through a partition
+
+Similar to check_kafka.py but instead of timing a single message, which is too noisy to alert on, produces --num
+timestamped probe messages at a target --rate of messages per second to a partition and consumes them all back,
+calculating the end-to-end latency of each from the timestamp embedded in the message
+
+Warning / Critical thresholds apply to the end-to-end latency in secs at the --percentile selected (default: p99)
+
+Outputs the end-to-end latency p50 / p95 / p99 / max, a latency histogram, produce and consume throughput in
+messages per second, and the number of missing messages as perfdata
+
+Use --acks all to include the time for all In-Sync Replicas to acknowledge each message
+
+Raises Critical if any probe message is not consumed back within the timeout
+
+If partition is not specified it'll randomize the partition selection, same as check_kafka.py
+
+Tested on Kafka 0.8.1, 0.8.2.2, 0.9.0.1
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+#from __future__ import unicode_literals
+
+import os
+import sys
+import time
+import traceback
+try:
+    from kafka.common import KafkaError
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+libdir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'pylib'))
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, CriticalError, random_alnum, validate_int, validate_float
+    from check_kafka import CheckKafka
+    from lib_latency_stats import percentile_of
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckKafkaBurst(CheckKafka):
+
+    percentiles = ('p50', 'p95', 'p99', 'max')
+    # latency histogram bucket upper bounds in milliseconds
+    histogram_buckets = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckKafkaBurst, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.num = None
+        self.rate = None
+        self.percentile = None
+        # let the producer batch messages sent while a previous request is in flight
+        self.batch_size = 16384
+        self.send_times = []
+        self.msg = 'msg not defined yet'
+
+    def add_options(self):
+        super(CheckKafkaBurst, self).add_options()
+        self.add_opt('-n', '--num', metavar='N', default=100,
+                     help='Number of probe messages to send in the burst (default: 100)')
+        self.add_opt('-r', '--rate', metavar='msgs/sec', default=100,
+                     help='Target rate to send probe messages at, 0 for as fast as possible (default: 100)')
+        self.add_opt('--percentile', default='p99',
+                     help='Latency percentile to apply thresholds to: {0} (default: p99)'\
+                          .format(' / '.join(self.percentiles)))
+
+    def process_args(self):
+        super(CheckKafkaBurst, self).process_args()
+        self.num = self.get_opt('num')
+        validate_int(self.num, 'num', 1, 100000)
+        self.num = int(self.num)
+        self.rate = self.get_opt('rate')
+        validate_float(self.rate, 'rate', 0, 100000)
+        self.rate = float(self.rate)
+        self.percentile = self.get_opt('percentile')
+        if self.percentile not in self.percentiles:
+            self.usage('--percentile must be one of: {0}'.format(', '.join(self.percentiles)))
+
+    def run(self):
+        try:
+            self.burst()
+        except KafkaError:
+            err = self.exception_msg()
+            raise CriticalError(err)
+        self.add_setup_timings()
+
+    def produce(self, latencies, last_receive):
+        self.key = random_alnum(20)
+        key = self.key.encode('utf-8')
+        futures = []
+        start_time = time.time()
+        for seq in range(self.num):
+            if self.rate:
+                # pace against the burst start rather than sleeping a fixed interval so send overhead doesn't drift,
+                # consuming while waiting so latencies don't include the rest of the send schedule
+                send_at = start_time + seq / self.rate
+                while time.time() < send_at:
+                    self.poll_back(latencies, last_receive, send_at - time.time())
+            send_time = time.time()
+            self.send_times.append(send_time)
+            futures.append(self.producer.send(
+                self.topic,
+                key=key,
+                partition=self.partition,
+                value='{0} {1} {2:.6f}'.format(self.key, seq, send_time).encode('utf-8')
+                ))
+        log.debug('producer.flush() %d probe messages', self.num)
+        self.producer.flush(timeout=self.timeout_ms / 1000)
+        produce_time = time.time() - start_time
+        failures = 0
+        for future in futures:
+            try:
+                future.get(timeout=0)
+            except KafkaError as _:
+                log.info('produce failed: %s', _)
+                failures += 1
+        return (failures, produce_time)
+
+    def poll_back(self, latencies, last_receive, timeout):
+        key = self.key.encode('utf-8')
+        timeout_ms = max(0, int(timeout * 1000))
+        for consumer_record in self.consumer.poll(timeout_ms=timeout_ms).get(self.topic_partition, []):
+            if consumer_record.key != key:
+                continue
+            receive_time = time.time()
+            (_, seq, send_time) = consumer_record.value.decode('utf-8').split()
+            latencies[int(seq)] = receive_time - float(send_time)
+            last_receive[0] = receive_time
+
+    def consume_back(self, latencies, last_receive, deadline):
+        while len(latencies) < self.num and time.time() < deadline:
+            self.poll_back(latencies, last_receive, max(0.001, deadline - time.time()))
+            log.debug('%d probe messages consumed so far', len(latencies))
+
+    def burst(self):
+        start_time = time.time()
+        deadline = start_time + max(self.timeout - 1, 1)
+        self.subscribe()
+        self.consumer.seek(self.topic_partition, self.start_offset)
+        latencies = {}
+        # mutable so the polls interleaved with the paced sends can update it
+        last_receive = [None]
+        (failures, produce_time) = self.produce(latencies, last_receive)
+        self.consume_back(latencies, last_receive, deadline)
+        consume_time = last_receive[0] - self.send_times[0] if last_receive[0] else 0
+        self.output(sorted(latencies.values()), failures, produce_time, consume_time)
+
+    def output(self, latencies, failures, produce_time, consume_time):
+        num_received = len(latencies)
+        missing = self.num - num_received
+        stats = {
+            'p50': percentile_of(latencies, 50),
+            'p95': percentile_of(latencies, 95),
+            'p99': percentile_of(latencies, 99),
+            'max': latencies[-1] if latencies else 0,
+        }
+        produce_rate = self.num / produce_time if produce_time else 0
+        consume_rate = num_received / consume_time if consume_time else 0
+        self.msg = "Kafka {0} end-to-end latency = {1:.4f} secs".format(self.percentile, stats[self.percentile])
+        self.check_thresholds(stats[self.percentile])
+        self.msg += " for {0}/{1} probe messages through topic '{2}' partition {3}"\
+                    .format(num_received, self.num, self.topic, self.partition)
+        if missing:
+            self.critical()
+            self.msg += ', {0} missing ({1} failed to produce)'.format(missing, failures)
+        self.msg += ', produce rate = {0:.1f} msgs/sec, consume rate = {1:.1f} msgs/sec'\
+                    .format(produce_rate, consume_rate)
+        histogram = []
+        index = 0
+        for bucket in self.histogram_buckets:
+            count = 0
+            while index < num_received and latencies[index] * 1000 <= bucket:
+                count += 1
+                index += 1
+            histogram.append(('{0}ms'.format(bucket), count))
+        histogram.append(('inf', num_received - index))
+        if self.verbose:
+            self.msg += ', latency histogram = [{0}]'.format(', '.join(['<={0}: {1}'.format(bucket, count)
+                                                                        for (bucket, count) in histogram]))
+        self.msg += ' |'
+        for percentile in self.percentiles:
+            self.msg += ' latency_{0}={1:.4f}s'.format(percentile, stats[percentile])
+            if percentile == self.percentile:
+                self.msg += self.get_perf_thresholds()
+        self.msg += ' messages_sent={0} messages_received={1} messages_missing={2} produce_failures={3}'\
+                    .format(self.num, num_received, missing, failures)
+        self.msg += ' produce_rate={0:.1f} consume_rate={1:.1f}'.format(produce_rate, consume_rate)
+        for (bucket, count) in histogram:
+            self.msg += ' latency_le_{0}={1}'.format(bucket, count)
+
+
+if __name__ == '__main__':
+    CheckKafkaBurst().main()
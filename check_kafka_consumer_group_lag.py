@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 16:47:53 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check Kafka consumer group lag via the Kafka APIs
+
+Lists all consumer groups (or those matching the --group regex) and for each group fetches all of its committed
+offsets in a single OffsetFetch request to the group's coordinator, then fetches the end offsets of every partition
+involved across all groups in one ListOffsets request per leader broker, so thousands of partitions only cost one
+request per group plus one per broker
+
+Calculates the lag per group, topic and partition as end offset - committed offset
+
+Warning / Critical thresholds apply to the max lag of any partition, and optional --total-warning / --total-critical
+thresholds apply to the total lag of any group
+
+Outputs the top N lagging partitions and the total lag per group as perfdata
+
+Optionally restrict to topics matching the --topic regex
+
+Requires Kafka 0.10+ for the consumer group APIs
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+#from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import time
+import traceback
+try:
+    from kafka import KafkaAdminClient
+    from kafka.common import KafkaError
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+libdir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'pylib'))
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, ERRORS, CriticalError, validate_int, validate_regex, plural
+    from check_kafka import CheckKafka
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckKafkaConsumerGroupLag(CheckKafka):
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckKafkaConsumerGroupLag, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.admin = None
+        self.group = None
+        self.topic = None
+        self.top = None
+        self.total_warning = None
+        self.total_critical = None
+        self.msg = 'msg not defined yet'
+
+    def add_options(self):
+        self.add_broker_options()
+        self.add_opt('-g', '--group', metavar='regex',
+                     help='Only check consumer groups matching this regex (default: all consumer groups)')
+        self.add_opt('-T', '--topic', metavar='regex', help='Only check topics matching this regex')
+        self.add_opt('-n', '--top', metavar='N', default=5,
+                     help='Number of top lagging partitions to output (default: 5)')
+        self.add_opt('--total-warning', metavar='N', help='Warning threshold for the total lag of any group')
+        self.add_opt('--total-critical', metavar='N', help='Critical threshold for the total lag of any group')
+        self.add_opt('--list-groups', action='store_true', help='List Kafka consumer groups and exit')
+        self.add_thresholds(default_warning=1000, default_critical=10000)
+
+    def process_args(self):
+        self.process_broker_args()
+        self.timeout_ms = max((self.timeout * 1000 - 1000) / 2, 1000)
+        for name in ('group', 'topic'):
+            regex = self.get_opt(name)
+            if regex:
+                validate_regex(regex, name)
+                setattr(self, name, re.compile(regex))
+        self.top = self.get_opt('top')
+        validate_int(self.top, 'top', 0)
+        self.top = int(self.top)
+        for name in ('total_warning', 'total_critical'):
+            threshold = self.get_opt(name)
+            if threshold is not None:
+                validate_int(threshold, name.replace('_', ' '), 0)
+                setattr(self, name, int(threshold))
+        self.validate_thresholds(simple='upper', integer=True, positive=True)
+
+    def run(self):
+        try:
+            if self.get_opt('list_groups'):
+                self.print_groups()
+                sys.exit(ERRORS['UNKNOWN'])
+            self.check_lag()
+        except KafkaError:
+            err = self.exception_msg()
+            raise CriticalError(err)
+
+    def get_admin(self):
+        if self.admin is None:
+            log.debug('creating admin client')
+            self.admin = KafkaAdminClient(bootstrap_servers=self.brokers,
+                                          client_id=self.client_id,
+                                          request_timeout_ms=self.timeout_ms)
+        return self.admin
+
+    def get_groups(self):
+        # ListGroups has to be sent to every broker as each only knows the groups it coordinates
+        groups = [group for (group, protocol_type) in self.get_admin().list_consumer_groups()
+                  if protocol_type in ('consumer', '')]
+        if self.group:
+            groups = [group for group in groups if self.group.search(group)]
+        return sorted(groups)
+
+    def print_groups(self):
+        print('Kafka Consumer Groups:\n')
+        for group in self.get_groups():
+            print(group)
+
+    def get_committed_offsets(self, groups):
+        committed_offsets = {}
+        for group in groups:
+            # all partitions' committed offsets for the group in one OffsetFetch request to its coordinator
+            log.debug("fetching committed offsets for group '%s'", group)
+            offsets = self.get_admin().list_consumer_group_offsets(group)
+            for (topic_partition, offset_metadata) in offsets.items():
+                if self.topic and not self.topic.search(topic_partition.topic):
+                    continue
+                # -1 means no offset committed for this partition
+                if offset_metadata.offset < 0:
+                    continue
+                committed_offsets[(group, topic_partition)] = offset_metadata.offset
+        return committed_offsets
+
+    def check_lag(self):
+        start_time = time.time()
+        groups = self.get_groups()
+        committed_offsets = self.get_committed_offsets(groups)
+        offsets_time = time.time() - start_time
+        topic_partitions = sorted(set([topic_partition for (_, topic_partition) in committed_offsets]))
+        start_time = time.time()
+        # one ListOffsets request per leader broker for all partitions of all groups
+        log.debug('fetching end offsets for %d partitions', len(topic_partitions))
+        end_offsets = self.get_consumer().end_offsets(topic_partitions) if topic_partitions else {}
+        end_offsets_time = time.time() - start_time
+        group_lag = dict([(group, 0) for group in groups])
+        partition_lags = []
+        for ((group, topic_partition), committed_offset) in committed_offsets.items():
+            lag = max(0, end_offsets[topic_partition] - committed_offset)
+            group_lag[group] += lag
+            partition_lags.append((lag, group, topic_partition.topic, topic_partition.partition))
+        partition_lags.sort(reverse=True)
+        max_lag = partition_lags[0][0] if partition_lags else 0
+        total_lag = sum(group_lag.values())
+        num_groups = len(groups)
+        self.msg = 'Kafka max consumer group partition lag = {0}'.format(max_lag)
+        self.check_thresholds(max_lag)
+        self.msg += ', total lag = {0} across {1} consumer group{2} and {3} partition{4}'\
+                    .format(total_lag, num_groups, plural(num_groups),
+                            len(partition_lags), plural(len(partition_lags)))
+        self.check_total_lag(group_lag)
+        if self.top and partition_lags:
+            self.msg += ', top lagging partitions = [{0}]'\
+                        .format(', '.join(["{0}/{1}/{2}={3}".format(group, topic, partition, lag)
+                                           for (lag, group, topic, partition) in partition_lags[:self.top]]))
+        self.msg += ' | max_partition_lag={0}{1} total_lag={2} consumer_groups={3} partitions={4}'\
+                    .format(max_lag, self.get_perf_thresholds(), total_lag, num_groups, len(partition_lags))
+        for group in groups:
+            self.msg += " '{0}_total_lag'={1}".format(group.replace("'", ''), group_lag[group])
+            if self.total_warning is not None or self.total_critical is not None:
+                self.msg += ';{0};{1}'.format('' if self.total_warning is None else self.total_warning,
+                                              '' if self.total_critical is None else self.total_critical)
+        self.msg += ' committed_offsets_time={0:.4f}s end_offsets_time={1:.4f}s'\
+                    .format(offsets_time, end_offsets_time)
+
+    def check_total_lag(self, group_lag):
+        breaching_groups = []
+        for group in sorted(group_lag, key=lambda _: group_lag[_], reverse=True):
+            lag = group_lag[group]
+            if self.total_critical is not None and lag > self.total_critical:
+                self.critical()
+                breaching_groups.append('{0}={1}'.format(group, lag))
+            elif self.total_warning is not None and lag > self.total_warning:
+                self.warning()
+                breaching_groups.append('{0}={1}'.format(group, lag))
+        if breaching_groups:
+            self.msg += ', groups with total lag > {0} = {1} [{2}]'\
+                        .format(self.total_warning if self.total_warning is not None else self.total_critical,
+                                len(breaching_groups), ', '.join(breaching_groups))
+
+
+if __name__ == '__main__':
+    CheckKafkaConsumerGroupLag().main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 16:12:27 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check a Kafka cluster is working by passing a unique message through every partition of a topic
+
+Similar to check_kafka.py but instead of one partition per run, produces a keyed probe message to every partition
+of the topic (or a random --sample of them) concurrently with producer batching, and consumes them all back
+via assigned partitions, so a dead or lagging leader on one partition out of hundreds is caught on the next run
+
+Checks:
+
+1. topic exists
+2. every partition has a leader
+3. every probe message is acknowledged by the partition leader (or all ISRs with --acks all)
+4. every probe message is consumed back within the timeout
+5. max end-to-end latency in secs across all partitions against thresholds
+
+Outputs end-to-end latency p50 / p90 / p99 / max overall and per broker as perfdata, the slowest partition,
+and in verbose mode the per broker latencies and which partitions are missing messages
+
+Raises Critical if any partition has no leader or its probe message fails to produce or is not consumed back
+
+Tested on Kafka 0.8.1, 0.8.2.2, 0.9.0.1
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+#from __future__ import unicode_literals
+
+import os
+import random
+import sys
+import time
+import traceback
+try:
+    from kafka.common import KafkaError, TopicPartition, UnsupportedVersionError
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+libdir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'pylib'))
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, log_option, CriticalError, random_alnum, validate_int, plural
+    from check_kafka import CheckKafka
+    from lib_latency_stats import percentile_of
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckKafkaSpray(CheckKafka):
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckKafkaSpray, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.partitions = None
+        self.sample = None
+        # let the producer batch the probe messages per broker
+        self.batch_size = 16384
+        self.linger_ms = 5
+        self.send_times = {}
+        self.ack_times = {}
+        self.msg = 'msg not defined yet'
+
+    def add_options(self):
+        super(CheckKafkaSpray, self).add_options()
+        self.add_opt('-n', '--sample', metavar='N',
+                     help='Number of partitions to randomly sample and test (default: all partitions)')
+
+    def process_partitions(self, list_partitions=False):
+        if list_partitions:
+            super(CheckKafkaSpray, self).process_partitions(list_partitions)
+        if self.get_opt('partition') is not None:
+            self.usage('--partition cannot be used in spray mode, use --sample to test a subset of partitions')
+        self.partitions = sorted(self.get_topic_partitions(self.topic))
+        self.sample = self.get_opt('sample')
+        if self.sample is not None:
+            validate_int(self.sample, 'sample', 1)
+            self.sample = int(self.sample)
+            if self.sample < len(self.partitions):
+                self.partitions = sorted(random.sample(self.partitions, self.sample))
+        log_option('partitions', self.partitions)
+
+    def run(self):
+        try:
+            self.spray()
+        except KafkaError:
+            err = self.exception_msg()
+            raise CriticalError(err)
+        self.add_setup_timings()
+
+    def get_leaders(self, topic_partitions):
+        # pylint: disable=protected-access
+        cluster = self.consumer._client.cluster
+        leaders = {}
+        for topic_partition in topic_partitions:
+            leader = cluster.leader_for_partition(topic_partition)
+            leaders[topic_partition.partition] = leader if leader is not None and leader >= 0 else None
+        return leaders
+
+    def record_ack(self, partition, _):
+        # called from the producer's sender thread
+        self.ack_times[partition] = time.time()
+
+    def produce(self, partitions):
+        self.key = random_alnum(20)
+        failures = {}
+        futures = {}
+        for partition in partitions:
+            self.send_times[partition] = time.time()
+            futures[partition] = self.producer.send(
+                self.topic,
+                key='{0}-{1}'.format(self.key, partition).encode('utf-8'),
+                partition=partition,
+                value='{0} {1}'.format(self.key, self.send_times[partition]).encode('utf-8')
+                )
+            futures[partition].add_callback(self.record_ack, partition)
+        log.debug('producer.flush() %d probe messages', len(partitions))
+        self.producer.flush(timeout=self.timeout_ms / 1000)
+        for partition in partitions:
+            try:
+                futures[partition].get(timeout=0)
+            except KafkaError as _:
+                log.info('partition %s produce failed: %s', partition, _)
+                failures[partition] = str(_)
+        return failures
+
+    def consume_back(self, topic_partitions, deadline):
+        """Polls the assigned partitions for the probe messages until all are found or the deadline passes"""
+        expected = dict([('{0}-{1}'.format(self.key, tp.partition).encode('utf-8'), tp.partition)
+                         for tp in topic_partitions])
+        receive_times = {}
+        while expected and time.time() < deadline:
+            timeout_ms = max(1, int((deadline - time.time()) * 1000))
+            for records in self.consumer.poll(timeout_ms=timeout_ms).values():
+                for consumer_record in records:
+                    if consumer_record.key in expected:
+                        receive_times[expected.pop(consumer_record.key)] = time.time()
+            log.debug('%d probe messages still to consume', len(expected))
+        return receive_times
+
+    @staticmethod
+    def seek_to_end(consumer, topic_partitions):
+        """Positions the consumer at the current end of each partition before any probe messages are produced"""
+        try:
+            # one ListOffsets request per broker rather than one per partition via position()
+            log.debug('getting end offsets')
+            for (topic_partition, offset) in consumer.end_offsets(topic_partitions).items():
+                consumer.seek(topic_partition, offset)
+        except UnsupportedVersionError:
+            # brokers before 0.10.1 don't support the ListOffsets v1 request used by end_offsets()
+            log.debug('end offsets not supported by broker, resolving end position per partition instead')
+            consumer.seek_to_end(*topic_partitions)
+            for topic_partition in topic_partitions:
+                # resolves the lazy seek now, otherwise it'd happen on first poll after the probes are produced
+                consumer.position(topic_partition)
+
+    def spray(self):
+        start_time = time.time()
+        deadline = start_time + max(self.timeout - 1, 1)
+        consumer = self.get_consumer()
+        topic_partitions = [TopicPartition(self.topic, partition) for partition in self.partitions]
+        leaders = self.get_leaders(topic_partitions)
+        leaderless = [partition for partition in self.partitions if leaders[partition] is None]
+        sprayed_partitions = [partition for partition in self.partitions if leaders[partition] is not None]
+        sprayed_topic_partitions = [tp for tp in topic_partitions if tp.partition in sprayed_partitions]
+        log.debug('assigning %d partitions to consumer', len(sprayed_topic_partitions))
+        consumer.assign(sprayed_topic_partitions)
+        self.seek_to_end(consumer, sprayed_topic_partitions)
+        self.create_producer()
+        failures = self.produce(sprayed_partitions)
+        receive_times = self.consume_back([tp for tp in sprayed_topic_partitions if tp.partition not in failures],
+                                          deadline)
+        latencies = {}
+        for (partition, receive_time) in receive_times.items():
+            latencies[partition] = receive_time - self.send_times[partition]
+        missing = [partition for partition in sprayed_partitions
+                   if partition not in failures and partition not in latencies]
+        self.output(leaders, leaderless, failures, missing, latencies, time.time() - start_time)
+
+    def output(self, leaders, leaderless, failures, missing, latencies, total_time):
+        num_partitions = len(self.partitions)
+        self.msg = "Kafka {0} partition{1} of topic '{2}'".format(num_partitions, plural(num_partitions), self.topic)
+        if leaderless or failures or missing:
+            self.critical()
+        self.msg += ', {0} without leader, {1} failed to produce, {2} missing messages'\
+                    .format(len(leaderless), len(failures), len(missing))
+        broker_latencies = {}
+        for (partition, latency) in latencies.items():
+            broker_latencies.setdefault(leaders[partition], []).append(latency)
+        sorted_latencies = sorted(latencies.values())
+        max_latency = sorted_latencies[-1] if sorted_latencies else 0
+        self.msg += ', max end-to-end latency = {0:.4f} secs'.format(max_latency)
+        self.check_thresholds(max_latency)
+        if latencies:
+            slowest_partition = max(latencies, key=lambda _: latencies[_])
+            self.msg += ' (partition {0} on broker {1})'.format(slowest_partition, leaders[slowest_partition])
+        self.msg += ' across {0} broker{1}'.format(len(broker_latencies), plural(len(broker_latencies)))
+        if self.verbose:
+            for broker in sorted(broker_latencies):
+                values = sorted(broker_latencies[broker])
+                self.msg += ', broker {0} p50 = {1:.4f} / p90 = {2:.4f} / max = {3:.4f} secs'\
+                            .format(broker, percentile_of(values, 50), percentile_of(values, 90),
+                                    values[-1])
+            if leaderless:
+                self.msg += ', partitions without leader = {0}'.format(leaderless)
+            if failures:
+                self.msg += ', partitions failed to produce = {0}'.format(sorted(failures))
+            if missing:
+                self.msg += ', partitions missing messages = {0}'.format(missing)
+        self.msg += ' | partitions={0} partitions_without_leader={1} produce_failures={2} missing_messages={3}'\
+                    .format(num_partitions, len(leaderless), len(failures), len(missing))
+        self.msg += ' latency_p50={0:.4f}s latency_p90={1:.4f}s latency_p99={2:.4f}s latency_max={3:.4f}s{4}'\
+                    .format(percentile_of(sorted_latencies, 50),
+                            percentile_of(sorted_latencies, 90),
+                            percentile_of(sorted_latencies, 99),
+                            max_latency,
+                            self.get_perf_thresholds())
+        for broker in sorted(broker_latencies):
+            values = sorted(broker_latencies[broker])
+            self.msg += ' broker_{0}_latency_p90={1:.4f}s broker_{0}_latency_max={2:.4f}s'\
+                        .format(broker, percentile_of(values, 90), values[-1])
+        produce_latencies = sorted([self.ack_times[partition] - self.send_times[partition]
+                                    for partition in self.ack_times])
+        self.msg += ' produce_latency_p90={0:.4f}s produce_latency_max={1:.4f}s total_time={2:.4f}s'\
+                    .format(percentile_of(produce_latencies, 90),
+                            produce_latencies[-1] if produce_latencies else 0,
+                            total_time)
+
+
+if __name__ == '__main__':
+    CheckKafkaSpray().main()
@@ -10,7 +10,12 @@
 
 """Nagios plugin to check a Syslog-NG/MySQL logserver. Puts a test message \
 into the logging system via tcp and then tries to retrieve it from the back \
-end MySQL database to check that it was properly received"""
+end MySQL database to check that it was properly received. Only rows newer \
+than the max id seen before sending are searched and the database is polled \
+with exponential backoff until the log appears, outputting the end-to-end \
+ingestion latency as perfdata. Burst mode sends N uniquely tagged logs at a \
+target rate over one connection to test the capacity of the pipeline, \
+reporting loss, ingest throughput and latency percentiles"""
 
 # TODO: add a log delete switch to remove the just inserted log -h
 
@@ -18,7 +23,7 @@ from __future__ import print_function
 
 __author__ = "Hari Sekhon"
 __title__ = "Nagios Plugin to check Syslog-NG/MySQL logservers"
-__version__ = "0.9.1"
+__version__ = "0.11.0"
 
 # Nagios Standard Exit Codes
 OK = 0
@@ -37,6 +42,7 @@ import time
 import signal
 import socket
 from optparse import OptionParser
+from lib_latency_stats import percentile_of
 try:
     import MySQLdb
     from MySQLdb import MySQLError
@@ -80,19 +86,29 @@ class LogServerTester(object):
 
         # starting values of variables used/defined later
         self.conn_type = "TCP"
+        self.db_connection = None
+        self.last_id = None
         self.log = ""
+        self.polls = 0
         self.re_validation = None
+        self.send_time = None
+        self.start_time = None
 
         # Input variables
+        self.burst = None
         self.delay = None
         self.logserver = None
         self.logserver_port = None
         self.mysql_column = None
+        self.max_poll_interval = None
         self.mysql_db = None
+        self.mysql_id_column = None
         self.mysql_port = None
         self.mysql_server = None
         self.mysql_table = None
         self.password = None
+        self.rate = None
+        self.thresholds = {}
         self.timeout = None
         self.udp = False
         self.username = None
@@ -102,16 +118,21 @@ class LogServerTester(object):
         # use database names and the default ports for each service
 
         self.default_delay = 0
+        self.default_loss_warning = 0
         self.default_logserver_port = 514
+        self.default_max_poll_interval = 1.0
         self.default_mysql_column = "msg"
         self.default_mysql_db = "syslog"
+        self.default_mysql_id_column = "id"
         self.default_mysql_port = 3306
         self.default_mysql_table = "logs"
+        self.default_poll_interval = 0.05
+        self.default_rate = 100
         self.default_timeout = 30
         self.default_udp = False
 
 
-    def generate_log(self):
+    def generate_log(self, message=None):
         """Generates and returns a unique timestamped log string to feed the \
         logserver. Log string is not ended by a newline"""
 
@@ -137,14 +158,16 @@ class LogServerTester(object):
         # newline is not added as the newline is not put into
         # the database and we want to query the database for
         # this pure log later on
-        log = "<%s>%s %s %s: Nagios Log Server %s Check %s" % \
-            (pri, timestamp, hostname, program, self.conn_type, epoch)
+        if message is None:
+            message = "Nagios Log Server %s Check %s" % (self.conn_type, epoch)
+        log = "<%s>%s %s %s: %s" % \
+            (pri, timestamp, hostname, program, message)
 
         return log
 
 
-    def send_log(self):
-        """send the log to the logserver"""
+    def connect_logserver(self):
+        """Returns a socket connected to the logserver"""
 
         if self.udp:
             self.vprint(2, "creating udp connection to logserver")
@@ -156,22 +179,39 @@ class LogServerTester(object):
                        % (self.logserver, self.logserver_port))
         try:
             logserver_socket.connect((self.logserver, self.logserver_port))
+        except (socket.error, socket.timeout) as socket_error:
+            self.socket_failed(socket_error)
+        return logserver_socket
+
+
+    def socket_failed(self, socket_error):
+        """Exits critical for a socket error sending to the logserver"""
+
+        if self.verbosity >= 1:
+            # You can only get a socket error on tcp, udp is stateless
+            # fire and forget so you won't get a socket error, hence
+            # I write "tcp port" here.
+            end(CRITICAL, "failed to send log to logserver " \
+                        + "'%s' on tcp " % self.logserver \
+                        + "port '%s' - '%s'" \
+                            % (self.logserver_port, socket_error.args[-1]))
+        else:
+            end(CRITICAL, "failed to send log to logserver - '%s'" \
+                                            % (socket_error.args[-1]))
+
+
+    def send_log(self):
+        """send the log to the logserver"""
+
+        logserver_socket = self.connect_logserver()
+        try:
+            self.send_time = time.time()
             # Newline added here as it is what separates one syslog message
             # from the next
-            logserver_socket.send(self.log+"\n")
+            logserver_socket.send((self.log + "\n").encode("utf-8"))
             logserver_socket.close()
         except (socket.error, socket.timeout) as socket_error:
-            if self.verbosity >= 1:
-                # You can only get a socket error on tcp, udp is stateless
-                # fire and forget so you won't get a socket error, hence
-                # I write "tcp port" here.
-                end(CRITICAL, "failed to send log to logserver " \
-                            + "'%s' on tcp " % self.logserver \
-                            + "port '%s' - '%s'" \
-                                % (self.logserver_port, socket_error[1]))
-            else:
-                end(CRITICAL, "failed to send log to logserver - '%s'" \
-                                                % (socket_error[1]))
+            self.socket_failed(socket_error)
         self.vprint(2, "log sent")
 
 
@@ -214,14 +254,25 @@ class LogServerTester(object):
             end(CRITICAL, "Log generation failed")
 
         self.vprint(3, "log is '%s'" % self.log)
+
+        self.start_time = time.time()
+
+        # connect and find the current max id before sending so that the
+        # search afterwards only has to look at the rows inserted since
+        self.connect_mysql_server()
+        self.last_id = self.get_max_id()
+
+        if self.burst:
+            return self.test_burst()
+
         self.vprint(2, "now sending log...")
 
         self.send_log()
 
-        self.vprint(2, "waiting %s seconds before 2nd part of check" \
+        if self.delay:
+            self.vprint(2, "waiting %s seconds before 2nd part of check" \
                                                                 % self.delay)
-
-        time.sleep(self.delay)
+            time.sleep(self.delay)
 
         self.vprint(2, "now testing for log in mysql database")
 
@@ -230,8 +281,9 @@ class LogServerTester(object):
         return returncode
 
 
-    def test_mysql_server(self):
-        """Connects to the MySQL server and queries for log"""
+    def connect_mysql_server(self):
+        """Connects to the MySQL server, the connection is kept open and
+        reused for all of the queries"""
 
         if self.verbosity >= 3:
             print("creating connection to mysql server")
@@ -242,75 +294,388 @@ class LogServerTester(object):
             print("mysql_db = '%s'" % self.mysql_db)
 
         try:
-            db_connection = MySQLdb.connect(host=self.mysql_server,
-                                            user=self.username,
-                                            passwd=self.password,
-                                            db=self.mysql_db,
-                                            port=self.mysql_port)
+            self.db_connection = MySQLdb.connect(host=self.mysql_server,
+                                                 user=self.username,
+                                                 passwd=self.password,
+                                                 db=self.mysql_db,
+                                                 port=self.mysql_port)
+            # otherwise repeated polls in the same transaction would all see
+            # the same snapshot under InnoDB's default repeatable read
+            self.db_connection.autocommit(True)
         except MySQLError as mysql_error:
-            end(CRITICAL, "error connecting to database - %s" % mysql_error[1])
+            end(CRITICAL, "error connecting to database - %s" \
+                                                    % mysql_error.args[-1])
 
         self.vprint(2, "connected to database")
 
-        cursor = db_connection.cursor()
 
-        log_message = ""
+    def get_max_id(self):
+        """Returns the current max id in the log table, which is an index
+        lookup on the auto increment primary key rather than a table scan"""
 
-        for message_part in self.log.split()[4:]:
-            log_message += message_part + " "
+        query = "select max(`%s`) from `%s`" \
+                                % (self.mysql_id_column, self.mysql_table)
+        self.vprint(3, query)
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute(query)
+            result = cursor.fetchone()
+        except MySQLError as mysql_error:
+            end(CRITICAL, "error querying mysql server for max id - %s" \
+                                                    % mysql_error.args[-1])
+        cursor.close()
+        max_id = 0
+        if result and result[0] is not None:
+            max_id = int(result[0])
+        self.vprint(2, "max id before sending log is %s" % max_id)
+        return max_id
 
-        log_message = log_message.rstrip(" ")
 
-        self.vprint(2, "extracted log message body from log")
-        self.vprint(2, "log message is '%s'" % log_message)
+    def query_log_count(self, cursor, query, log_message):
+        """Runs the log query and returns the number of matching logs"""
 
-        # security is maintained by a combinarion of `` and restrictive
-        # regex validation the validate functions. MySQLdb must take care of
-        # the log value but this is not an input variable anyway.
-        query = "select count(*) from `%s` where `%s`=%%s" \
-                                % (self.mysql_table, self.mysql_column)
-
-        # This query will be slow and necessitates the need for a long default
-        # timeout, as this is not suitable for an index and therefore must do a
-        # full table scan
-        # select count(*) from logs where msg='logmessage'
-        self.vprint(2, "querying mysql database for log...")
-        self.vprint(3, query % "'" + log_message + "'")
         try:
             # Use the parameter bit from the db api here because we can for the
             # value of log message, quoting is ok there
             # AS NOTED ABOVE, SECURITY IS HANDLED BY RESTRICTIVE REGEX OF
             # SAFE PARAMETERS IN MAIN FUNCTION -h
-            cursor.execute(query, (log_message,))
+            cursor.execute(query, (self.last_id, log_message))
         except MySQLError as mysql_error:
             end(CRITICAL, "error querying mysql server for log - %s" \
-                                                        % mysql_error[1])
+                                                    % mysql_error.args[-1])
         result = cursor.fetchall()
         if not result:
             end(CRITICAL, "No results returned from database query! " \
                         + "Possible database problem")
         try:
-            number_of_logs = result[0][0]
+            return result[0][0]
         except IndexError:
             end(CRITICAL, "Error processing result returned from MySQL server, " \
                         + "please run with -vvv")
 
+
+    def test_mysql_server(self):
+        """Polls the MySQL server for the log with exponential backoff"""
+
+        cursor = self.db_connection.cursor()
+
+        log_message = ""
+
+        for message_part in self.log.split()[4:]:
+            log_message += message_part + " "
+
+        log_message = log_message.rstrip(" ")
+
+        self.vprint(2, "extracted log message body from log")
+        self.vprint(2, "log message is '%s'" % log_message)
+
+        # security is maintained by a combinarion of `` and restrictive
+        # regex validation the validate functions. MySQLdb must take care of
+        # the log value but this is not an input variable anyway.
+        #
+        # The id range bounds this to a primary key range scan of only the
+        # rows inserted since the log was sent rather than a full table scan
+        # select count(*) from logs where id > 12345 and msg='logmessage'
+        query = "select count(*) from `%s` where `%s` > %%s and `%s` = %%s" \
+                % (self.mysql_table, self.mysql_id_column, self.mysql_column)
+
+        # leave a second to report the result before the plugin timeout
+        deadline = self.start_time + max(self.timeout - 1, 0.5)
+        interval = self.default_poll_interval
+        latency = None
+        while True:
+            self.polls += 1
+            self.vprint(2, "querying mysql database for log (poll %s)..." \
+                                                                % self.polls)
+            self.vprint(3, query % (self.last_id, "'" + log_message + "'"))
+            number_of_logs = self.query_log_count(cursor, query, log_message)
+            if number_of_logs:
+                latency = time.time() - self.send_time
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+        cursor.close()
+        self.db_connection.close()
+
         self.vprint(2, "number of logs matching message body: %s" \
                                                             % number_of_logs)
 
+        perfdata = " | polls=%s" % self.polls
+        if latency is not None:
+            perfdata = " | ingestion_latency=%.3fs polls=%s" \
+                                                    % (latency, self.polls)
+
         if number_of_logs == 1:
-            end(OK, "log successfully sent and entered into database")
+            end(OK, "log successfully sent and entered into database in " \
+                  + "%.3f seconds%s" % (latency, perfdata))
         elif number_of_logs > 1:
             end(WARNING, "more that one log detected, non-unique test log\
-message has been inserted into the database")
+message has been inserted into the database%s" % perfdata)
         elif number_of_logs == 0:
-            end(CRITICAL, "log failed to appear in the logserver back end")
+            end(CRITICAL, "log failed to appear in the logserver back end " \
+                        + "within %.1f seconds%s" \
+                                % (time.time() - self.send_time, perfdata))
         else:
-            end(CRITICAL, "unknown number of logs detected")
+            end(CRITICAL, "unknown number of logs detected%s" % perfdata)
 
         return UNKNOWN
 
 
+    def test_burst(self):
+        """Sends a burst of uniquely tagged logs at the target rate over one
+        connection, polling for their arrival in the database as they are
+        sent and afterwards, then reports loss, throughput and latency"""
+
+        run_id = "%s%s" % (os.getpid(), int(self.start_time * 1000))
+        # every log in the burst shares this prefix followed by its sequence
+        # number and send time so they can all be found with one query
+        prefix = "Nagios Log Server %s Burst %s" % (self.conn_type, run_id)
+        log_prefix = " ".join(self.generate_log(prefix).split()[4:])
+        # the id range bounds this to the rows inserted since the burst
+        # started. The lower bound isn't advanced between polls as ids of
+        # concurrent inserts can become visible out of order
+        query = "select `%s` from `%s` where `%s` > %%s and `%s` like %%s" \
+                % (self.mysql_column, self.mysql_table,
+                   self.mysql_id_column, self.mysql_column)
+        query_args = (self.last_id, log_prefix + " %")
+        self.vprint(3, query % query_args)
+
+        send_times = {}
+        latencies = {}
+        cursor = self.db_connection.cursor()
+        poll = {"interval": self.default_poll_interval, "next": 0}
+
+        self.vprint(2, "sending burst of %s logs at %s logs/sec..." \
+                                                    % (self.burst, self.rate))
+        logserver_socket = self.connect_logserver()
+        burst_start = time.time()
+        try:
+            for seq in range(self.burst):
+                if self.rate:
+                    # pace against the burst start rather than sleeping a fixed
+                    # interval so that the send overhead doesn't drift the rate
+                    delay = burst_start + seq / float(self.rate) - time.time()
+                    if delay > 0:
+                        self.poll_burst(cursor, query, query_args, send_times,
+                                        latencies, poll)
+                        delay = burst_start + seq / float(self.rate) \
+                                - time.time()
+                        if delay > 0:
+                            time.sleep(delay)
+                send_time = time.time()
+                log = self.generate_log("%s %s %.6f" % (prefix, seq, send_time))
+                if self.udp:
+                    logserver_socket.send((log + "\n").encode("utf-8"))
+                else:
+                    logserver_socket.sendall((log + "\n").encode("utf-8"))
+                send_times[seq] = send_time
+        except (socket.error, socket.timeout) as socket_error:
+            self.socket_failed(socket_error)
+        logserver_socket.close()
+        send_duration = time.time() - burst_start
+        self.vprint(2, "burst sent in %.3f seconds" % send_duration)
+
+        # leave a second to report the result before the plugin timeout
+        deadline = self.start_time + max(self.timeout - 1, 0.5)
+        while len(latencies) < self.burst and time.time() < deadline:
+            time.sleep(max(0, min(poll["next"], deadline) - time.time()))
+            self.poll_burst(cursor, query, query_args, send_times,
+                            latencies, poll)
+        cursor.close()
+        self.db_connection.close()
+
+        return self.check_burst(latencies, send_times, send_duration)
+
+
+    def poll_burst(self, cursor, query, query_args, send_times, latencies,
+                   poll):
+        """Queries the database for burst logs not seen yet if a poll is due,
+        polling faster while logs are arriving and backing off when not"""
+
+        now = time.time()
+        if now < poll["next"]:
+            return
+        self.polls += 1
+        try:
+            cursor.execute(query, query_args)
+        except MySQLError as mysql_error:
+            end(CRITICAL, "error querying mysql server for logs - %s" \
+                                                    % mysql_error.args[-1])
+        now = time.time()
+        new_logs = 0
+        for row in cursor.fetchall():
+            try:
+                seq = int(row[0].split()[-2])
+            except (IndexError, ValueError):
+                continue
+            if seq in latencies or seq not in send_times:
+                continue
+            latencies[seq] = now - send_times[seq]
+            new_logs += 1
+        self.vprint(2, "poll %s found %s new logs, %s logs arrived so far" \
+                                % (self.polls, new_logs, len(latencies)))
+        if new_logs:
+            poll["interval"] = self.default_poll_interval
+        else:
+            poll["interval"] = min(poll["interval"] * 2,
+                                   self.max_poll_interval)
+        poll["next"] = now + poll["interval"]
+
+
+    def check_burst_threshold(self, name, value, lower_is_worse=False):
+        """Returns the exit code for a burst metric against its warning and
+        critical thresholds, whichever are set"""
+
+        for (exitcode, level) in ((CRITICAL, "critical"), (WARNING, "warning")):
+            threshold = self.thresholds.get("%s_%s" % (name, level))
+            if threshold is None:
+                continue
+            if (lower_is_worse and value < threshold) or \
+               (not lower_is_worse and value > threshold):
+                return exitcode
+        return OK
+
+
+    def check_burst(self, latencies, send_times, send_duration):
+        """Evaluates the burst results against the thresholds and exits"""
+
+        delivered = len(latencies)
+        lost = self.burst - delivered
+        loss = 100.0 * lost / self.burst
+        # ingest throughput from the first log sent to the last one arriving
+        throughput = 0
+        if latencies:
+            last_arrival = max([send_times[seq] + latencies[seq]
+                                for seq in latencies])
+            ingest_duration = last_arrival - min(send_times.values())
+            if ingest_duration > 0:
+                throughput = delivered / ingest_duration
+        latencies = sorted(latencies.values())
+        stats = {
+            "p50": percentile_of(latencies, 50),
+            "p95": percentile_of(latencies, 95),
+            "p99": percentile_of(latencies, 99),
+            "max": latencies[-1] if latencies else 0,
+        }
+
+        results = (
+            ("loss", self.check_burst_threshold("loss", loss)),
+            ("latency", self.check_burst_threshold("latency", stats["p99"])),
+            ("throughput", self.check_burst_threshold("throughput",
+                                                      throughput, True)),
+        )
+        exitcode = OK
+        marks = {}
+        for (name, result) in results:
+            if result == CRITICAL:
+                exitcode = CRITICAL
+                marks[name] = " (!!)"
+            elif result == WARNING:
+                marks[name] = " (!)"
+                if exitcode != CRITICAL:
+                    exitcode = WARNING
+            else:
+                marks[name] = ""
+        # nothing arriving at all is as bad as the single log mode failing
+        if not delivered:
+            exitcode = CRITICAL
+            marks["loss"] = " (!!)"
+
+        message = "burst of %s logs: %s delivered, %s lost (%.1f%%)%s, " \
+                  % (self.burst, delivered, lost, loss, marks["loss"]) \
+                + "ingest throughput %.1f logs/sec%s, " \
+                  % (throughput, marks["throughput"]) \
+                + "latency p50 %.3fs p95 %.3fs p99 %.3fs%s max %.3fs" \
+                  % (stats["p50"], stats["p95"], stats["p99"],
+                     marks["latency"], stats["max"])
+
+        perfdata = " | sent=%s delivered=%s lost=%s" \
+                   % (self.burst, delivered, lost) \
+                 + " loss=%.2f%%;%s;%s" \
+                   % (loss, self.format_threshold("loss_warning"),
+                      self.format_threshold("loss_critical")) \
+                 + " throughput=%.1f;%s;%s" \
+                   % (throughput,
+                      self.format_threshold("throughput_warning", True),
+                      self.format_threshold("throughput_critical", True))
+        for percentile in ("p50", "p95", "p99", "max"):
+            perfdata += " latency_%s=%.3fs" % (percentile, stats[percentile])
+            if percentile == "p99":
+                perfdata += ";%s;%s" \
+                            % (self.format_threshold("latency_warning"),
+                               self.format_threshold("latency_critical"))
+        perfdata += " send_time=%.3fs polls=%s" % (send_duration, self.polls)
+
+        end(exitcode, message + perfdata)
+
+        return UNKNOWN
+
+
+    def format_threshold(self, name, lower_is_worse=False):
+        """Returns a threshold for perfdata or blank if not set, in the
+        minimum "N:" range format for thresholds where lower is worse"""
+
+        threshold = self.thresholds.get(name)
+        if threshold is None:
+            return ""
+        if lower_is_worse:
+            return "%s:" % threshold
+        return "%s" % threshold
+
+
+    def validate_burst(self):
+        """Validates the burst size and rate and exits if invalid"""
+
+        if self.burst is None:
+            self.burst = 0
+
+        try:
+            self.burst = int(self.burst)
+            if not 0 <= self.burst <= 100000:
+                raise ValueError
+        except ValueError:
+            end(HELP, "burst is the number of logs to send and must be a " \
+                    + "whole number between 0 and 100000, where 0 disables " \
+                    + "burst mode")
+
+        if self.rate is None:
+            self.rate = self.default_rate
+
+        try:
+            self.rate = float(self.rate)
+            if not 0 <= self.rate <= 100000:
+                raise ValueError
+        except ValueError:
+            end(HELP, "rate is the number of logs per second to send the " \
+                    + "burst at and must be between 0 and 100000, where 0 " \
+                    + "sends as fast as possible")
+
+
+    def validate_burst_thresholds(self):
+        """Validates the burst thresholds which are all optional and exits
+        if invalid"""
+
+        if self.thresholds.get("loss_warning") is None:
+            self.thresholds["loss_warning"] = self.default_loss_warning
+
+        for name in sorted(self.thresholds):
+            if self.thresholds[name] is None:
+                continue
+            try:
+                self.thresholds[name] = float(self.thresholds[name])
+                if self.thresholds[name] < 0:
+                    raise ValueError
+                if name.startswith("loss_") and self.thresholds[name] > 100:
+                    raise ValueError
+            except ValueError:
+                end(HELP, "%s threshold must be a positive number" \
+                                            % name.replace("_", " ") \
+                        + (", up to 100%" if name.startswith("loss_") else ""))
+
+
     def validate_credentials(self):
         """Validates the username and password for use in
         the MySQL connection"""
@@ -389,6 +754,32 @@ message has been inserted into the database")
                        + "characters")
 
 
+    def validate_mysql_id_column(self):
+        """Validates the mysql id column name and exits if invalid"""
+
+        if self.mysql_id_column is None:
+            self.mysql_id_column = self.default_mysql_id_column
+
+        if not self.re_validation.match(self.mysql_id_column):
+            end(UNKNOWN, "mysql id column name supplied contains unusable " \
+                       + "characters")
+
+
+    def validate_max_poll_interval(self):
+        """Validates the max poll interval and exits if invalid"""
+
+        if self.max_poll_interval is None:
+            self.max_poll_interval = self.default_max_poll_interval
+
+        try:
+            self.max_poll_interval = float(self.max_poll_interval)
+            if not self.default_poll_interval <= self.max_poll_interval <= 60:
+                raise ValueError
+        except ValueError:
+            end(HELP, "max poll interval must be a number of seconds " \
+                    + "between %s and 60" % self.default_poll_interval)
+
+
     def validate_mysql_port(self):
         """Validates the mysql port and exits if invalid"""
 
@@ -484,8 +875,12 @@ message has been inserted into the database")
         self.validate_mysql_db()
         self.validate_mysql_table()
         self.validate_mysql_column()
+        self.validate_mysql_id_column()
 
         self.validate_delay()
+        self.validate_max_poll_interval()
+        self.validate_burst()
+        self.validate_burst_thresholds()
         self.validate_timeout()
         self.validate_verbosity()
 
@@ -578,30 +973,91 @@ def main():
                           +"kept. Optional, defaults to '%s'" \
                                                 % tester.default_mysql_column)
 
+    parser.add_option("-I",
+                      "--mysql-id-column",
+                      dest="mysql_id_column",
+                      help="The MySQL auto increment id column of the table " \
+                          +"used to only search the rows inserted after the " \
+                          +"log was sent. Optional, defaults to '%s'" \
+                                             % tester.default_mysql_id_column)
+
     parser.add_option("-d",
                       "--delay",
                       dest="delay",
-                      help="Delay between sending the log and querying the "\
-                          +"logserver backend mysql database for the log " \
-                           +"message. This is useful if the logserver is " \
-                           +"heavily utilized or has batch inserts, as it " \
-                           +"allows the logserver more time to process the " \
-                           +"log and insert it into the database before the " \
-                           +"second part of the test searches for it. Valid " \
-                           +"range is between 0 and 3600 seconds. Defaults " \
+                      help="Initial delay between sending the log and first "\
+                          +"querying the logserver backend mysql database " \
+                           +"for the log message. Not normally needed as the " \
+                           +"database is polled until the log appears, but " \
+                           +"can save polls if the logserver has batch " \
+                           +"inserts on a fixed interval. Valid range is " \
+                           +"between 0 and 3600 seconds. Defaults " \
                            +"to %s seconds" % tester.default_delay)
 
+    parser.add_option("--max-poll-interval",
+                      dest="max_poll_interval",
+                      help="Max seconds between polls of the database for " \
+                          +"the log, polling starts at %s seconds and " \
+                                               % tester.default_poll_interval \
+                          +"doubles each time up to this. Optional, defaults " \
+                          +"to %s" % tester.default_max_poll_interval)
+
+    parser.add_option("-b",
+                      "--burst",
+                      dest="burst",
+                      help="Burst mode, sends this many uniquely tagged " \
+                          +"logs over one connection at --rate and checks " \
+                          +"how many arrive in the database within the " \
+                          +"timeout, outputting loss, ingest throughput and " \
+                          +"latency percentiles")
+
+    parser.add_option("-r",
+                      "--rate",
+                      dest="rate",
+                      help="Logs per second to send the burst at, 0 for as " \
+                          +"fast as possible. Optional, defaults to %s" \
+                                                        % tester.default_rate)
+
+    parser.add_option("--loss-warning",
+                      dest="loss_warning",
+                      help="Burst mode warning threshold for the percentage " \
+                          +"of logs lost. Optional, defaults to %s" \
+                                                % tester.default_loss_warning)
+
+    parser.add_option("--loss-critical",
+                      dest="loss_critical",
+                      help="Burst mode critical threshold for the percentage " \
+                          +"of logs lost. Losing the whole burst is always " \
+                          +"critical")
+
+    parser.add_option("--latency-warning",
+                      dest="latency_warning",
+                      help="Burst mode warning threshold in seconds for the " \
+                          +"p99 ingestion latency")
+
+    parser.add_option("--latency-critical",
+                      dest="latency_critical",
+                      help="Burst mode critical threshold in seconds for the " \
+                          +"p99 ingestion latency")
+
+    parser.add_option("--throughput-warning",
+                      dest="throughput_warning",
+                      help="Burst mode warning threshold for the minimum " \
+                          +"ingest throughput in logs per second")
+
+    parser.add_option("--throughput-critical",
+                      dest="throughput_critical",
+                      help="Burst mode critical threshold for the minimum " \
+                          +"ingest throughput in logs per second")
+
     parser.add_option("-t",
                       "--timeout",
                       dest="timeout",
                       help="sets a timeout in seconds after which the " \
                           +"plugin will exit (defaults to %s). " \
                                                      % tester.default_timeout \
-                          +"Recommended that this is used to increase " \
-                          +"timeout if mysql server takes more than 30 " \
-                          +"seconds to query logs table as it usually will. " \
-                          +"Best used in conjunction with passive service " \
-                          +"check if longer than 30 seconds")
+                          +"The database is polled for the log until this " \
+                          +"timeout, so this is the max ingestion latency " \
+                          +"allowed before raising critical")
 
     parser.add_option("-u",
                       "--udp",
@@ -632,15 +1088,27 @@ def main():
 
     # Very important. Input validation is done in the object itself
     # before these variables are used.
+    tester.burst = options.burst
     tester.delay = options.delay
     tester.logserver = options.logserver
     tester.logserver_port = options.logserver_port
     tester.mysql_column = options.mysql_column
+    tester.max_poll_interval = options.max_poll_interval
     tester.mysql_db = options.mysql_db
+    tester.mysql_id_column = options.mysql_id_column
     tester.mysql_port = options.mysql_port
     tester.mysql_server = options.mysql_server
     tester.mysql_table = options.mysql_table
     tester.password = options.password
+    tester.rate = options.rate
+    tester.thresholds = {
+        "latency_critical": options.latency_critical,
+        "latency_warning": options.latency_warning,
+        "loss_critical": options.loss_critical,
+        "loss_warning": options.loss_warning,
+        "throughput_critical": options.throughput_critical,
+        "throughput_warning": options.throughput_warning,
+    }
     tester.timeout = options.timeout
     tester.udp = options.udp
     tester.username = options.username
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 10:12:41 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check the latency distribution of Presto queries on a cluster via the Coordinator API
+
+Calculates in a single pass over the same /v1/query data used by check_presto_queries.py:
+
+    - elapsed time
+    - queued time
+    - CPU time
+
+and outputs the p50 / p90 / p99 and max for each of these as graph perfdata
+
+Warning / Critical thresholds apply to the --metric and --percentile selected (default: elapsed time p99) in seconds
+
+Optionally filter queries by user, source or resource group regex as well as include / exclude regex
+against the actual SQL queries, and limit to the last N matching queries
+
+Raises warning if fewer than --min-queries matching queries are found
+
+Will get a '404 Not Found' if you try to run it against a Presto Worker as this information
+is only available via the Presto Coordinator API
+
+Tested on:
+
+- Presto Facebook versions:               0.152, 0.157, 0.167, 0.179, 0.185, 0.186, 0.187, 0.188, 0.189
+- Presto Teradata distribution versions:  0.152, 0.157, 0.167, 0.179
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import traceback
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, UnknownError, support_msg_api, isList, validate_regex, validate_int
+    from harisekhon import RestNagiosPlugin
+    from lib_latency_stats import percentile_of
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckPrestoQueriesLatency(RestNagiosPlugin):
+
+    # Presto serializes airlift Durations as strings eg. '1.23s', '250.00ms', '5.00m'
+    duration_units = {
+        'ns': 1e-9,
+        'us': 1e-6,
+        'ms': 1e-3,
+        's': 1,
+        'm': 60,
+        'h': 3600,
+        'd': 86400,
+    }
+    re_duration = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ns|us|ms|s|m|h|d)\s*$')
+
+    # metric name => queryStats field
+    metrics = {
+        'elapsed': 'elapsedTime',
+        'queued': 'queuedTime',
+        'cpu': 'totalCpuTime',
+    }
+    percentiles = ('p50', 'p90', 'p99', 'max')
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckPrestoQueriesLatency, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.name = ['Presto Coordinator', 'Presto']
+        self.default_port = 8080
+        self.auth = False
+        self.json = True
+        self.path = '/v1/query'
+        self.msg = 'Presto msg not defined'
+        self.include = None
+        self.exclude = None
+        self.user = None
+        self.source = None
+        self.resource_group = None
+        self.num = None
+        self.min_queries = None
+        self.metric = None
+        self.percentile = None
+
+    def add_options(self):
+        super(CheckPrestoQueriesLatency, self).add_options()
+        self.add_opt('-i', '--include', metavar='regex', help='Include regex for queries to check')
+        self.add_opt('-e', '--exclude', metavar='regex', help='Exclude regex for queries to exclude' + \
+                                                              ' (takes priority over --include')
+        self.add_opt('-U', '--user', metavar='regex', help='Only check queries run by users matching this regex')
+        self.add_opt('--source', metavar='regex', help='Only check queries from sources matching this regex')
+        self.add_opt('-G', '--resource-group', metavar='regex',
+                     help='Only check queries in resource groups matching this regex')
+        self.add_opt('-n', '--num', metavar='N', default=100,
+                     help='Check only the last N matching queries (default: 100)')
+        self.add_opt('-m', '--min-queries', metavar='N', default=1,
+                     help='Minimum number of matching queries to expect to find' + \
+                          ', raises warning if below this number (default: 1)')
+        self.add_opt('-M', '--metric', default='elapsed',
+                     help='Metric to apply thresholds to: {0} (default: elapsed)'\
+                          .format(' / '.join(sorted(self.metrics))))
+        self.add_opt('--percentile', default='p99',
+                     help='Percentile to apply thresholds to: {0} (default: p99)'\
+                          .format(' / '.join(self.percentiles)))
+        self.add_thresholds()
+
+    def process_options(self):
+        super(CheckPrestoQueriesLatency, self).process_options()
+        for name in ('include', 'exclude', 'user', 'source', 'resource_group'):
+            regex = self.get_opt(name)
+            if regex:
+                validate_regex(regex, name.replace('_', ' '))
+                setattr(self, name, re.compile(regex, re.I))
+        self.num = self.get_opt('num')
+        validate_int(self.num, 'num', 0)
+        self.num = int(self.num)
+        self.min_queries = self.get_opt('min_queries')
+        validate_int(self.min_queries, 'minimum queries', 0)
+        self.min_queries = int(self.min_queries)
+        self.metric = self.get_opt('metric')
+        if self.metric not in self.metrics:
+            self.usage('--metric must be one of: {0}'.format(', '.join(sorted(self.metrics))))
+        self.percentile = self.get_opt('percentile')
+        if self.percentile not in self.percentiles:
+            self.usage('--percentile must be one of: {0}'.format(', '.join(self.percentiles)))
+        self.validate_thresholds(optional=True)
+
+    def parse_duration(self, duration):
+        match = self.re_duration.match(str(duration))
+        if not match:
+            raise UnknownError("failed to parse Presto duration '{0}'. {1}".format(duration, support_msg_api()))
+        return float(match.group(1)) * self.duration_units[match.group(2)]
+
+    @staticmethod
+    def get_resource_group(query_item):
+        resource_group = query_item.get('resourceGroupId', query_item.get('resourceGroupName', ''))
+        if isList(resource_group):
+            resource_group = '.'.join([str(_) for _ in resource_group])
+        return resource_group or ''
+
+    def is_matching_query(self, query_item):
+        query = query_item['query']
+        if self.exclude and self.exclude.search(query):
+            log.info("excluding query '%s'", query)
+            return False
+        if self.include and not self.include.search(query):
+            return False
+        session = query_item.get('session', {})
+        if self.user and not self.user.search(session.get('user') or ''):
+            return False
+        if self.source and not self.source.search(session.get('source') or ''):
+            return False
+        if self.resource_group and not self.resource_group.search(self.get_resource_group(query_item)):
+            return False
+        return True
+
+    def parse_json(self, json_data):
+        if not isList(json_data):
+            raise UnknownError('non-list returned by Presto for queries. {0}'.format(support_msg_api()))
+        values = dict([(metric, []) for metric in self.metrics])
+        num_matching_queries = 0
+        # single pass collecting all metrics, stopping at the last --num matching queries
+        for query_item in json_data:
+            if num_matching_queries >= self.num:
+                break
+            if not self.is_matching_query(query_item):
+                continue
+            num_matching_queries += 1
+            query_stats = query_item.get('queryStats', {})
+            for metric, field in self.metrics.items():
+                if field in query_stats:
+                    values[metric].append(self.parse_duration(query_stats[field]))
+        stats = {}
+        for metric in self.metrics:
+            sorted_values = sorted(values[metric])
+            stats[metric] = {
+                'p50': percentile_of(sorted_values, 50),
+                'p90': percentile_of(sorted_values, 90),
+                'p99': percentile_of(sorted_values, 99),
+                'max': sorted_values[-1] if sorted_values else 0,
+            }
+        value = stats[self.metric][self.percentile]
+        self.msg = 'Presto SQL - {0} {1} query {2} time = {3:.2f} secs'\
+                   .format(self.percentile, 'matching' if self.include or self.exclude else 'recent',
+                           self.metric, value)
+        self.check_thresholds(value)
+        self.msg += ' out of last {0} queries'.format(num_matching_queries)
+        if num_matching_queries < self.min_queries:
+            self.warning()
+            self.msg += ' (< {0})'.format(self.min_queries)
+        self.msg += ' on coordinator'
+        if self.verbose:
+            self.msg += ' {0}:{1}'.format(self.host, self.port)
+            for metric in sorted(self.metrics):
+                self.msg += ', {0} '.format(metric)
+                self.msg += ' / '.join(['{0}={1:.2f}s'.format(percentile, stats[metric][percentile])
+                                        for percentile in self.percentiles])
+        self.msg += ' |'
+        for metric in sorted(self.metrics):
+            for percentile in self.percentiles:
+                self.msg += ' {0}_time_{1}={2:.3f}s'.format(metric, percentile, stats[metric][percentile])
+                if metric == self.metric and percentile == self.percentile:
+                    self.msg += self.get_perf_thresholds()
+        self.msg += ' num_matching_queries={0}:{1}'.format(num_matching_queries, self.min_queries)
+
+
+if __name__ == '__main__':
+    CheckPrestoQueriesLatency().main()
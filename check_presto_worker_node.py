@@ -60,7 +60,7 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.3.0'
+__version__ = '0.3.1'
 
 
 class CheckPrestoWorker(RestNagiosPlugin):
@@ -88,6 +88,10 @@ class CheckPrestoWorker(RestNagiosPlugin):
         self.add_opt('-N', '--node', metavar='node_host:node_port',
                      help='Node to query for, use --list-nodes for what to enter here' + \
                           ', can omit http:// uri prefix and port suffix for convenience')
+        self.add_node_threshold_options()
+        self.add_opt('-l', '--list-nodes', action='store_true', help='List worker nodes and exit')
+
+    def add_node_threshold_options(self):
         self.add_opt('-a', '--max-age', metavar='secs', default=10,
                      help='Max age in secs since worker\'s last response to coordinator (default: 10)')
         self.add_opt('-R', '--max-ratio', metavar='0.0', default=0.0,
@@ -96,7 +100,6 @@ class CheckPrestoWorker(RestNagiosPlugin):
                      help='Max number of recent failures to tolerate on the worker (default: 0)')
         self.add_opt('-r', '--max-requests', metavar='0', default=None,
                      help='Max number of recent requests to tolerate on the worker (default: none, check disabled)')
-        self.add_opt('-l', '--list-nodes', action='store_true', help='List worker nodes and exit')
 
     def process_options(self):
         super(CheckPrestoWorker, self).process_options()
@@ -104,6 +107,9 @@ class CheckPrestoWorker(RestNagiosPlugin):
         self.list_nodes = self.get_opt('list_nodes')
         if not self.node and not self.list_nodes:
             self.usage('--node not defined')
+        self.process_node_threshold_options()
+
+    def process_node_threshold_options(self):
         self.max_age = self.get_opt('max_age')
         validate_float(self.max_age, 'max age', 0, 3600)
         self.max_age = int(self.max_age)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+#  coding=utf-8
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 11:03:52 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Nagios Plugin to check all Presto SQL worker nodes in one run via the Coordinator API
+
+Fetches /v1/node and /v1/node/failed exactly once each and evaluates every worker node against the same
+per-node checks as check_presto_worker_node.py:
+
+    - time since last response to Coordinator vs --max-age (raises critical)
+    - recent requests vs --max-requests (raises warning)
+    - recent failures vs --max-failures (raises critical)
+    - recent failure ratio vs --max-ratio (raises critical)
+    - failed nodes (raises critical)
+
+Warning / Critical thresholds apply to the number of unhealthy worker nodes, and the cluster aggregates
+produced by check_presto_worker_nodes*.py are output as graph perfdata:
+
+    - number of worker nodes, failed nodes, lagging nodes, nodes over max failures / failure ratio
+    - max response age, max recent failures, max recent failure ratio
+
+Optionally writes a passive check result per worker node in Nagios external command format to --passive-file
+(eg. the Nagios command pipe or a spool file for send_nsca) so that 400 workers can be monitored individually
+from a single fetch of the node list instead of 400
+
+Will raise Warning if no presto worker nodes are found
+
+Will get a '404 Not Found' if you try to run it against a Presto Worker as this information
+is only available via the Presto Coordinator API
+
+In verbose mode outputs the list of unhealthy worker nodes
+
+Tested on:
+
+- Presto Facebook versions:               0.152, 0.157, 0.167, 0.179, 0.185, 0.186, 0.187, 0.188, 0.189
+- Presto Teradata distribution versions:  0.152, 0.157, 0.167, 0.179
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import re
+import sys
+import time
+import traceback
+srcdir = os.path.abspath(os.path.dirname(__file__))
+libdir = os.path.join(srcdir, 'pylib')
+sys.path.append(libdir)
+try:
+    # pylint: disable=wrong-import-position
+    from harisekhon.utils import log, ERRORS, UnknownError, support_msg_api, plural
+    from check_presto_worker_node import CheckPrestoWorker
+except ImportError:
+    print(traceback.format_exc(), end='')
+    sys.exit(4)
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+class CheckPrestoWorkerNodesReport(CheckPrestoWorker):
+
+    def __init__(self):
+        # Python 2.x
+        super(CheckPrestoWorkerNodesReport, self).__init__()
+        # Python 3.x
+        # super().__init__()
+        self.path = '/v1/node'
+        self.passive_file = None
+        self.passive_service = None
+        self.re_protocol = re.compile(r'^https?://')
+        self.re_port = re.compile(r':\d+$')
+        self.msg = 'Presto msg not defined'
+
+    def add_options(self):
+        # Skip CheckPrestoWorker and go straight to it's parent as there is no single --node to select
+        # shut up pylint this works
+        super(CheckPrestoWorker, self).add_options()  # pylint: disable=bad-super-call
+        self.add_node_threshold_options()
+        self.add_opt('-F', '--passive-file', metavar='<file>',
+                     help='Append per-node passive check results in Nagios external command format to this file' + \
+                          ' (eg. the Nagios command pipe nagios.cmd)')
+        self.add_opt('-s', '--passive-service', metavar='<name>', default='Presto Worker',
+                     help="Service description to submit per-node passive results under (default: 'Presto Worker')")
+        self.add_thresholds(default_warning=0, default_critical=1)
+
+    def process_options(self):
+        super(CheckPrestoWorker, self).process_options()  # pylint: disable=bad-super-call
+        self.process_node_threshold_options()
+        self.passive_file = self.get_opt('passive_file')
+        self.passive_service = self.get_opt('passive_service')
+        if not self.passive_service:
+            self.usage('--passive-service cannot be blank')
+        self.validate_thresholds()
+
+    def get_node_host(self, node_item):
+        return self.re_port.sub('', self.re_protocol.sub('', self.get_node_name(node_item)))
+
+    def check_node(self, node):
+        """Returns status, message, perfdata and stats for a single worker node without affecting overall status"""
+        status = 'OK'
+        msg = ''
+        try:
+            response_age = self.get_response_age(node)
+        except UnknownError:
+            # newly started nodes don't populate lastResponseTime until second run
+            response_age = None
+        recent_requests = self.get_stat(node, 'recentRequests')
+        recent_failures = self.get_stat(node, 'recentFailures')
+        recent_failure_ratio = self.get_recent_failure_ratio(node)
+        if response_age is None:
+            status = 'UNKNOWN'
+            msg += 'last response to coordinator = N/A'
+        else:
+            msg += 'last response to coordinator = {0:.2f} secs ago'.format(response_age)
+            if response_age > self.max_age:
+                status = 'CRITICAL'
+                msg += ' (> {0})'.format(self.max_age)
+        msg += ', recent requests = {0:.2f}'.format(recent_requests)
+        if self.max_requests is not None and recent_requests > self.max_requests:
+            if status == 'OK':
+                status = 'WARNING'
+            msg += ' (> {0})'.format(self.max_requests)
+        msg += ', recent failures = {0:.2f}'.format(recent_failures)
+        if recent_failures > self.max_failures:
+            status = 'CRITICAL'
+            msg += ' (> {0})'.format(self.max_failures)
+        msg += ', recent failure ratio = {0:.2f}'.format(recent_failure_ratio)
+        if recent_failure_ratio > self.max_ratio:
+            status = 'CRITICAL'
+            msg += ' (> {0})'.format(self.max_ratio)
+        perfdata = 'response_age={0:.2f}s;{1:.2f} recent_requests={2:.2f} '\
+                   .format(response_age or 0, self.max_age, recent_requests)
+        perfdata += 'recent_failures={0:.2f};{1:.2f} recent_failure_ratio={2:.2f};{3:.2f}'\
+                    .format(recent_failures, self.max_failures, recent_failure_ratio, self.max_ratio)
+        stats = {
+            'response_age': response_age or 0,
+            'recent_failures': recent_failures,
+            'recent_failure_ratio': recent_failure_ratio,
+        }
+        return (status, msg, perfdata, stats)
+
+    def get_failed_nodes(self):
+        self.path = '/v1/node/failed'
+        req = self.query()
+        try:
+            json_data = json.loads(req.content)
+        except ValueError as _:
+            raise UnknownError('failed to parse Presto failed nodes json: {0}. {1}'.format(_, support_msg_api()))
+        return self.get_nodes(json_data)
+
+    def write_passive_results(self, results):
+        now = int(time.time())
+        lines = []
+        for (host, status, msg) in results:
+            lines.append('[{now}] PROCESS_SERVICE_CHECK_RESULT;{host};{service};{code};{msg}\n'\
+                         .format(now=now, host=host, service=self.passive_service,
+                                 code=ERRORS[status], msg=msg.replace('\n', ' ').replace(';', ',')))
+        log.info('writing %d passive results to %s', len(lines), self.passive_file)
+        try:
+            # single write so the Nagios command pipe doesn't interleave partial lines with other writers
+            with open(self.passive_file, 'a') as filehandle:
+                filehandle.write(''.join(lines))
+        except (IOError, OSError) as _:
+            raise UnknownError("failed to write passive results to '{0}': {1}".format(self.passive_file, _))
+
+    def parse_json(self, json_data):
+        node_list = self.get_nodes(json_data)
+        failed_node_list = self.get_failed_nodes()
+        num_nodes = len(node_list)
+        num_failed_nodes = len(failed_node_list)
+        passive_results = []
+        unhealthy_nodes = []
+        nodes_lagging = 0
+        nodes_over_failures = 0
+        nodes_over_ratio = 0
+        max_response_age = 0
+        max_failures = 0
+        max_ratio = 0.0
+        for node in node_list:
+            host = self.get_node_host(node)
+            (status, msg, perfdata, stats) = self.check_node(node)
+            log.info("node '%s' %s: %s", host, status, msg)
+            if stats['response_age'] > self.max_age:
+                nodes_lagging += 1
+            if stats['recent_failures'] > self.max_failures:
+                nodes_over_failures += 1
+            if stats['recent_failure_ratio'] > self.max_ratio:
+                nodes_over_ratio += 1
+            max_response_age = max(max_response_age, stats['response_age'])
+            max_failures = max(max_failures, stats['recent_failures'])
+            max_ratio = max(max_ratio, stats['recent_failure_ratio'])
+            if status != 'OK':
+                unhealthy_nodes.append(host)
+            passive_results.append((host, status, 'Presto SQL worker node {0} | {1}'.format(msg, perfdata)))
+        for node in failed_node_list:
+            host = self.get_node_host(node)
+            log.info("node '%s' failed", host)
+            if host not in unhealthy_nodes:
+                unhealthy_nodes.append(host)
+            passive_results.append((host, 'CRITICAL', 'Presto SQL worker node failed on coordinator'))
+        if self.passive_file:
+            self.write_passive_results(passive_results)
+        num_unhealthy_nodes = len(unhealthy_nodes)
+        self.msg = 'Presto SQL - {0} unhealthy worker node{1}'.format(num_unhealthy_nodes,
+                                                                      plural(num_unhealthy_nodes))
+        self.check_thresholds(num_unhealthy_nodes)
+        self.msg += ' out of {0:d} nodes'.format(num_nodes)
+        if num_nodes < 1:
+            self.warning()
+            self.msg += ' (< 1 worker found)'
+        self.msg += ', {0} failed, {1} with response age > {2} secs'.format(num_failed_nodes, nodes_lagging,
+                                                                           self.max_age)
+        self.msg += ', {0} with recent failures > {1:.2f}'.format(nodes_over_failures, self.max_failures)
+        self.msg += ', {0} with recent failure ratio > {1:.2f}'.format(nodes_over_ratio, self.max_ratio)
+        self.msg += ', max response age = {0:.2f} secs'.format(max_response_age)
+        if self.passive_file:
+            self.msg += ', submitted {0} passive results'.format(len(passive_results))
+        if self.verbose and unhealthy_nodes:
+            self.msg += ' [{0}]'.format(', '.join(unhealthy_nodes))
+        self.msg += ' | num_unhealthy_nodes={0}{1} num_worker_nodes={2} num_failed_nodes={3}'\
+                    .format(num_unhealthy_nodes, self.get_perf_thresholds(), num_nodes, num_failed_nodes)
+        self.msg += ' num_nodes_lagging={0} num_nodes_over_max_failures={1} num_nodes_over_max_ratio={2}'\
+                    .format(nodes_lagging, nodes_over_failures, nodes_over_ratio)
+        self.msg += ' max_response_age={0:.2f}s max_recent_failures={1:.2f} max_recent_failure_ratio={2:.2f}'\
+                    .format(max_response_age, max_failures, max_ratio)
+
+
+if __name__ == '__main__':
+    CheckPrestoWorkerNodesReport().main()
@@ -27,6 +27,13 @@ Total time includes setup, connection and message timings etc.
 
 Makes thorough use of the API checks at every stage through the code to be as robust as possible to detecting issues.
 
+Burst mode (--burst N) instead publishes N messages over one channel using RabbitMQ publisher confirms, waiting for
+confirms once per --batch-size messages rather than once per message, then consumes them back with --prefetch
+and batched acks, reporting publish throughput and confirm / consume latency percentiles, so that the broker is
+measured under load rather than by the latency of one message. Thresholds then apply to the p99 confirm and consume
+latencies. In burst mode the connection is kept open and reused by subsequent runs in the same process, eg. when
+run repeatedly from a long-lived runner, and is only closed at exit.
+
 Important Usage Notes:
 
 1. If a Queue + Exchange are both specified, then both will be (re)created and the queue will be bound to the exchange.
@@ -46,9 +53,11 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import atexit
 import os
 import socket
 import sys
+import time
 import traceback
 try:
     import pika
@@ -60,20 +69,24 @@ libdir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'pylib'))
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import log, log_option, CriticalError, UnknownError, getenvs
+    from harisekhon.utils import log, log_option, CriticalError, UnknownError, getenvs, random_alnum
     from harisekhon.utils import validate_host, validate_port, validate_user, validate_password, \
                                  validate_int, validate_chars
     from harisekhon import PubSubNagiosPlugin
+    from lib_latency_stats import percentile_of
 except ImportError:
     print(traceback.format_exc(), end='')
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.5.2'
+__version__ = '0.6'
 
 
 class CheckRabbitMQ(PubSubNagiosPlugin):
 
+    # burst mode connections kept open for reuse by later runs in the same process, keyed by broker, vhost and user
+    connections = {}
+
     def __init__(self):
         # Python 2.x
         super(CheckRabbitMQ, self).__init__()
@@ -119,6 +132,20 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
         self.message_count = 0
         self.message_limit = 10000
         self.sleep_secs = 0
+        self.burst = 0
+        self.batch_size = None
+        self.prefetch = None
+        self.timeout_ids = []
+        self.delivery_tag = 0
+        self.unconfirmed = {}
+        self.confirm_latencies = []
+        self.nacked = 0
+        self.burst_key = None
+        self.publish_times = []
+        self.consume_latencies = []
+        self.num_unacked = 0
+        self.last_delivery_tag = None
+        self.last_receive_time = None
         self.consumer_tag = '{prog} {version} host {host} pid {pid}'\
                             .format(prog=self._prog,
                                     version=__version__,
@@ -161,11 +188,20 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
         self.add_opt('-r', '--retry-delay', default=self.default_retry_delay,
                      help='Retry delay between connection attempts (default: {default_retry_delay})')
         self.add_opt('-s', '--sleep', type=float, default=1.0, metavar='secs', help=self.sleep_usage)
+        self.add_opt('-n', '--burst', metavar='N', default=0,
+                     help='Burst mode, publish and consume N messages and report throughput and latency percentiles')
+        self.add_opt('--batch-size', metavar='N', default=100,
+                     help='Burst mode number of messages to publish between waiting for confirms (default: 100)')
+        self.add_opt('--prefetch', metavar='N', default=100,
+                     help='Burst mode consumer prefetch count (default: 100)')
         self.add_thresholds(default_warning=1, default_critical=2)
 
     def run(self):
         try:
-            super(CheckRabbitMQ, self).run()
+            if self.burst:
+                self.run_burst()
+            else:
+                super(CheckRabbitMQ, self).run()
         except (pika.exceptions.AMQPError, pika.exceptions.ChannelError, pika.exceptions.RecursionError):
             err = self.exception_msg()
             raise CriticalError(err)
@@ -221,6 +257,17 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
             # validation done through property wrapper
             self.sleep_secs = sleep_secs
         log_option('sleep secs', self.sleep_secs)
+        self.burst = self.get_opt('burst')
+        validate_int(self.burst, 'burst', min_value=0, max_value=1000000)
+        self.burst = int(self.burst)
+        self.batch_size = self.get_opt('batch_size')
+        validate_int(self.batch_size, 'batch size', min_value=1, max_value=10000)
+        self.batch_size = int(self.batch_size)
+        self.prefetch = self.get_opt('prefetch')
+        validate_int(self.prefetch, 'prefetch', min_value=1, max_value=65535)
+        self.prefetch = int(self.prefetch)
+        if self.burst and self.use_transactions:
+            self.usage('--use-transactions cannot be used with --burst which uses publisher confirms')
         self.validate_thresholds()
 
     def check_connection(self):
@@ -258,7 +305,19 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
 #    def on_flow_callback():
 #        raise WarningError('broker sent channel flow control backpressure (broker may be struggling with load)')
 
-    def subscribe(self):
+    def connect(self):
+        connection_key = (self.host, self.port, self.vhost, self.user)
+        if self.burst and connection_key in self.connections:
+            self.conn = self.connections[connection_key]
+            try:
+                # services heartbeats and raises if the broker has closed the connection since the last run
+                self.conn.process_data_events(time_limit=0)
+                if self.conn.is_open:
+                    log.info('reusing open connection to broker')
+                    return
+            except pika.exceptions.AMQPError as _:
+                log.info('previous connection to broker no longer usable: %s', _)
+            del self.connections[connection_key]
         credentials = pika.credentials.PlainCredentials(self.user, self.password)
         parameters = pika.ConnectionParameters(host=self.host,
                                                port=self.port,
@@ -274,10 +333,27 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
         self.conn = pika.BlockingConnection(parameters=parameters)
         log.debug('adding blocked connection callback')
         self.conn.add_on_connection_blocked_callback(self.connection_blocked_callback)
+        if self.burst:
+            if not self.connections:
+                atexit.register(self.close_connections)
+            self.connections[connection_key] = self.conn
+
+    @classmethod
+    def close_connections(cls):
+        for conn in cls.connections.values():
+            try:
+                if conn.is_open:
+                    conn.close(reply_code=200, reply_text='Normal shutdown')
+            except pika.exceptions.AMQPError:
+                pass
+        cls.connections.clear()
+
+    def subscribe(self):
+        self.connect()
         log.debug('adding connection timeout to one 3rd of total timeout (%.2f out of %.2f secs)',
                   self.timeout / 3, self.timeout)
         # no args to this callback
-        self.conn.add_timeout(max(self.timeout - 1, 1), self.connection_timeout_handler)
+        self.timeout_ids.append(self.conn.add_timeout(max(self.timeout - 1, 1), self.connection_timeout_handler))
         #
         self.check_connection()
         log.info('requesting channel')
@@ -294,6 +370,12 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
         if self.use_transactions:
             log.info('setting channel to use AMQP transactions')
             self.channel.tx_select()
+        elif self.burst:
+            log.info('setting RabbitMQ specific channel confirmation with batched confirm callback')
+            # BlockingChannel.confirm_delivery() makes every publish wait for its own confirm,
+            # so enable confirms on the underlying channel to receive them asynchronously and in batches
+            impl_channel = self.channel._impl  # pylint: disable=protected-access
+            impl_channel.confirm_delivery(callback=self.confirm_batch_callback, nowait=True)
         else:
             log.info('setting RabbitMQ specific channel confirmation')
             # different in BlockingChannel
@@ -408,6 +490,157 @@ class CheckRabbitMQ(PubSubNagiosPlugin):
         self.conn.close(reply_code=200, reply_text='Normal shutdown')
         return self.consumed_message
 
+    def confirm_batch_callback(self, method_frame):
+        # the broker may confirm many messages at once with multiple=True, acking all delivery tags up to this one
+        method = method_frame.method
+        if method.multiple:
+            delivery_tags = [_ for _ in self.unconfirmed if _ <= method.delivery_tag]
+        else:
+            delivery_tags = [method.delivery_tag]
+        now = time.time()
+        for delivery_tag in delivery_tags:
+            publish_time = self.unconfirmed.pop(delivery_tag, None)
+            if publish_time is None:
+                continue
+            if isinstance(method, pika.spec.Basic.Nack):
+                self.nacked += 1
+            else:
+                self.confirm_latencies.append(now - publish_time)
+
+    def publish_burst(self, deadline):
+        """Publishes --burst messages waiting for confirms once per --batch-size, recording the publish times"""
+        if self.durable:
+            properties = pika.BasicProperties(delivery_mode=2)
+        else:
+            properties = pika.BasicProperties()
+        impl_channel = self.channel._impl  # pylint: disable=protected-access
+        log.info("publishing %d messages to exchange '%s' using routing key '%s' in batches of %d",
+                 self.burst, self.exchange, self.routing_key, self.batch_size)
+        for seq in range(self.burst):
+            publish_time = time.time()
+            self.publish_times.append(publish_time)
+            # delivery tags are numbered sequentially per channel once in confirm mode
+            self.delivery_tag += 1
+            self.unconfirmed[self.delivery_tag] = publish_time
+            impl_channel.basic_publish(exchange=self.exchange,
+                                       routing_key=self.routing_key,
+                                       body='{0} {1}'.format(self.burst_key, seq),
+                                       properties=properties)
+            if (seq + 1) % self.batch_size == 0 or seq + 1 == self.burst:
+                # flushes the batch and processes confirms until the broker has confirmed all outstanding messages,
+                # also dispatching any deliveries to the burst consumer
+                while self.unconfirmed and time.time() < deadline:
+                    self.conn.process_data_events(time_limit=0.01)
+                if self.unconfirmed:
+                    raise CriticalError('{0} messages not confirmed by {1} broker within timeout'\
+                                        .format(len(self.unconfirmed), self.name))
+
+    def burst_consumer_callback(self, channel, method, properties, body):  # pylint: disable=unused-argument
+        receive_time = time.time()
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        (message_key, _, seq) = body.partition(' ')
+        if message_key == self.burst_key:
+            self.consume_latencies.append(receive_time - self.publish_times[int(seq)])
+            self.last_receive_time = receive_time
+        self.last_delivery_tag = method.delivery_tag
+        self.num_unacked += 1
+        # ack half a prefetch window at a time so the broker can keep delivering
+        if self.num_unacked >= max(self.prefetch // 2, 1):
+            channel.basic_ack(delivery_tag=self.last_delivery_tag, multiple=True)
+            self.num_unacked = 0
+
+    def start_burst_consumer(self):
+        log.info('setting consumer prefetch count to %d', self.prefetch)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        # consume while publishing so that consume latencies don't include the rest of the burst's publishing,
+        # deliveries are dispatched to the callback whenever the publisher processes data events
+        return self.channel.basic_consume(self.burst_consumer_callback,
+                                          queue=self.queue,
+                                          no_ack=False)
+
+    def consume_burst(self, consumer_tag, deadline):
+        while len(self.consume_latencies) < self.burst and time.time() < deadline:
+            self.conn.process_data_events(time_limit=0.01)
+        if len(self.consume_latencies) < self.burst:
+            log.info('consumer timed out')
+        if self.num_unacked:
+            self.channel.basic_ack(delivery_tag=self.last_delivery_tag, multiple=True)
+            self.num_unacked = 0
+        self.channel.basic_cancel(consumer_tag)
+
+    def cleanup_burst(self, auto_queue):
+        """Removes this run's timeouts, auto-generated queue and channel from the connection kept open for reuse"""
+        for timeout_id in self.timeout_ids:
+            self.conn.remove_timeout(timeout_id)
+        self.timeout_ids = []
+        try:
+            if self.channel is not None and self.channel.is_open:
+                if auto_queue and self.queue:
+                    # exclusive queues only go away when the connection closes, which is kept open for reuse
+                    log.info("deleting auto-generated queue '%s'", self.queue)
+                    self.channel.queue_delete(queue=self.queue)
+                self.channel.close()
+        except (pika.exceptions.AMQPError, pika.exceptions.ChannelError) as _:
+            # don't leave an exclusive queue or a broken channel on a connection which would be reused
+            log.info('failed to clean up channel, closing connection to broker instead of reusing it: %s', _)
+            for connection_key in [key for (key, conn) in self.connections.items() if conn is self.conn]:
+                del self.connections[connection_key]
+            try:
+                self.conn.close(reply_code=200, reply_text='Normal shutdown')
+            except pika.exceptions.AMQPError:
+                pass
+        if auto_queue:
+            self.queue = None
+
+    def run_burst(self):
+        start_time = time.time()
+        deadline = start_time + max(self.timeout - 1, 1)
+        auto_queue = not self.queue
+        self.burst_key = random_alnum(20)
+        try:
+            self.subscribe()
+            consumer_tag = self.start_burst_consumer()
+            publish_start = time.time()
+            self.publish_burst(deadline)
+            publish_time = time.time() - publish_start
+            self.consume_burst(consumer_tag, deadline)
+        finally:
+            if self.conn is not None:
+                self.cleanup_burst(auto_queue)
+        consume_time = self.last_receive_time - publish_start if self.last_receive_time else 0
+        self.output_burst(sorted(self.confirm_latencies), sorted(self.consume_latencies),
+                          publish_time, consume_time, time.time() - start_time)
+
+    def output_burst(self, confirm_latencies, consume_latencies, publish_time, consume_time, total_time):
+        num_consumed = len(consume_latencies)
+        missing = self.burst - num_consumed
+        publish_rate = self.burst / publish_time if publish_time else 0
+        consume_rate = num_consumed / consume_time if consume_time else 0
+        confirm_p99 = percentile_of(confirm_latencies, 99)
+        consume_p99 = percentile_of(consume_latencies, 99)
+        self.msg = '{0} burst of {1} messages published at {2:.1f} msgs/sec'\
+                   .format(self.name, self.burst, publish_rate)
+        self.msg += ', p99 confirm latency = {0:.4f} secs'.format(confirm_p99)
+        self.check_thresholds(confirm_p99)
+        self.msg += ', consumed {0}/{1} at {2:.1f} msgs/sec'.format(num_consumed, self.burst, consume_rate)
+        if missing or self.nacked:
+            self.critical()
+            self.msg += ' ({0} missing, {1} nacked by broker)'.format(missing, self.nacked)
+        self.msg += ', p99 consume latency = {0:.4f} secs'.format(consume_p99)
+        self.check_thresholds(consume_p99)
+        self.msg += ' |'
+        for (name, latencies) in (('confirm', confirm_latencies), ('consume', consume_latencies)):
+            for percentile in (50, 90, 99):
+                self.msg += ' {0}_latency_p{1}={2:.4f}s'.format(name, percentile,
+                                                                 percentile_of(latencies, percentile))
+                if percentile == 99:
+                    self.msg += self.get_perf_thresholds()
+            self.msg += ' {0}_latency_max={1:.4f}s'.format(name, latencies[-1] if latencies else 0)
+        self.msg += ' publish_rate={0:.1f} consume_rate={1:.1f} messages_missing={2} messages_nacked={3}'\
+                    .format(publish_rate, consume_rate, missing, self.nacked)
+        self.msg += ' total_time={0:.4f}s'.format(total_time)
+
 
 if __name__ == '__main__':
     CheckRabbitMQ().main()
@@ -18,6 +18,18 @@
 
 Nagios Plugin to check a given RabbitMQ queue exists within a specified vhost via the RabbitMQ Management REST API
 
+All queues mode (--all-queues) evaluates every queue in the vhost, requesting only the needed columns from the
+Management API and paging through them --page-size queues at a time, so brokers with tens of thousands of queues
+don't return the full queues document with every queue's message stats and backing queue status. Each page is
+evaluated and discarded before fetching the next, and only the queues breaching thresholds are output along with
+aggregate counts. RabbitMQ versions before 3.6.2 don't support pagination and return all queues in one response,
+which is evaluated the same way:
+
+    - Warning / Critical thresholds apply to the number of messages in each queue
+    - --max-unacked / --min-consumers / --max-idle raise warning for queues with more unacknowledged messages,
+      fewer consumers or idle for longer in secs than given
+    - raises critical for any queue not in the running state
+
 Requires the management plugin to be loaded.
 
 Tested on RabbitMQ 3.4.4, 3.5.7, 3.6.6
@@ -29,16 +41,24 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import json
 import os
 import sys
+import time
 import traceback
-import urllib
+from datetime import datetime
+try:
+    # Python 3
+    from urllib.parse import quote_plus, urlencode
+except ImportError:
+    # Python 2
+    from urllib import quote_plus, urlencode  # pylint: disable=no-name-in-module
 srcdir = os.path.abspath(os.path.dirname(__file__))
 libdir = os.path.join(srcdir, 'pylib')
 sys.path.append(libdir)
 try:
     # pylint: disable=wrong-import-position
-    from harisekhon.utils import getenvs, isDict, isList, validate_chars, \
+    from harisekhon.utils import getenvs, isDict, isList, validate_chars, validate_int, log, plural, \
                                  CriticalError, UnknownError, ERRORS, support_msg_api
     from harisekhon import RestNagiosPlugin
 except ImportError:
@@ -46,11 +66,14 @@ except ImportError:
     sys.exit(4)
 
 __author__ = 'Hari Sekhon'
-__version__ = '0.3'
+__version__ = '0.4'
 
 
 class CheckRabbitMQQueue(RestNagiosPlugin):
 
+    # only the fields evaluated in --all-queues mode
+    columns = ('name', 'state', 'messages', 'messages_unacknowledged', 'consumers', 'idle_since')
+
     def __init__(self):
         # Python 2.x
         super(CheckRabbitMQQueue, self).__init__()
@@ -65,6 +88,12 @@ class CheckRabbitMQQueue(RestNagiosPlugin):
         self.queue = None
         self.expected_queue_state = 'running'
         self.expected_durable = None
+        self.all_queues = False
+        self.page_size = None
+        self.max_unacked = None
+        self.min_consumers = None
+        self.max_idle = None
+        self.top = None
         self.path = 'api/queues'
         self.json = True
         self.msg = 'msg not defined yet'
@@ -80,24 +109,63 @@ class CheckRabbitMQQueue(RestNagiosPlugin):
         self.add_opt('-U', '--durable',
                      help="Check queue durable (optional, arg must be: 'true' / 'false')")
         self.add_opt('-l', '--list-queues', action='store_true', help='List queues on given vhost and exit')
+        self.add_opt('-A', '--all-queues', action='store_true',
+                     help='Check all queues on the given vhost, outputting only those breaching thresholds')
+        self.add_opt('--page-size', metavar='N', default=500,
+                     help='Number of queues to fetch per request in --all-queues mode (default: 500, max: 500)')
+        self.add_opt('--max-unacked', metavar='N',
+                     help='Max unacknowledged messages per queue before raising warning in --all-queues mode')
+        self.add_opt('--min-consumers', metavar='N',
+                     help='Min consumers per queue before raising warning in --all-queues mode')
+        self.add_opt('--max-idle', metavar='secs',
+                     help='Max secs a queue can be idle before raising warning in --all-queues mode')
+        self.add_opt('-n', '--top', metavar='N', default=10,
+                     help='Max number of breaching queues to output in --all-queues mode (default: 10)')
+        self.add_thresholds()
 
     def process_options(self):
         super(CheckRabbitMQQueue, self).process_options()
         self.vhost = self.get_opt('vhost')
         validate_chars(self.vhost, 'vhost', r'/\w\+-')
-        self.path += '/' + urllib.quote_plus(self.vhost)
+        self.path += '/' + quote_plus(self.vhost)
         self.queue = self.get_opt('queue')
+        self.all_queues = self.get_opt('all_queues')
         if self.get_opt('list_queues'):
             pass
+        elif self.all_queues:
+            if self.queue:
+                self.usage('--queue and --all-queues are mutually exclusive')
+            self.process_all_queues_options()
         else:
             validate_chars(self.queue, 'queue', r'/\w\.\+-')
-            self.path += '/' + urllib.quote_plus(self.queue)
+            self.path += '/' + quote_plus(self.queue)
         self.expected_durable = self.get_opt('durable')
         if self.expected_durable:
             self.expected_durable = self.expected_durable.lower()
             if self.expected_durable not in ('true', 'false'):
                 self.usage("invalid --durable option '{0}' given, if specified must be either 'true' or 'false'".\
                            format(self.expected_durable))
+        self.validate_thresholds(integer=True, positive=True, optional=True)
+
+    def process_all_queues_options(self):
+        self.page_size = self.get_opt('page_size')
+        validate_int(self.page_size, 'page size', 1, 500)
+        self.page_size = int(self.page_size)
+        for name in ('max_unacked', 'min_consumers', 'max_idle'):
+            value = self.get_opt(name)
+            if value is not None:
+                validate_int(value, name.replace('_', ' '), 0)
+                setattr(self, name, int(value))
+        self.top = self.get_opt('top')
+        validate_int(self.top, 'top', 0)
+        self.top = int(self.top)
+        self.path = self.get_page_path(1)
+
+    def get_page_path(self, page):
+        path = self.path.split('?')[0]
+        return path + '?' + urlencode([('columns', ','.join(self.columns)),
+                                       ('page', page),
+                                       ('page_size', self.page_size)])
 
     def check_response_code(self, req):
         if req.status_code != 200:
@@ -116,6 +184,9 @@ class CheckRabbitMQQueue(RestNagiosPlugin):
             print("RabbitMQ queues on vhost '{0}':\n".format(self.vhost))
             print('\n'.join([_['name'] for _ in json_data]))
             sys.exit(ERRORS['UNKNOWN'])
+        if self.all_queues:
+            self.check_all_queues(json_data)
+            return
         self.msg = "RabbitMQ queue '{0}' ".format(self.queue)
         if self.verbose:
             self.msg += "on vhost '{0}' ".format(self.vhost)
@@ -138,6 +209,115 @@ class CheckRabbitMQQueue(RestNagiosPlugin):
             self.critical()
             self.msg += " (expected '{0}')".format(self.expected_durable)
 
+    @staticmethod
+    def parse_idle_since(idle_since):
+        # '2018-03-07 19:23:22' on older versions, '2018-03-07T19:23:22.123+00:00' on newer versions, both UTC
+        idle_since = idle_since.replace('T', ' ').split('.')[0].split('+')[0]
+        try:
+            idle_datetime = datetime.strptime(idle_since, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise UnknownError("failed to parse queue idle_since '{0}'. {1}".format(idle_since, support_msg_api()))
+        return (datetime.utcnow() - idle_datetime).total_seconds()
+
+    def get_page(self, page):
+        self.path = self.get_page_path(page)
+        req = self.query()
+        try:
+            return json.loads(req.content)
+        except ValueError as _:
+            raise UnknownError('failed to parse RabbitMQ queues json: {0}. {1}'.format(_, support_msg_api()))
+
+    def check_all_queues(self, json_data):
+        start_time = time.time()
+        stats = {
+            'queues': 0,
+            'messages': 0,
+            'messages_unacknowledged': 0,
+            'queues_without_consumers': 0,
+            'queues_not_running': 0,
+            'max_messages': 0,
+        }
+        breaching_queues = []
+        page = 1
+        while True:
+            if isList(json_data):
+                # RabbitMQ < 3.6.2 ignores the pagination parameters and returns all queues in one list
+                log.info('queues returned unpaginated, pagination requires RabbitMQ 3.6.2+')
+                json_data = {'items': json_data, 'page_count': 1}
+            if not isDict(json_data) or not isList(json_data.get('items')):
+                raise UnknownError('unexpected queues page returned by RabbitMQ. {0}'.format(support_msg_api()))
+            for queue in json_data['items']:
+                breach = self.check_queue_item(queue, stats)
+                if breach:
+                    breaching_queues.append(breach)
+            page_count = json_data.get('page_count', 1)
+            log.info('evaluated queues page %s/%s', page, page_count)
+            if page >= page_count:
+                break
+            page += 1
+            json_data = self.get_page(page)
+        query_time = time.time() - start_time
+        num_breaching = len(breaching_queues)
+        self.msg = "RabbitMQ {0} queue{1} breaching thresholds out of {2} on vhost '{3}'"\
+                   .format(num_breaching, plural(num_breaching), stats['queues'], self.vhost)
+        if breaching_queues and self.top:
+            # worst first
+            breaching_queues.sort(key=lambda _: _[0], reverse=True)
+            self.msg += ' [{0}]'.format(', '.join([_[1] for _ in breaching_queues[:self.top]]))
+        self.msg += ', messages = {0}, unacked = {1}, queues without consumers = {2}, not running = {3}'\
+                    .format(stats['messages'], stats['messages_unacknowledged'],
+                            stats['queues_without_consumers'], stats['queues_not_running'])
+        self.msg += ' | queues={0} queues_breaching={1} messages={2} messages_unacknowledged={3}'\
+                    .format(stats['queues'], num_breaching, stats['messages'], stats['messages_unacknowledged'])
+        self.msg += ' max_queue_messages={0}{1} queues_without_consumers={2} queues_not_running={3}'\
+                    .format(stats['max_messages'], self.get_perf_thresholds(),
+                            stats['queues_without_consumers'], stats['queues_not_running'])
+        self.msg += ' pages={0} query_time={1:.4f}s'.format(page, query_time)
+
+    def check_queue_item(self, queue, stats):
+        """Evaluates a single queue updating the aggregate stats, returns (severity, description) if breaching"""
+        name = queue.get('name')
+        state = queue.get('state', 'running')
+        messages = queue.get('messages') or 0
+        unacked = queue.get('messages_unacknowledged') or 0
+        consumers = queue.get('consumers') or 0
+        stats['queues'] += 1
+        stats['messages'] += messages
+        stats['messages_unacknowledged'] += unacked
+        stats['max_messages'] = max(stats['max_messages'], messages)
+        if not consumers:
+            stats['queues_without_consumers'] += 1
+        severity = 0
+        reasons = []
+        if state != self.expected_queue_state:
+            stats['queues_not_running'] += 1
+            severity = 2
+            reasons.append("state '{0}'".format(state))
+        for (level, status) in ((2, 'critical'), (1, 'warning')):
+            threshold = self.get_threshold(status, optional=True).thresholds
+            if threshold['upper'] is not None and messages > threshold['upper']:
+                severity = max(severity, level)
+                reasons.append('messages {0} > {1}'.format(messages, threshold['upper']))
+                break
+        if self.max_unacked is not None and unacked > self.max_unacked:
+            severity = max(severity, 1)
+            reasons.append('unacked {0} > {1}'.format(unacked, self.max_unacked))
+        if self.min_consumers is not None and consumers < self.min_consumers:
+            severity = max(severity, 1)
+            reasons.append('consumers {0} < {1}'.format(consumers, self.min_consumers))
+        if self.max_idle is not None and queue.get('idle_since'):
+            idle_secs = self.parse_idle_since(queue['idle_since'])
+            if idle_secs > self.max_idle:
+                severity = max(severity, 1)
+                reasons.append('idle {0:.0f} > {1} secs'.format(idle_secs, self.max_idle))
+        if not severity:
+            return None
+        if severity == 2:
+            self.critical()
+        else:
+            self.warning()
+        return (severity, "'{0}' {1}".format(name, ', '.join(reasons)))
+
 
 if __name__ == '__main__':
     CheckRabbitMQQueue().main()
@@ -22,6 +22,23 @@ Can optionally alert on any available updates as well as just security related u
 Updated for DNF on RHEL 8
 
 Tested on CentOS 5 / 6 / 7 / 8, Rocky Linux 8, Alma Linux 8
+
+Optionally caches the result for --result-cache-ttl secs to avoid resolving the
+repo metadata on every run, keyed on the enabled repos, exclusions, rpmdb mtime
+and running kernel so that it is invalidated as soon as packages are installed.
+Once expired, the cached result is still returned for up to
+--result-cache-max-age secs while it is refreshed in the background, so that
+Nagios gets an answer in well under a second along with the age of the data
+
+With --repodata, computes the available and security updates directly from the
+cached repo metadata instead of running yum, streaming each enabled repo's
+primary and updateinfo XML with an incremental parser and comparing against the
+installed rpmdb packages by name.arch. This uses bounded memory even on very
+large repos and is much faster than yum's dependency resolver, but relies on the
+metadata cache being kept up to date, eg. by cronning 'yum makecache'. Packages
+from dnf module streams which are not enabled (or the default) are filtered out
+as dnf does, but updates changing a package's arch or replacing it via
+obsoletes are not counted
 """
 
 # Updates Info vs RHEL versions (Caveat - contrary to that page, 'yum updateinfo' isn't available on CentOS 6):
@@ -30,10 +47,35 @@ Tested on CentOS 5 / 6 / 7 / 8, Rocky Linux 8, Alma Linux 8
 
 from __future__ import print_function
 
+import bz2
+import glob
+import gzip
+import hashlib
+import itertools
+import json
 import os
 import re
+import shutil
+import sqlite3
 import sys
 import signal
+import tempfile
+import time
+from fnmatch import fnmatch
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+try:
+    # Python 3 only, for xz compressed repodata
+    import lzma
+except ImportError:
+    lzma = None
+try:
+    # optional, for zstd compressed repodata on newer Fedora / RHEL
+    import zstandard
+except ImportError:
+    zstandard = None
 OLD_PYTHON = False
 # pylint: disable=wrong-import-position
 try:
@@ -47,11 +89,11 @@ except ImportError:
     except ImportError:
         # Python 3
         from subprocess import getstatusoutput  # pylint: disable=no-name-in-module
-from optparse import OptionParser
+from optparse import OptionParser, SUPPRESS_HELP
 
 __author__ = "Hari Sekhon"
 __title__ = "Nagios Plugin for Yum updates on RedHat/CentOS systems"
-__version__ = "0.12.7"
+__version__ = "0.14.0"
 
 # Standard Nagios return codes
 OK = 0
@@ -61,6 +103,8 @@ UNKNOWN = 3
 
 DEFAULT_TIMEOUT = 30
 
+DEFAULT_RESULT_CACHE_MAX_AGE = 86400
+
 support_msg = "Please make sure you have upgraded to the latest version from " + \
               "https://github.com/HariSekhon/Nagios-Plugins. If the problem persists, " + \
               "please raise a ticket at https://github.com/HariSekhon/Nagios-Plugins/issues "+ \
@@ -87,6 +131,164 @@ def end(status, message):  # lgtm [py/similar-function]
 YUM = "/usr/bin/yum"
 DNF = '/usr/bin/dnf'
 
+YUM_CONFIGS = ["/etc/yum.conf", "/etc/dnf/dnf.conf"]
+REPOS_DIR = "/etc/yum.repos.d"
+# RHEL 9+ moved the rpmdb to /usr/lib/sysimage/rpm with a /var/lib/rpm symlink
+RPMDB_DIRS = ["/var/lib/rpm", "/usr/lib/sysimage/rpm"]
+
+# default metadata cache dirs, dnf then yum 3 ($basearch/$releasever)
+CACHE_DIRS = ["/var/cache/dnf", "/var/cache/yum/*/*"]
+# dnf suffixes the repo id with a hash of the repo urls in the cache dir name
+RE_DNF_CACHE_DIR_SUFFIX = re.compile(r'-[0-9a-f]{16}$')
+# dnf module stream states, enabled or disabled, one .module ini file per module
+MODULES_DIR = "/etc/dnf/modules.d"
+# packages of the running kernel for detecting installed kernel updates
+KERNEL_PACKAGES = ("kernel", "kernel-core")
+
+XMLNS_REPO = "{http://linux.duke.edu/metadata/repo}"
+XMLNS_COMMON = "{http://linux.duke.edu/metadata/common}"
+
+LOCKED_MSG = "another instance of yum is running"
+
+# hidden options for the child processes which refresh the result cache
+RESULT_CACHE_REFRESH = "--result-cache-refresh"
+RESULT_CACHE_BACKGROUND = "--result-cache-background"
+
+def parse_yum_config(filename):
+    """Parses a yum / dnf ini style config or .repo file and returns a
+    dictionary of {"section":{"key":"value"}}, or an empty dictionary
+    if the file cannot be read"""
+
+    config = {}
+    section = None
+    key = None
+    try:
+        file_handle = open(filename)
+        lines = file_handle.readlines()
+        file_handle.close()
+    except IOError:
+        return config
+    for line in lines:
+        if not line.strip() or line.lstrip()[0] in "#;":
+            continue
+        if line[0] in " \t" and section is not None and key is not None:
+            # continuation of a multi-line value
+            config[section][key] += " " + line.strip()
+        elif line.startswith("["):
+            section = line.strip().strip("[]")
+            config.setdefault(section, {})
+            key = None
+        elif "=" in line and section is not None:
+            key, value = line.split("=", 1)
+            key = key.strip().lower()
+            config[section][key] = value.strip()
+    return config
+
+
+RE_VERSION_SEGMENT = re.compile(r'[a-zA-Z]+|[0-9]+|~|\^')
+
+def compare_version(version1, version2):  # pylint: disable=too-many-return-statements,too-many-branches
+    """Compares two rpm version or release strings the same way as rpm's
+    rpmvercmp, returns 1 if the first is newer, -1 if older and 0 if equal"""
+
+    if version1 == version2:
+        return 0
+    segments1 = RE_VERSION_SEGMENT.findall(version1)
+    segments2 = RE_VERSION_SEGMENT.findall(version2)
+    while segments1 or segments2:
+        segment1 = segments1 and segments1[0]
+        segment2 = segments2 and segments2[0]
+        # tilde sorts before anything, even the end of the version
+        if segment1 == "~" or segment2 == "~":
+            if segment1 != "~":
+                return 1
+            if segment2 != "~":
+                return -1
+        # caret sorts after the end of the version but before anything else
+        elif segment1 == "^" or segment2 == "^":
+            if not segment1:
+                return -1
+            if not segment2:
+                return 1
+            if segment1 != "^":
+                return 1
+            if segment2 != "^":
+                return -1
+        elif not segment1 or not segment2:
+            break
+        elif segment1.isdigit() != segment2.isdigit():
+            # numeric segments are newer than alpha segments
+            if segment1.isdigit():
+                return 1
+            return -1
+        elif segment1.isdigit():
+            if int(segment1) != int(segment2):
+                return (int(segment1) > int(segment2)) - (int(segment1) < int(segment2))
+        elif segment1 != segment2:
+            return (segment1 > segment2) - (segment1 < segment2)
+        segments1.pop(0)
+        segments2.pop(0)
+    if segments1:
+        return 1
+    if segments2:
+        return -1
+    return 0
+
+
+def compare_evr(evr1, evr2):
+    """Compares two (epoch, version, release) tuples, returns 1 if the first
+    is newer, -1 if older and 0 if equal"""
+
+    epoch1 = int(evr1[0] or 0)
+    epoch2 = int(evr2[0] or 0)
+    if epoch1 != epoch2:
+        return (epoch1 > epoch2) - (epoch1 < epoch2)
+    return compare_version(evr1[1], evr2[1]) or compare_version(evr1[2], evr2[2])
+
+
+def open_repodata(filename):
+    """Opens a possibly compressed repodata file for streaming, decompressing
+    on the fly rather than into memory"""
+
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    if filename.endswith(".bz2"):
+        return bz2.BZ2File(filename, "rb")
+    if filename.endswith(".xz"):
+        if lzma is None:
+            end(UNKNOWN, "xz compressed repodata '%s' requires Python 3" % filename)
+        return lzma.open(filename, "rb")
+    if filename.endswith(".zst"):
+        if zstandard is None:
+            end(UNKNOWN, "zstd compressed repodata '%s' requires the " % filename \
+                       + "python zstandard module")
+        return zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"))
+    return open(filename, "rb")
+
+
+def iter_xml_elements(filename, tag):
+    """Streams the repodata XML file yielding each element of the given tag,
+    clearing the elements already processed to keep memory bounded"""
+
+    file_handle = open_repodata(filename)
+    try:
+        root = None
+        for event, elem in iterparse(file_handle, events=("start", "end")):
+            if root is None:
+                root = elem
+            elif event == "end" and elem.tag == tag:
+                yield elem
+                root.clear()
+    finally:
+        file_handle.close()
+
+
+def repo_enabled(values):
+    """Returns whether a repo is enabled given its config section values"""
+
+    return values.get("enabled", "1").lower() in ("1", "yes", "true", "on")
+
+
 def check_yum_usable():
     """Checks that the YUM program and path are correct and usable - that
     the program exists and is executable, otherwise exits with error"""
@@ -117,6 +319,13 @@ class YumTester(object):
         self.timeout = DEFAULT_TIMEOUT
         self.verbosity = 0
         self.warn_on_any_update = False
+        self.result_cache_ttl = 0
+        self.result_cache_max_age = DEFAULT_RESULT_CACHE_MAX_AGE
+        self.result_cache_file = None
+        self.result_cache_refresh = False
+        self.result_cache_background = False
+        self.argv = []
+        self.repodata = False
 
     def validate_all_variables(self):
         """Validates all object variables to make sure the
@@ -143,6 +352,21 @@ class YumTester(object):
             end(UNKNOWN, "Invalid verbosity type, must be positive numeric " \
                         + "integer")
 
+        if self.result_cache_ttl is None:
+            self.result_cache_ttl = 0
+        if self.result_cache_max_age is None:
+            self.result_cache_max_age = DEFAULT_RESULT_CACHE_MAX_AGE
+        try:
+            self.result_cache_ttl = int(self.result_cache_ttl)
+            self.result_cache_max_age = int(self.result_cache_max_age)
+            if self.result_cache_ttl < 0 or self.result_cache_max_age < 0:
+                raise ValueError
+        except ValueError:
+            end(UNKNOWN, "Result cache ttl and max age must be positive " \
+                       + "whole numbers of seconds")
+        if self.result_cache_ttl and OLD_PYTHON:
+            end(UNKNOWN, "Result cache requires the python subprocess module")
+
 
     def run(self, cmd):
         """runs a system command and returns
@@ -233,8 +457,7 @@ class YumTester(object):
             pass
         elif returncode == 200:
             if "lock" in output[-2] or "another copy is running" in output[-2]:
-                msg = "Cannot check for updates, " \
-                    + "another instance of yum is running"
+                msg = "Cannot check for updates, " + LOCKED_MSG
                 if self.no_warn_on_lock:
                     end(OK, msg)
                 else:
@@ -314,6 +537,10 @@ class YumTester(object):
         """Gets all updates. Returns a single integer of the
         number of available updates"""
 
+        if self.repodata:
+            num_security_updates, num_other_updates = self.get_repodata_updates()
+            return num_security_updates + num_other_updates
+
         cmd = "%s check-update" % YUM
 
         output = self.run(cmd)
@@ -386,6 +613,9 @@ class YumTester(object):
         security and normal updates. Returns a tuple of the number
         of security and normal updates"""
 
+        if self.repodata:
+            return self.get_repodata_updates()
+
         cmd = "%s --security check-update" % YUM
 
         output = self.run(cmd)
@@ -516,6 +746,403 @@ class YumTester(object):
         return num_security_updates, num_other_updates
 
 
+    def get_repodata_updates(self):
+        """Computes the updates directly from the cached repodata and rpmdb
+        without running yum, returns a tuple of the number of security updates
+        and the number of other updates"""
+
+        installed, kernels = self.get_installed_packages()
+        sections = self.get_repo_sections()
+        repodata_dirs = self.get_repodata_dirs(sections)
+        if not repodata_dirs:
+            end(UNKNOWN, "No cached repodata found for the enabled repos, run " \
+                       + "'yum makecache' or omit --repodata")
+
+        repo_files = {}
+        for repo in repodata_dirs:
+            repo_files[repo] = self.get_repodata_files(repodata_dirs[repo])
+        modular, active = self.get_modular_packages(repo_files)
+
+        # {"name.arch":(epoch, version, release)} of the newest available
+        # version of each installed package newer than the installed version
+        candidates = {}
+        # name.arch of packages with security updates
+        security = set()
+        for repo in sorted(repodata_dirs):
+            repodata_dir = repodata_dirs[repo]
+            files = repo_files[repo]
+            excludes = []
+            for section in ("main", repo):
+                for key in ("exclude", "excludepkgs"):
+                    excludes += sections.get(section, {}).get(key, "").replace(",", " ").split()
+            self.vprint(2, "reading repodata for repo '%s' from '%s' (%d secs old)" \
+                           % (repo, repodata_dir, time.time() - files["mtime"]))
+            # an already decompressed yum 3 sqlite database is the quickest
+            if files.get("primary_db", "").endswith(".sqlite"):
+                packages = self.parse_primary_db(files["primary_db"])
+            elif "primary" in files:
+                packages = self.parse_primary(files["primary"])
+            elif "primary_db" in files:
+                packages = self.parse_primary_db(files["primary_db"])
+            else:
+                end(UNKNOWN, "No cached primary repodata found for repo '%s' " % repo \
+                           + "in '%s', run 'yum makecache'" % repodata_dir)
+            for (name, arch, evr) in packages:
+                key = "%s.%s" % (name, arch)
+                if key not in installed:
+                    continue
+                if [_ for _ in excludes if fnmatch(name, _) or fnmatch(key, _)]:
+                    continue
+                nevra = (name, arch, (evr[0] or "0", evr[1], evr[2]))
+                if nevra in modular and nevra not in active:
+                    continue
+                if compare_evr(evr, installed[key]) > 0 and \
+                   (key not in candidates or compare_evr(evr, candidates[key]) > 0):
+                    candidates[key] = evr
+            if "updateinfo" in files:
+                self.parse_updateinfo(files["updateinfo"], installed, kernels, security)
+
+        # only count security updates which are actually available
+        security = set([_ for _ in security if _ in candidates])
+        self.vprint(3, "updates available: %s" % " ".join(sorted(candidates)))
+        self.vprint(3, "security updates available: %s" % " ".join(sorted(security)))
+        return len(security), len(candidates) - len(security)
+
+
+    def get_modular_packages(self, repo_files):
+        """Returns a tuple of the set of (name, arch, (epoch, version,
+        release)) of all the module stream packages in the repos and the set
+        of those in the active stream of each module, which is the stream
+        enabled in /etc/dnf/modules.d or else the default stream unless the
+        module is disabled, so that packages from other streams can be
+        filtered out the same way as dnf does"""
+
+        # {("module", "stream"):set([(name, arch, (epoch, version, release))])}
+        modules = {}
+        # {"module":"default stream"}
+        defaults = {}
+        for repo in sorted(repo_files):
+            if "modules" in repo_files[repo]:
+                self.parse_modules(repo_files[repo]["modules"], modules, defaults)
+        states = self.get_module_states()
+        modular = set()
+        active = set()
+        for (module, stream) in modules:
+            modular.update(modules[(module, stream)])
+            (state, enabled_stream) = states.get(module, ("", ""))
+            if state == "enabled":
+                is_active = stream == enabled_stream
+            elif state == "disabled":
+                is_active = False
+            else:
+                is_active = stream == defaults.get(module)
+            if is_active:
+                active.update(modules[(module, stream)])
+        self.vprint(3, "%d modular packages, %d in active module streams" \
+                       % (len(modular), len(active)))
+        return modular, active
+
+
+    @staticmethod
+    def get_module_states():
+        """Returns a dictionary of {"module":(state, stream)} of the dnf
+        module streams enabled or disabled in /etc/dnf/modules.d"""
+
+        states = {}
+        for module_file in sorted(glob.glob(os.path.join(MODULES_DIR, "*.module"))):
+            config = parse_yum_config(module_file)
+            for section in config:
+                values = config[section]
+                states[values.get("name", section)] = (values.get("state", "").lower(),
+                                                       values.get("stream", ""))
+        return states
+
+
+    @staticmethod
+    def parse_modules(filename, modules, defaults):
+        """Streams the modules.yaml adding the rpm artifacts of each modulemd
+        document to the modules dictionary keyed by (module, stream) and the
+        default stream of each modulemd-defaults document to the defaults
+        dictionary. Only reads the few fields needed from libmodulemd's fixed
+        layout so that PyYAML isn't required"""
+
+        document = {}
+        in_artifacts = False
+        rpms_indent = None
+        try:
+            file_handle = open_repodata(filename)
+            try:
+                # a trailing document separator to finish the last document
+                for line in itertools.chain(file_handle, [b"---"]):
+                    line = line.decode("utf-8").rstrip()
+                    stripped = line.strip()
+                    if line.startswith("---") or line.startswith("..."):
+                        module = document.get("module") or document.get("name")
+                        stream = document.get("stream")
+                        if module and stream:
+                            if document.get("document") == "modulemd":
+                                modules.setdefault((module, stream), set()).update(document.get("rpms", []))
+                            elif document.get("document") == "modulemd-defaults":
+                                defaults[module] = stream
+                        document = {}
+                        in_artifacts = False
+                        rpms_indent = None
+                        continue
+                    if not stripped or stripped.startswith("#"):
+                        continue
+                    indent = len(line) - len(line.lstrip())
+                    # top level document type and the data fields are at fixed indents
+                    if indent <= 2:
+                        in_artifacts = stripped == "artifacts:"
+                        rpms_indent = None
+                        if ":" in stripped:
+                            (key, value) = stripped.split(":", 1)
+                            if key in ("document", "name", "module", "stream"):
+                                document[key] = value.strip().strip("'\"")
+                        continue
+                    if not in_artifacts:
+                        continue
+                    if stripped == "rpms:":
+                        rpms_indent = indent
+                    elif rpms_indent is not None and stripped.startswith("- "):
+                        # name-epoch:version-release.arch
+                        nevra = stripped[2:].strip().strip("'\"")
+                        (nevr, arch) = nevra.rsplit(".", 1)
+                        (name, epoch_version, release) = nevr.rsplit("-", 2)
+                        if ":" in epoch_version:
+                            (epoch, version) = epoch_version.split(":", 1)
+                        else:
+                            (epoch, version) = ("0", epoch_version)
+                        document.setdefault("rpms", []).append((name, arch, (epoch, version, release)))
+                    elif indent <= rpms_indent:
+                        rpms_indent = None
+            finally:
+                file_handle.close()
+        except (IOError, EOFError, ValueError) as error:
+            end(UNKNOWN, "Error parsing '%s' - %s" % (filename, error))
+
+
+    @staticmethod
+    def get_installed_packages():
+        """Returns a tuple of a dictionary of {"name.arch":(epoch, version,
+        release)} of the newest installed version of each package and a list
+        of the (epoch, version, release) of each installed kernel"""
+
+        cmd = ["rpm", "-qa", "--queryformat", "%{NAME} %{EPOCH} %{VERSION} %{RELEASE} %{ARCH}\n"]
+        try:
+            process = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        except OSError as error:
+            end(UNKNOWN, "Error trying to run utility 'rpm' - %s" % error)
+        (stdout, stderr) = process.communicate()
+        if process.returncode != 0:
+            end(UNKNOWN, "rpm exit code: %s, output: %s" \
+                         % (process.returncode, stderr.decode("utf-8").strip()))
+        installed = {}
+        kernels = []
+        machine = os.uname()[4]
+        for line in stdout.decode("utf-8").split("\n"):
+            line = line.split()
+            if len(line) != 5 or line[4] == "(none)":
+                # gpg-pubkey pseudo packages have no arch
+                continue
+            (name, epoch, version, release, arch) = line
+            if epoch == "(none)":
+                epoch = "0"
+            evr = (epoch, version, release)
+            key = "%s.%s" % (name, arch)
+            # installonly packages such as kernels can have several versions
+            if key not in installed or compare_evr(evr, installed[key]) > 0:
+                installed[key] = evr
+            if name in KERNEL_PACKAGES and arch == machine:
+                kernels.append(evr)
+        if not installed:
+            end(UNKNOWN, "No installed packages found in the rpmdb")
+        return installed, kernels
+
+
+    def get_repo_sections(self):
+        """Returns the merged sections of the yum / dnf config and .repo files
+        with the --enablerepo / --disablerepo options applied to each repo's
+        enabled setting"""
+
+        if self.yum_config:
+            configs = self.yum_config.split(",")
+        else:
+            configs = [_ for _ in YUM_CONFIGS if os.path.exists(_)]
+        sections = {}
+        repos_dirs = []
+        for config in configs:
+            config = parse_yum_config(config)
+            if "reposdir" in config.get("main", {}):
+                repos_dirs += config["main"]["reposdir"].replace(",", " ").split()
+            sections.update(config)
+        for repos_dir in repos_dirs or [REPOS_DIR]:
+            for repo_file in sorted(glob.glob(os.path.join(repos_dir, "*.repo"))):
+                sections.update(parse_yum_config(repo_file))
+
+        # yum applies these in order but --disablerepo=* --enablerepo=x is the
+        # common usage so disable first
+        for (repos, enabled) in ((self.disable_repo, "0"), (self.enable_repo, "1")):
+            for pattern in (repos or "").split(","):
+                for section in sections:
+                    if pattern and section != "main" and fnmatch(section, pattern):
+                        sections[section]["enabled"] = enabled
+        return sections
+
+
+    @staticmethod
+    def get_repodata_dirs(sections):
+        """Returns a dictionary of {"repo":"dir"} of the most recently updated
+        metadata cache dir containing repomd.xml for each enabled repo"""
+
+        cache_dirs = CACHE_DIRS
+        if sections.get("main", {}).get("cachedir"):
+            # expand yum variables such as $basearch and $releasever
+            cache_dirs = [re.sub(r'\$\{?\w+\}?', '*', sections["main"]["cachedir"])]
+        repodata_dirs = {}
+        mtimes = {}
+        for cache_dir in cache_dirs:
+            for repomd in glob.glob(os.path.join(cache_dir, "*", "repomd.xml")) + \
+                          glob.glob(os.path.join(cache_dir, "*", "repodata", "repomd.xml")):
+                repodata_dir = os.path.dirname(repomd)
+                repo_dir = repodata_dir
+                if os.path.basename(repo_dir) == "repodata":
+                    repo_dir = os.path.dirname(repo_dir)
+                repo = RE_DNF_CACHE_DIR_SUFFIX.sub("", os.path.basename(repo_dir))
+                if repo not in sections or repo == "main" or not repo_enabled(sections[repo]):
+                    continue
+                mtime = os.stat(repomd).st_mtime
+                if repo not in repodata_dirs or mtime > mtimes[repo]:
+                    repodata_dirs[repo] = repodata_dir
+                    mtimes[repo] = mtime
+        return repodata_dirs
+
+
+    @staticmethod
+    def get_repodata_files(repodata_dir):
+        """Parses the repomd.xml in the given dir and returns a dictionary of
+        the cached primary, primary_db, updateinfo and modules files which
+        exist, and
+        the mtime of the repomd.xml"""
+
+        repomd = os.path.join(repodata_dir, "repomd.xml")
+        files = {"mtime": os.stat(repomd).st_mtime}
+        try:
+            for data in iter_xml_elements(repomd, XMLNS_REPO + "data"):
+                data_type = data.get("type")
+                if data_type not in ("primary", "primary_db", "updateinfo", "modules"):
+                    continue
+                location = data.find(XMLNS_REPO + "location")
+                if location is None:
+                    continue
+                filename = os.path.basename(location.get("href"))
+                # yum 3 keeps the decompressed sqlite databases in gen/
+                for path in (os.path.join(repodata_dir, filename),
+                             os.path.join(repodata_dir, "gen", data_type + ".sqlite"),
+                             os.path.join(repodata_dir, "gen", data_type + ".xml")):
+                    if os.path.isfile(path):
+                        files[data_type] = path
+                        break
+        except SyntaxError as error:
+            end(UNKNOWN, "Error parsing '%s' - %s" % (repomd, error))
+        return files
+
+
+    @staticmethod
+    def parse_primary(filename):
+        """Streams the primary XML yielding a tuple of (name, arch, (epoch,
+        version, release)) for each binary package"""
+
+        try:
+            for package in iter_xml_elements(filename, XMLNS_COMMON + "package"):
+                arch = package.findtext(XMLNS_COMMON + "arch")
+                if arch in ("src", "nosrc"):
+                    continue
+                version = package.find(XMLNS_COMMON + "version")
+                yield (package.findtext(XMLNS_COMMON + "name"), arch,
+                       (version.get("epoch"), version.get("ver"), version.get("rel")))
+        except (SyntaxError, IOError, EOFError) as error:
+            end(UNKNOWN, "Error parsing '%s' - %s" % (filename, error))
+
+
+    @staticmethod
+    def parse_primary_db(filename):
+        """Queries the yum 3 primary sqlite database yielding a tuple of (name,
+        arch, (epoch, version, release)) for each binary package"""
+
+        tmp_file = None
+        if filename.endswith(".bz2"):
+            # sqlite needs the database decompressed on disk
+            (tmp_fd, tmp_file) = tempfile.mkstemp(suffix=".sqlite")
+            tmp_handle = os.fdopen(tmp_fd, "wb")
+            file_handle = open_repodata(filename)
+            shutil.copyfileobj(file_handle, tmp_handle)
+            file_handle.close()
+            tmp_handle.close()
+            filename = tmp_file
+        try:
+            connection = sqlite3.connect(filename)
+            try:
+                for (name, arch, epoch, version, release) in connection.execute(
+                        "SELECT name, arch, epoch, version, release FROM packages " \
+                      + "WHERE arch NOT IN ('src', 'nosrc')"):
+                    yield (name, arch, (epoch, version, release))
+            finally:
+                connection.close()
+        except sqlite3.Error as error:
+            end(UNKNOWN, "Error reading '%s' - %s" % (filename, error))
+        finally:
+            if tmp_file:
+                os.remove(tmp_file)
+
+
+    def parse_updateinfo(self, filename, installed, kernels, security):
+        """Streams the updateinfo XML adding the name.arch of installed packages
+        older than those in security advisories to the security set, exits
+        critical if a security update to the kernel is installed but not yet
+        running"""
+
+        running_kernel = self.get_running_kernel()
+        newest_kernel = None
+        for evr in kernels:
+            if newest_kernel is None or compare_evr(evr, newest_kernel) > 0:
+                newest_kernel = evr
+        try:
+            for update in iter_xml_elements(filename, "update"):
+                if update.get("type") != "security":
+                    continue
+                for package in update.iter("package"):
+                    key = "%s.%s" % (package.get("name"), package.get("arch"))
+                    if key not in installed:
+                        continue
+                    evr = (package.get("epoch"), package.get("version"), package.get("release"))
+                    if compare_evr(evr, installed[key]) > 0:
+                        security.add(key)
+                    elif package.get("name") in KERNEL_PACKAGES and running_kernel and newest_kernel and \
+                         compare_evr(evr, running_kernel) > 0 and \
+                         compare_evr(evr, newest_kernel) <= 0:
+                        msg = "Kernel security update is installed but requires a reboot"
+                        # same as yum check-update / yum --security check-update
+                        if self.all_updates:
+                            end(WARNING, msg)
+                        end(CRITICAL, msg)
+        except (SyntaxError, IOError, EOFError) as error:
+            end(UNKNOWN, "Error parsing '%s' - %s" % (filename, error))
+
+
+    @staticmethod
+    def get_running_kernel():
+        """Returns the (epoch, version, release) of the running kernel"""
+
+        release = os.uname()[2]
+        # eg. 3.10.0-1160.el7.x86_64 or 5.14.0-70.el9.x86_64+debug
+        release = re.sub(r'\.%s(\+\w+)?$' % re.escape(os.uname()[4]), "", release)
+        if "-" not in release:
+            return None
+        (version, release) = release.split("-", 1)
+        return ("0", version, release)
+
+
     # Warning: yum updateinfo returns no output even when yum --security check-update returns
     #          'No security updates needed, but 1 update available'
     # so we are only calling this on Redhat Network subscriptions where we have a sample output in #328 from a user
@@ -546,18 +1173,271 @@ class YumTester(object):
     def test_yum_updates(self):
         """Starts tests and controls logic flow"""
 
-        check_yum_usable()
+        if not self.repodata:
+            check_yum_usable()
         self.vprint(2, "%s - Version %s\nAuthor: %s\n" \
             % (__title__, __version__, __author__))
 
         self.validate_all_variables()
+
+        if self.result_cache_background:
+            # not bound by the plugin timeout as the refresh child has its own
+            self.refresh_result_cache_background()
+            sys.exit(OK)
+
         self.set_timeout()
 
+        if self.result_cache_ttl and not self.result_cache_refresh:
+            return self.test_cached_updates()
+
         if self.all_updates:
             return self.test_all_updates()
         return self.test_security_updates()
 
 
+    def test_cached_updates(self):
+        """Returns a tuple of the status code and output from the result cache
+        if it is still fresh for the current repos, exclusions, rpmdb and
+        kernel, otherwise refreshes it"""
+
+        cache_file = self.get_result_cache_file()
+        key = self.get_result_cache_key()
+        cache = self.read_result_cache(cache_file)
+
+        if cache is None:
+            self.vprint(2, "no usable result cache '%s'" % cache_file)
+        elif cache["key"] != key:
+            self.vprint(2, "result cache invalidated by changes to the " \
+                         + "repos, exclusions, rpmdb or kernel")
+        else:
+            age = time.time() - cache["time"]
+            if 0 <= age <= self.result_cache_ttl:
+                self.vprint(2, "using result cache (%d secs old)" % age)
+                return self.format_cached_result(cache, age)
+            if 0 <= age <= self.result_cache_max_age:
+                self.vprint(2, "using expired result cache (%d secs old) " \
+                               % age + "while refreshing in the background")
+                self.start_background_refresh(cache_file)
+                return self.format_cached_result(cache, age)
+            self.vprint(2, "result cache too old (%d secs)" % age)
+
+        cache = self.update_result_cache(cache_file, key)
+        return self.format_cached_result(cache, 0)
+
+
+    @staticmethod
+    def format_cached_result(cache, age):
+        """Returns a tuple of the status code and output of a cached result
+        with the age of the data added to the perfdata"""
+
+        message = cache["message"]
+        if " | " not in message:
+            message += " |"
+        message += " data_age=%ds" % age
+        return cache["status"], message
+
+
+    def get_result_cache_file(self):
+        """Returns the result cache file, by default one in the temp dir
+        unique to the options which affect the result"""
+
+        if self.result_cache_file:
+            return self.result_cache_file
+        options = json.dumps([self.all_updates, self.warn_on_any_update,
+                              self.no_cache_update, self.no_warn_on_lock,
+                              self.enable_repo, self.disable_repo,
+                              self.disable_plugin, self.yum_config,
+                              self.repodata])
+        return os.path.join(tempfile.gettempdir(), "check_yum_%s.json" \
+                            % hashlib.md5(options.encode("utf-8")).hexdigest())
+
+
+    def get_result_cache_key(self):
+        """Returns a hash of the enabled repos, exclusions, rpmdb mtime, dnf
+        module streams and running kernel, any change to which invalidates the
+        cached result"""
+
+        enabled_repos, exclusions = self.get_repo_config()
+        key = json.dumps({"repos": enabled_repos,
+                          "exclusions": exclusions,
+                          "rpmdb_mtime": self.get_rpmdb_mtime(),
+                          # enabling or disabling a dnf module stream changes which packages are available
+                          "modules": self.get_module_states(),
+                          # a reboot into an updated kernel changes the result
+                          "kernel": os.uname()[2]},
+                         sort_keys=True)
+        self.vprint(3, "result cache key: %s" % key)
+        return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+    def get_repo_config(self):
+        """Returns a tuple of the sorted list of enabled repos and the sorted
+        list of exclusions from the yum / dnf config and .repo files"""
+
+        sections = self.get_repo_sections()
+
+        enabled_repos = []
+        exclusions = []
+        for section in sections:
+            values = sections[section]
+            if section != "main" and repo_enabled(values):
+                enabled_repos.append(section)
+            for key in ("exclude", "excludepkgs"):
+                if values.get(key):
+                    exclusions.append("%s:%s" % (section, values[key]))
+        return sorted(enabled_repos), sorted(exclusions)
+
+
+    @staticmethod
+    def get_rpmdb_mtime():
+        """Returns the latest mtime of the rpmdb files, which changes whenever
+        packages are installed, updated or removed"""
+
+        mtime = 0
+        for rpmdb_dir in RPMDB_DIRS:
+            for path in [rpmdb_dir] + glob.glob(os.path.join(rpmdb_dir, "*")):
+                try:
+                    mtime = max(mtime, os.stat(path).st_mtime)
+                except OSError:
+                    pass
+        return mtime
+
+
+    @staticmethod
+    def read_result_cache(cache_file):
+        """Returns the cached result dictionary or None if not usable,
+        ignoring any cache not owned by us or writable by others as the temp
+        dir is shared and a planted OK result would hide security updates"""
+
+        try:
+            file_handle = os.fdopen(os.open(cache_file, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0)))
+            try:
+                file_stat = os.fstat(file_handle.fileno())
+                if file_stat.st_uid != os.getuid() or file_stat.st_mode & 0o022:
+                    return None
+                cache = json.load(file_handle)
+            finally:
+                file_handle.close()
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(cache, dict):
+            return None
+        for key in ("key", "time", "status", "message"):
+            if key not in cache:
+                return None
+        return cache
+
+
+    def write_result_cache(self, cache_file, cache):
+        """Writes the result cache atomically so that concurrent runs never
+        read a partially written result"""
+
+        tmp_file = "%s.%s" % (cache_file, os.getpid())
+        try:
+            # O_EXCL so a symlink planted at the predictable temp path is
+            # never followed, removing any left behind by a killed run
+            if os.path.lexists(tmp_file):
+                os.remove(tmp_file)
+            file_handle = os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w")
+            json.dump(cache, file_handle)
+            file_handle.close()
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as error:
+            self.vprint(1, "failed to write result cache '%s' - %s" % (cache_file, error))
+
+
+    def update_result_cache(self, cache_file, key):
+        """Runs the check without the result cache and writes the result to
+        the result cache unless it is a transient failure, returns the
+        result dictionary"""
+
+        start_time = time.time()
+        status, message = self.run_uncached()
+        cache = {"key": key,
+                 "time": start_time,
+                 "status": status,
+                 "message": message}
+        if status != UNKNOWN and LOCKED_MSG not in message:
+            self.write_result_cache(cache_file, cache)
+        else:
+            self.vprint(2, "not caching transient result")
+        return cache
+
+
+    def run_uncached(self):
+        """Runs this plugin again with the same options but without the result
+        cache and returns a tuple of its status code and message, as the yum
+        output parsing exits the plugin directly on many conditions"""
+
+        cmd = [sys.executable, os.path.abspath(__file__)] + self.argv + [RESULT_CACHE_REFRESH]
+        self.vprint(2, "refreshing result cache: %s" % " ".join(cmd))
+        try:
+            process = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        except OSError as error:
+            end(UNKNOWN, "Error trying to refresh result cache - %s" % error)
+        stdout = process.communicate()[0].decode("utf-8")
+        self.vprint(3, "Returncode: '%s'\nOutput: '%s'" % (process.returncode, stdout))
+        lines = [_ for _ in stdout.split("\n") if _.strip()]
+        if not lines:
+            end(UNKNOWN, "No output from refreshing result cache")
+        status = process.returncode
+        if status not in (OK, WARNING, CRITICAL):
+            status = UNKNOWN
+        # the result is the last line, after any verbose output
+        message = lines[-1]
+        for prefix in ("YUM OK: ", "YUM WARNING: ", "YUM CRITICAL: ", "UNKNOWN: "):
+            if message.startswith(prefix):
+                message = message[len(prefix):]
+                break
+        return status, message
+
+
+    def start_background_refresh(self, cache_file):
+        """Starts a detached process to refresh the result cache unless one is
+        already running"""
+
+        lock_file = cache_file + ".lock"
+        for _ in range(2):
+            try:
+                os.close(os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+                break
+            except OSError:
+                # remove the lock if left behind by a killed refresh
+                try:
+                    if time.time() - os.stat(lock_file).st_mtime < self.timeout + 60:
+                        self.vprint(2, "background refresh already running")
+                        return
+                    os.remove(lock_file)
+                except OSError:
+                    pass
+        else:
+            return
+        cmd = [sys.executable, os.path.abspath(__file__)] + self.argv + [RESULT_CACHE_BACKGROUND]
+        self.vprint(2, "starting background refresh: %s" % " ".join(cmd))
+        devnull = open(os.devnull, "r+")
+        try:
+            Popen(cmd, stdin=devnull, stdout=devnull, stderr=devnull,
+                  close_fds=True, preexec_fn=os.setsid)
+        except OSError as error:
+            os.remove(lock_file)
+            self.vprint(1, "failed to start background refresh - %s" % error)
+        devnull.close()
+
+
+    def refresh_result_cache_background(self):
+        """Refreshes the result cache and then removes the lock taken by
+        start_background_refresh"""
+
+        cache_file = self.get_result_cache_file()
+        try:
+            self.update_result_cache(cache_file, self.get_result_cache_key())
+        finally:
+            try:
+                os.remove(cache_file + ".lock")
+            except OSError:
+                pass
+
+
     def test_all_updates(self):
         """Tests for all updates, and returns a tuple
         of the status code and output"""
@@ -701,6 +1581,55 @@ def main():
                       help="Explicitly disables a plugin when calling yum. " \
                          + "Can take a comma separated list of plugins")
 
+    parser.add_option("-R",
+                      "--repodata",
+                      action="store_true",
+                      dest="repodata",
+                      help="Compute the updates directly from the cached "     \
+                         + "repo metadata and rpmdb instead of running yum, "  \
+                         + "streaming each enabled repo's primary and "        \
+                         + "updateinfo XML. Much faster and uses less memory " \
+                         + "on large repos, but only as up to date as the "    \
+                         + "metadata cache so cron 'yum makecache' with this. " \
+                         + "Honours dnf module streams, but updates which "    \
+                         + "change a package's arch (eg. x86_64 to noarch) or "\
+                         + "obsolete it with a differently named package are " \
+                         + "not counted")
+
+    parser.add_option("--result-cache-ttl",
+                      dest="result_cache_ttl",
+                      help="Cache the result for this many seconds, "          \
+                         + "invalidated by any change to the enabled repos, "  \
+                         + "exclusions, rpmdb or running kernel, so that "     \
+                         + "repeated checks return instantly instead of "      \
+                         + "resolving the repo metadata every time. The age "  \
+                         + "of the data is output as perfdata. Defaults to 0 " \
+                         + "which disables the result cache")
+
+    parser.add_option("--result-cache-max-age",
+                      dest="result_cache_max_age",
+                      help="Once the cached result has expired, keep "         \
+                         + "returning it for up to this many seconds while it " \
+                         + "is refreshed in the background, after which the "  \
+                         + "check waits for the refresh (defaults to %s " \
+                                               % DEFAULT_RESULT_CACHE_MAX_AGE \
+                         + "seconds)")
+
+    parser.add_option("--result-cache-file",
+                      dest="result_cache_file",
+                      help="Result cache file to use. Defaults to a file in " \
+                         + "%s unique to the given options" % tempfile.gettempdir())
+
+    parser.add_option(RESULT_CACHE_REFRESH,
+                      action="store_true",
+                      dest="result_cache_refresh",
+                      help=SUPPRESS_HELP)
+
+    parser.add_option(RESULT_CACHE_BACKGROUND,
+                      action="store_true",
+                      dest="result_cache_background",
+                      help=SUPPRESS_HELP)
+
     parser.add_option("-t",
                       "--timeout",
                       dest="timeout",
@@ -745,6 +1674,14 @@ def main():
     tester.timeout = options.timeout
     tester.verbosity = options.verbosity
     tester.warn_on_any_update = options.warn_on_any_update
+    tester.repodata = options.repodata
+    tester.result_cache_ttl = options.result_cache_ttl
+    tester.result_cache_max_age = options.result_cache_max_age
+    tester.result_cache_file = options.result_cache_file
+    tester.result_cache_refresh = options.result_cache_refresh
+    tester.result_cache_background = options.result_cache_background
+    # passed on to the child processes which refresh the result cache
+    tester.argv = [_ for _ in sys.argv[1:] if _ not in (RESULT_CACHE_REFRESH, RESULT_CACHE_BACKGROUND)]
     if options.debug or ('DEBUG' in os.environ and os.environ['DEBUG']):
         tester.verbosity = 3
 
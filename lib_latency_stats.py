@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 20:14:05 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn
+#  and optionally send me feedback to help steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+"""
+
+Latency distribution helpers shared by the plugins which report percentiles of latencies or wait times
+
+Kept free of pylib so that the older standalone plugins such as check_logserver.py can import it too
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import math
+
+__author__ = 'Hari Sekhon'
+__version__ = '0.1'
+
+
+def percentile_of(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list, 0 if empty"""
+    if not sorted_values:
+        return 0
+    index = int(math.ceil(len(sorted_values) * percent / 100.0)) - 1
+    return sorted_values[max(0, min(index, len(sorted_values) - 1))]
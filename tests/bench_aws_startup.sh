@@ -0,0 +1,91 @@
+#!/usr/bin/env bash
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 18:41:27 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn and optionally send me feedback to help improve or steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+# Benchmarks the startup cost of the AWS checks:
+#
+# - import time of each check_aws_*.py via --help, which no longer imports boto3 at all
+# - import time of boto3 itself for comparison, which is what every check used to pay up front
+# - first call vs reuse of the shared lazy session / client factory in check_aws_api_ping.py
+#
+# Doesn't need AWS credentials as it only creates clients without calling the APIs
+#
+# Usage: tests/bench_aws_startup.sh [num_runs]
+
+set -euo pipefail
+[ -n "${DEBUG:-}" ] && set -x
+srcdir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+
+cd "$srcdir/..";
+
+python="${PYTHON:-python3}"
+
+runs="${1:-5}"
+
+if ! [[ "$runs" =~ ^[[:digit:]]+$ ]] || [ "$runs" -lt 1 ]; then
+    echo "usage: ${0##*/} [num_runs]"
+    exit 3
+fi
+
+# average wall time in milliseconds of running the given command $runs times
+avg_ms(){
+    "$python" - "$runs" "$@" <<'EOF'
+from __future__ import print_function
+import subprocess
+import sys
+import time
+runs = int(sys.argv[1])
+cmd = sys.argv[2:]
+total = 0
+with open('/dev/null', 'w') as devnull:
+    for _ in range(runs):
+        start = time.time()
+        subprocess.call(cmd, stdout=devnull, stderr=devnull)
+        total += time.time() - start
+print('{0:.0f}'.format(total / runs * 1000))
+EOF
+}
+
+echo "Averaging over $runs runs each"
+echo
+
+printf '%-45s %8s\n' "python startup" "$(avg_ms "$python" -c 'pass') ms"
+printf '%-45s %8s\n' "import boto3" "$(avg_ms "$python" -c 'import boto3') ms"
+echo
+
+total=0
+for prog in ./check_aws_*.py; do
+    ms="$(avg_ms "$python" "$prog" --help)"
+    total=$((total + ms))
+    printf '%-45s %8s\n' "${prog#./} --help" "$ms ms"
+done
+printf '%-45s %8s\n' "total" "$total ms"
+echo
+
+"$python" - <<'EOF'
+from __future__ import print_function
+import os
+import sys
+import time
+sys.path.insert(0, os.getcwd())
+start = time.time()
+from check_aws_api_ping import AWSAPIPing  # pylint: disable=wrong-import-position
+print('{0:<45} {1:>5.0f} ms'.format('import check_aws_api_ping', (time.time() - start) * 1000))
+# first client loads the session and endpoint data, first of each service loads its model, repeats are cached
+for (service, region) in (('iam', 'us-east-1'), ('iam', 'us-east-1'), ('ec2', 'us-east-1'),
+                          ('ec2', 'eu-west-1'), ('ec2', 'us-east-1')):
+    start = time.time()
+    AWSAPIPing.get_client(service, region_name=region)
+    print('{0:<45} {1:>5.0f} ms'.format('get_client({0}, {1})'.format(service, region), (time.time() - start) * 1000))
+EOF
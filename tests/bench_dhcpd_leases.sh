@@ -0,0 +1,122 @@
+#!/usr/bin/env bash
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 19:26:43 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn and optionally send me feedback to help improve or steer this or other code I publish
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+# Benchmarks check_dhcpd_leases.py on a generated large lease file
+#
+# Generates a dhcpd.leases with the given number of lease entries (default: 500000) spread over a /16 so that most IPs
+# have several historical entries, the last of which decides whether it is active, then times the check in its default
+# mode, sorted by IP, and with mac and host whitelists and blacklists, then in --incremental mode for the initial full
+# parse, an unchanged file, and after appending 1000 lease entries of churn, and finally checking per pool utilisation
+# against a generated dhcpd.conf of 4096 subnets with 2 ranges each
+#
+# Usage: tests/bench_dhcpd_leases.sh [num_lease_entries]
+
+set -euo pipefail
+[ -n "${DEBUG:-}" ] && set -x
+srcdir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+
+cd "$srcdir/..";
+
+python="${PYTHON:-python3}"
+
+entries="${1:-500000}"
+
+if ! [[ "$entries" =~ ^[[:digit:]]+$ ]] || [ "$entries" -lt 1 ]; then
+    echo "usage: ${0##*/} [num_lease_entries]"
+    exit 3
+fi
+
+leasefile="$(mktemp /tmp/bench_dhcpd_leases.XXXXXX)"
+# shellcheck disable=SC2064
+statefile="$leasefile.state.json"
+dhcpd_conf="$leasefile.dhcpd.conf"
+# shellcheck disable=SC2064
+trap "rm -f '$leasefile' '$statefile' '$dhcpd_conf'" EXIT
+
+# generate_leases <num_entries> <random_seed> <file_open_mode>
+generate_leases(){
+    "$python" - "$1" "$2" "$3" "$leasefile" <<'EOF'
+from __future__ import print_function
+import random
+import sys
+entries = int(sys.argv[1])
+random.seed(int(sys.argv[2]))
+with open(sys.argv[4], sys.argv[3]) as filehandle:
+    if sys.argv[3] == 'w':
+        filehandle.write('# The format of this file is documented in the dhcpd.leases(5) manual page.\n')
+        filehandle.write('# This lease file was written by isc-dhcp-4.3.5\n\n')
+    for seq in range(entries):
+        host = random.randint(0, 65535)
+        state = 'active' if random.random() < 0.6 else 'free'
+        filehandle.write('lease 10.{0}.{1}.{2} {{\n'.format(host // 65536 + 1, host // 256, host % 256))
+        filehandle.write('  starts 4 2026/10/15 10:00:00;\n')
+        filehandle.write('  ends 4 2026/10/15 22:00:00;\n')
+        filehandle.write('  cltt 4 2026/10/15 10:00:00;\n')
+        filehandle.write('  binding state {0};\n'.format(state))
+        filehandle.write('  next binding state free;\n')
+        filehandle.write('  rewind binding state free;\n')
+        filehandle.write('  hardware ethernet 00:16:3e:{0:02x}:{1:02x}:{2:02x};\n'
+                         .format(seq % 256, host // 256, host % 256))
+        filehandle.write('  uid "\\001\\000\\026>{0}";\n'.format(seq))
+        filehandle.write('  client-hostname "host{0}";\n'.format(host))
+        filehandle.write('}\n')
+EOF
+}
+
+generate_leases "$entries" 1 w
+
+echo "Generated $entries lease entries, $(du -h "$leasefile" | awk '{print $1}')"
+echo
+
+bench(){
+    local name="$1"
+    shift
+    "$python" - "$name" "$python" ./check_dhcpd_leases.py -f "$leasefile" -t 600 "$@" <<'EOF'
+from __future__ import print_function
+import subprocess
+import sys
+import time
+start = time.time()
+with open('/dev/null', 'w') as devnull:
+    returncode = subprocess.call(sys.argv[2:], stdout=devnull)
+print('{0:<45} {1:>8.2f} secs (exit code {2})'.format(sys.argv[1], time.time() - start, returncode))
+EOF
+}
+
+bench "default (sorted by hostname)"
+bench "compact"                   -c
+bench "sorted by ip with macs"    -i -m
+bench "mac whitelist"             -c -y "00:16:3e:00:00:01,00:16:3e:00:00:02"
+bench "mac blacklist"             -c -z "00:16:3e:00:00:01,00:16:3e:00:00:02"
+bench "host whitelist"            -c -w "host1,host2,host3"
+bench "host blacklist"            -c -x "host1,host2,host3"
+
+bench "incremental first run (full parse)" -c --incremental --state-file "$statefile"
+bench "incremental unchanged"              -c --incremental --state-file "$statefile"
+generate_leases 1000 2 a
+bench "incremental 1000 appended entries"  -c --incremental --state-file "$statefile"
+
+"$python" - "$dhcpd_conf" <<'EOF'
+import sys
+with open(sys.argv[1], 'w') as filehandle:
+    for second in range(1, 17):
+        for third in range(256):
+            filehandle.write('subnet 10.{0}.{1}.0 netmask 255.255.255.0 {{\n'.format(second, third))
+            filehandle.write('  range 10.{0}.{1}.0 10.{0}.{1}.127;\n'.format(second, third))
+            filehandle.write('  range 10.{0}.{1}.128 10.{0}.{1}.255;\n'.format(second, third))
+            filehandle.write('}\n')
+EOF
+
+bench "pool utilisation (8192 ranges)"    -c -C "$dhcpd_conf" -P 100 -Q 100
@@ -33,10 +33,20 @@ if ./check_aws_api_ping.py >/dev/null; then
 
     run ./check_aws_access_keys_disabled.py
 
+    run ./check_aws_credential_report.py --cache-ttl 0
+
+    run ./check_aws_credential_report.py
+
     run ./check_aws_ec2_instance_count.py
 
+    run ./check_aws_ec2_instance_count.py --regions all --level region
+
+    run ./check_aws_ec2_instance_count.py --state running,stopped --tag Name=nonexistent
+
     run ./check_aws_ec2_instance_states.py --max-stopped 100
 
+    run ./check_aws_ec2_instance_states.py --max-stopped 100 --regions all --level region --threads 5
+
     run ./check_aws_password_policy.py --password-length 12 --password-age 60 --password-reuse 10
 
     run ./check_aws_root_account.py
@@ -48,6 +58,8 @@ if ./check_aws_api_ping.py >/dev/null; then
     run_fail "0 1" ./check_aws_users_password_last_used.py
 
     run_fail "0 1" ./check_aws_users_unused.py
+
+    run_fail "0 1" ./check_aws_users_unused.py --cache-ttl 0
 fi
 
 # $run_count assigned in lib/utils.sh and incremented by run()
@@ -166,6 +166,61 @@ if is_docker_available; then
 
     # ============================================================================ #
 
+    run ./check_docker_daemon.py
+
+    run ./check_docker_daemon.py --cache-ttl 0 --df
+
+    run ./check_docker_daemon.py --metric running_containers -w 10000 -c 100000
+
+    run ./check_docker_daemon.py --expected '^\d+\.\d+|\+azure$'
+
+    run_fail 2 ./check_docker_daemon.py --expected 'wrong-version'
+
+    run_fail 2 ./check_docker_daemon.py --metric networks -c 1
+
+    run_usage ./check_docker_daemon.py --metric nonexistent
+
+    echo "checking connection refused:"
+    DOCKER_HOST=tcp://127.0.0.1:23760 ERRCODE=2 run_grep 'Connection refused' ./check_docker_daemon.py --cache-ttl 0
+
+    # ============================================================================ #
+
+    run ./check_docker_container_stats.py
+
+    run ./check_docker_container_stats.py --metric memory --top 10 -v
+
+    run ./check_docker_container_stats.py --metric write -w 1000 -c 2000 --threads 2
+
+    run_fail 2 ./check_docker_container_stats.py --container '.' --metric memory -w 0 -c 0
+
+    run_usage ./check_docker_container_stats.py --metric nonexistent
+
+    echo "checking connection refused:"
+    DOCKER_HOST=tcp://127.0.0.1:23760 ERRCODE=2 run_grep 'Connection refused' ./check_docker_container_stats.py
+
+    # ============================================================================ #
+
+    run_fail 2 ./check_docker_events.py --state-file /nonexistent/docker_events.json
+
+    echo "starting Docker events collector in background:"
+    ./check_docker_events.py --collector --state-file "/tmp/docker_events_test.$$.json" &
+    collector_pid=$!
+    sleep 5
+
+    run ./check_docker_events.py --state-file "/tmp/docker_events_test.$$.json"
+
+    run ./check_docker_events.py --state-file "/tmp/docker_events_test.$$.json" --container '.' --window 1 -v
+
+    run_fail 2 ./check_docker_events.py --state-file "/tmp/docker_events_test.$$.json" --max-state-age 1 -w 100 -c 100
+
+    run_usage ./check_docker_events.py --window 0
+
+    echo "stopping Docker events collector:"
+    kill "$collector_pid"
+    rm -f "/tmp/docker_events_test.$$.json"
+
+    # ============================================================================ #
+
     service=nagios-plugins-service-test
 
     if ./check_docker_swarm_enabled.py; then
@@ -185,6 +240,8 @@ if is_docker_available; then
 
         run ./check_docker_swarm_error.py
 
+        run ./check_docker_daemon.py --swarm-manager
+
         run ./check_docker_swarm_nodes.py
         run ./check_docker_swarm_nodes.py --manager
 
@@ -221,6 +278,16 @@ if is_docker_available; then
 
         run_fail 2 ./check_docker_swarm_service_status.py --service "$service" -w 2:2 -c 3
 
+        run ./check_docker_swarm_service_status.py --all-services
+
+        run ./check_docker_swarm_service_status.py --all-services -v -w 0 -c 1
+
+        run_fail 1 ./check_docker_swarm_service_status.py --all-services -U 60
+
+        run_fail 1 ./check_docker_swarm_service_status.py --all-services -C 60
+
+        run_usage ./check_docker_swarm_service_status.py --all-services --service "$service"
+
         echo "recreating test docker server '$service' as a global service:"
         docker service rm "$service"
         docker service create --name "$service" --mode global alpine top
@@ -243,6 +310,8 @@ if is_docker_available; then
 
         run_fail 2 ./check_docker_swarm_error.py
 
+        run_fail 2 ./check_docker_daemon.py --swarm
+
         run_fail 2 ./check_docker_swarm_nodes.py
         run_fail 2 ./check_docker_swarm_nodes.py --manager
 
@@ -256,6 +325,8 @@ if is_docker_available; then
         run_fail 2 ./check_docker_swarm_services.py
 
         run_fail 2 ./check_docker_swarm_service_status.py --service "$service"
+
+        run_fail 2 ./check_docker_swarm_service_status.py --all-services
     fi
 
     # ============================================================================ #
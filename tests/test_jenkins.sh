@@ -0,0 +1,88 @@
+#!/usr/bin/env bash
+#  vim:ts=4:sts=4:sw=4:et
+#
+#  Author: Hari Sekhon
+#  Date: 2026-10-19 21:02:37 +0100 (Mon, 19 Oct 2026)
+#
+#  https://github.com/HariSekhon/Nagios-Plugins
+#
+#  License: see accompanying Hari Sekhon LICENSE file
+#
+#  If you're using my code you're welcome to connect with me on LinkedIn and optionally send me feedback
+#
+#  https://www.linkedin.com/in/HariSekhon
+#
+
+set -euo pipefail
+[ -n "${DEBUG:-}" ] && set -x
+
+srcdir="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+
+cd "$srcdir/.."
+
+# shellcheck disable=SC1090
+. "$srcdir/utils.sh"
+
+section "J e n k i n s"
+
+export JENKINS_VERSIONS="${*:-${JENKINS_VERSIONS:-lts}}"
+
+JENKINS_HOST="${DOCKER_HOST:-${JENKINS_HOST:-${HOST:-localhost}}}"
+JENKINS_HOST="${JENKINS_HOST##*/}"
+JENKINS_HOST="${JENKINS_HOST%%:*}"
+export JENKINS_HOST
+export JENKINS_PORT_DEFAULT=8080
+
+check_docker_available
+
+trap_debug_env jenkins
+
+# Jenkins JVM takes a while to come up
+startupwait 120
+
+test_jenkins(){
+    local version="$1"
+    section2 "Setting up Jenkins $version test container"
+    docker_compose_pull
+    VERSION="$version" docker-compose up -d --remove-orphans
+    hr
+    echo "getting Jenkins dynamic port mapping:"
+    docker_compose_port "Jenkins"
+    hr
+    # shellcheck disable=SC2153
+    when_ports_available "$JENKINS_HOST" "$JENKINS_PORT"
+    hr
+    when_url_content "http://$JENKINS_HOST:$JENKINS_PORT/api/json" "numExecutors"
+    hr
+    if [ -n "${NOTESTS:-}" ]; then
+        exit 0
+    fi
+    hr
+    jenkins_tests
+
+    # defined and tracked in bash-tools/lib/utils.sh
+    # shellcheck disable=SC2154
+    echo "Completed $run_count Jenkins tests"
+    hr
+    [ -n "${KEEPDOCKER:-}" ] ||
+    docker-compose down
+    echo
+}
+
+jenkins_tests(){
+    # all status text must come before the single perfdata separator
+    run_grep "^OK: Jenkins build queue p90 wait time = 0 secs, queued = 0, .*executors busy = [0-9]+ / [0-9]+ .* \| queued=0 [^|,]+ query_time=[0-9.]+s$" \
+             ./check_jenkins_build_queue.py -v
+
+    run_grep " \| queued=0 [^|,]+ query_time=[0-9.]+s$" \
+             ./check_jenkins_build_queue.py --percentile max -w 0 -c 0
+
+    run_conn_refused ./check_jenkins_build_queue.py
+}
+
+run_test_versions "Jenkins"
+
+if is_CI; then
+    docker_image_cleanup
+    echo
+fi
@@ -137,6 +137,41 @@ test_kafka(){
 
     run ./check_kafka.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -v
 
+    run_grep "metadata_time=" ./check_kafka.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -p 0
+
+    ERRCODE=2 run_grep "partition '100' does not exist" ./check_kafka.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -p 100
+
+    run ./check_kafka_spray.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -v
+
+    run ./check_kafka_spray.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" --sample 1 --acks all
+
+    run_usage ./check_kafka_spray.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -p 0
+
+    ERRCODE=2 run_grep "does not exist" ./check_kafka_spray.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "nonexistenttopic"
+
+    ERRCODE=2 run_grep "NoBrokersAvailable" ./check_kafka_spray.py -B "localhost:9999" -T "$KAFKA_TOPIC"
+
+    # KafkaAdminClient requires Kafka 0.10+
+    if ! [[ "$version" =~ -0\.[89]$ ]]; then
+        run ./check_kafka_consumer_group_lag.py -B "$KAFKA_HOST:$KAFKA_PORT" -v
+
+        run ./check_kafka_consumer_group_lag.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" --top 10 --total-warning 100000
+
+        run_fail 3 ./check_kafka_consumer_group_lag.py -B "$KAFKA_HOST:$KAFKA_PORT" --list-groups
+
+        run_usage ./check_kafka_consumer_group_lag.py -B "$KAFKA_HOST:$KAFKA_PORT" --total-critical -1
+
+        ERRCODE=2 run_grep "NoBrokersAvailable" ./check_kafka_consumer_group_lag.py -B "localhost:9999"
+    fi
+
+    run ./check_kafka_burst.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -v
+
+    run ./check_kafka_burst.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -p 0 --num 500 --rate 0 --acks all --percentile p95
+
+    run_fail 1 ./check_kafka_burst.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" --num 10 --percentile max -w 0 -c 100
+
+    run_usage ./check_kafka_burst.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" --percentile p42
+
 #    ./check_kafka_topic_exists.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "$KAFKA_TOPIC" -v
 
 #    run_fail 2 ./check_kafka_topic_exists.py -B "$KAFKA_HOST:$KAFKA_PORT" -T "nonexistenttopic" -v
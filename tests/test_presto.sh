@@ -139,6 +139,14 @@ presto_worker_tests(){
 
     run ./check_presto_worker_nodes_response_lag.py
 
+    run ./check_presto_worker_nodes_report.py
+
+    passive_file="/tmp/check_presto_worker_nodes_report.$$"
+    run ./check_presto_worker_nodes_report.py --passive-file "$passive_file"
+    grep -q "PROCESS_SERVICE_CHECK_RESULT;.*;Presto Worker;0;" "$passive_file"
+    rm -f "$passive_file"
+    hr
+
     # will get a 404 Not Found against worker API
     run_404 ./check_presto_worker_nodes_response_lag.py -P "$PRESTO_WORKER_PORT"
 
@@ -258,6 +266,20 @@ test_presto2(){
         run_fail 1 ./check_presto_queries.py --queued
     fi
 
+    if [ -n "${NODOCKER:-}" ] ||
+       [ -n "${KEEPDOCKER:-}" ]; then
+        run_fail "0 1 2" ./check_presto_queries_latency.py
+        run_fail "0 1 2" ./check_presto_queries_latency.py --metric queued --percentile p90
+    else
+        echo "checking presto query latency, but in docker there will be no queries by this point so expecting warning:"
+        run_fail 1 ./check_presto_queries_latency.py
+        run_fail 1 ./check_presto_queries_latency.py --metric cpu --percentile max -w 60 -c 300
+    fi
+
+    run_usage ./check_presto_queries_latency.py --metric nonexistent
+
+    run_conn_refused ./check_presto_queries_latency.py
+
     # endpoint only found on Presto 0.128 onwards
     if [ "$version" = "latest" ] ||
        [ "$version" = "NODOCKER" ] ||
@@ -284,6 +306,10 @@ test_presto2(){
 
     run_conn_refused ./check_presto_worker_nodes_recent_failures.py
 
+    run_fail 1 ./check_presto_worker_nodes_report.py
+
+    run_conn_refused ./check_presto_worker_nodes_report.py
+
     if [ -n "${NODOCKER:-}" ]; then
         presto_worker_tests
         echo
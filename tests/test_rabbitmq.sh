@@ -208,6 +208,13 @@ rabbitmq_tests(){
     echo "and via non-durable queue2:"
     run ./check_rabbitmq.py -v --queue queue2 --non-durable
 
+    echo "checking burst mode with batched publisher confirms:"
+    run ./check_rabbitmq.py -v --burst 1000
+
+    run ./check_rabbitmq.py -v --burst 500 --batch-size 50 --prefetch 20 --queue queue2 --non-durable
+
+    run_usage ./check_rabbitmq.py --burst 100 --use-transactions
+
     echo "checking auth failure for message pub-sub:"
     run_fail 2 ./check_rabbitmq.py -u wronguser -p wrongpassword -v
 
@@ -331,6 +338,19 @@ rabbitmq_tests(){
     echo "with durable queue where non-durable queue is found:"
     run_fail 2 ./check_rabbitmq_queue.py --queue queue2 --durable true
 
+    run ./check_rabbitmq_queue.py --all-queues
+
+    run ./check_rabbitmq_queue.py --all-queues --page-size 1 -v
+
+    echo "with all queues having fewer consumers than required:"
+    run_fail 1 ./check_rabbitmq_queue.py --all-queues --min-consumers 1000
+
+    run_usage ./check_rabbitmq_queue.py --all-queues --queue queue1
+
+    run_usage ./check_rabbitmq_queue.py --all-queues --page-size 1000
+
+    run_conn_refused ./check_rabbitmq_queue.py --all-queues
+
     docker exec -i "$DOCKER_CONTAINER" bash <<EOF
         rabbitmqctl sync_queue -p "$RABBITMQ_VHOST" queue2
 
@@ -68,6 +68,13 @@ ERRCODE="0 1 2" docker_exec check_yum.py -C -v -t 60
 ERRCODE="0 1 2" docker_exec check_yum.py --all-updates -v -t 120
 ERRCODE="0 1 2" docker_exec check_yum.py -C --all-updates -v -t 60
 
+# first run populates the result cache, second is served from it
+ERRCODE="0 1 2" docker_exec check_yum.py -C -v -t 60 --result-cache-ttl 3600
+ERRCODE="0 1 2" docker_exec check_yum.py -C -v -t 60 --result-cache-ttl 3600
+
+ERRCODE="0 1 2" docker_exec check_yum.py --repodata -v -t 60
+ERRCODE="0 1 2" docker_exec check_yum.py --repodata --all-updates -v -t 60
+
 # defined and tracked in bash-tools/lib/utils.sh
 # shellcheck disable=SC2154
 echo "Completed $run_count Yum tests"